@@ -1,71 +1,153 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from datetime import datetime
+from pydantic import BaseModel, constr
+from typing import Dict, List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.responses import conditional_json, file_response
+from app.core.config import settings
+from app.core.db import get_async_db
+from app.services.cache_service import experiment_key, read_cache
+from app.services.db_service import AsyncDBService
+from app.services import swarm_metrics_cache
+from app.services.result_archive import ExportUnavailable, ResultNotFound, result_archive
+from app.services.scheduler import scheduler
 
 router = APIRouter(prefix="/api/v1/experiments", tags=["experiments"])
 
-# Mock data for testing
-MOCK_EXPERIMENTS = [
-    {
-        "id": 1,
-        "name": "Robot Navigation Test",
-        "description": "Testing robot navigation in a maze",
-        "status": "completed",
-        "robot_host": "192.168.1.100",
-        "created_at": "2025-10-17T10:00:00Z",
-        "updated_at": "2025-10-17T10:30:00Z"
-    },
-    {
-        "id": 2,
-        "name": "Sensor Calibration",
-        "description": "Calibrating robot sensors",
-        "status": "running",
-        "robot_host": "192.168.1.101",
-        "created_at": "2025-10-17T11:00:00Z",
-        "updated_at": "2025-10-17T11:15:00Z"
-    }
-]
+class ArtifactCollectionRequest(BaseModel):
+    robot_hosts: Optional[List[str]] = None
+    remote_dir: Optional[str] = None
+    pattern: str = "*"
+
+# Large text columns are left out of list responses
+LIST_EXCLUDE = ("script_content", "output", "error")
+
+Tag = constr(min_length=1, max_length=64)  # experiments.tags is VARCHAR(64)[]
 
 @router.get("/")
-async def get_experiments(skip: int = 0, limit: int = 100):
-    """Get all experiments (mock data for testing)"""
-    experiments = MOCK_EXPERIMENTS[skip:skip + limit]
-    return {"experiments": experiments, "total": len(MOCK_EXPERIMENTS)}
+async def get_experiments(
+    request: Request,
+    after_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=500),
+    status: Optional[str] = None,
+    robot_host: Optional[str] = None,
+    tag: List[Tag] = Query([], description="Repeat to require several tags"),
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    q: Optional[str] = Query(None, max_length=200, description="Full-text search on name and description"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get experiments, filtered and paginated by id (pass ``next_cursor`` as ``after_id``)"""
+    filters = {
+        "status": status,
+        "robot_host": robot_host,
+        "tags": tag,
+        "created_after": created_after,
+        "created_before": created_before,
+        "q": q,
+    }
+
+    async def load():
+        experiments = await AsyncDBService(db).get_experiments(after_id=after_id, limit=limit, **filters)
+        return {
+            "experiments": [experiment.to_dict(exclude=LIST_EXCLUDE) for experiment in experiments],
+            "next_cursor": experiments[-1].id if len(experiments) == limit else None
+        }
+
+    key = await read_cache.experiment_list_key(after_id, limit, filters)
+    entry = await read_cache.get_or_load(key, load, settings.cache_ttl_experiments)
+    return conditional_json(request, entry)
 
 @router.get("/{experiment_id}")
-async def get_experiment(experiment_id: int):
-    """Get experiment by ID (mock data for testing)"""
-    experiment = next((exp for exp in MOCK_EXPERIMENTS if exp["id"] == experiment_id), None)
-    if not experiment:
+async def get_experiment(experiment_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Get experiment by ID"""
+    async def load():
+        experiment = await AsyncDBService(db).get_experiment(experiment_id)
+        return experiment.to_dict() if experiment else None
+
+    entry = await read_cache.get_or_load(experiment_key(experiment_id), load, settings.cache_ttl_experiments)
+    if entry is None:
         raise HTTPException(status_code=404, detail="Experiment not found")
-    return experiment
+    return conditional_json(request, entry)
 
 @router.post("/")
 async def create_experiment(
     name: str,
     description: str = None,
-    robot_host: str = None
+    robot_host: str = None,
+    tag: List[Tag] = Query([]),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Create a new experiment (mock for testing)"""
-    new_experiment = {
-        "id": len(MOCK_EXPERIMENTS) + 1,
-        "name": name,
-        "description": description or "No description provided",
-        "status": "created",
-        "robot_host": robot_host or "192.168.1.100",
-        "created_at": datetime.now().isoformat() + "Z",
-        "updated_at": datetime.now().isoformat() + "Z"
-    }
-    MOCK_EXPERIMENTS.append(new_experiment)
-    return new_experiment
+    """Create a new experiment"""
+    experiment = await AsyncDBService(db).create_experiment(name, description, robot_host, tags=sorted(set(tag)))
+    return experiment.to_dict()
 
 @router.put("/{experiment_id}/status")
-async def update_experiment_status(experiment_id: int, status: str):
-    """Update experiment status (mock for testing)"""
-    experiment = next((exp for exp in MOCK_EXPERIMENTS if exp["id"] == experiment_id), None)
+async def update_experiment_status(experiment_id: int, status: str, db: AsyncSession = Depends(get_async_db)):
+    """Update experiment status"""
+    experiment = await AsyncDBService(db).update_experiment_status(experiment_id, status)
+    if not experiment:
+        raise HTTPException(status_code=404, detail="Experiment not found")
+    return experiment.to_dict()
+
+@router.post("/{experiment_id}/artifacts/collect")
+async def collect_artifacts(
+    experiment_id: int,
+    request: ArtifactCollectionRequest = ArtifactCollectionRequest(),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Download the artifacts of every robot of an experiment in the background"""
+    experiment = await AsyncDBService(db).get_experiment(experiment_id)
     if not experiment:
         raise HTTPException(status_code=404, detail="Experiment not found")
-    
-    experiment["status"] = status
-    experiment["updated_at"] = datetime.now().isoformat() + "Z"
-    return experiment
+    robot_hosts = request.robot_hosts or ([experiment.robot_host] if experiment.robot_host else [])
+    if not robot_hosts:
+        raise HTTPException(status_code=400, detail="No robot hosts to collect from")
+    task = await run_in_threadpool(
+        scheduler.submit_artifact_collection, experiment_id, robot_hosts, request.remote_dir, request.pattern
+    )
+    return {"task_id": task.id, "status": "PENDING", "robot_hosts": robot_hosts}
+
+@router.get("/{experiment_id}/export")
+async def export_experiment(experiment_id: int, request: Request, refresh: bool = False):
+    """Download an experiment as a zip of Parquet files (runs and telemetry), Range supported"""
+    try:
+        path = await result_archive.export_experiment(experiment_id, max_age=0 if refresh else None)
+    except ResultNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ExportUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    return file_response(request, path, "application/zip", filename=f"experiment-{experiment_id}.zip")
+
+def metrics_params(
+    step: Optional[float] = Query(None, ge=swarm_metrics_cache.MIN_STEP, description="seconds per time step"),
+    aggregation_radius: Optional[float] = Query(None, gt=0, description="metres to the nearest neighbour"),
+    cell_size: Optional[float] = Query(None, gt=0, description="metres, coverage grid"),
+) -> Dict[str, float]:
+    """Swarm metric parameters from the query string, configured defaults for the rest"""
+    return swarm_metrics_cache.metrics_params(
+        {"step": step, "aggregation_radius": aggregation_radius, "cell_size": cell_size}
+    )
+
+@router.post("/{experiment_id}/metrics")
+async def compute_swarm_metrics(experiment_id: int, params: Dict[str, float] = Depends(metrics_params), refresh: bool = False):
+    """Compute the collective metrics of a stored run in the background (or return them if still current)"""
+    if not refresh:
+        cached = await swarm_metrics_cache.get_cached(experiment_id, params)
+        if cached is not None:
+            return {"status": "cached", **cached}
+    try:
+        await swarm_metrics_cache.check_steps(experiment_id, params["step"])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    task = await run_in_threadpool(scheduler.submit_swarm_metrics, experiment_id, params)
+    return {"task_id": task.id, "status": "PENDING", "params": params}
+
+@router.get("/{experiment_id}/metrics")
+async def get_swarm_metrics(experiment_id: int, params: Dict[str, float] = Depends(metrics_params)):
+    """Collective metrics of a run: aggregation, dispersion, coverage and floor color fractions"""
+    cached = await swarm_metrics_cache.get_cached(experiment_id, params)
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Metrics not computed, or telemetry changed since; POST to compute them")
+    return cached
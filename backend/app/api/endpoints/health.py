@@ -1,15 +1,66 @@
-from fastapi import APIRouter
+import logging
+from collections import Counter
+from fastapi import APIRouter, Response
+from fastapi.responses import JSONResponse
+from prometheus_client import CONTENT_TYPE_LATEST
+from app.core.metrics import CELERY_QUEUE_DEPTH, render_metrics
+from app.services.cache_service import read_cache
+from app.services.fleet_health import robot_health, services_health
+from app.services.scheduler import queue_depths, scheduler
+from app.services.ssh_pool import get_ssh_pool
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Without these the API cannot serve anything; Celery or robots down only degrade it
+REQUIRED_SERVICES = ("postgres", "redis")
 
 @router.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    return {
+    """Health check endpoint, served from the cached fleet health probes"""
+    body = {
         "status": "healthy",
         "service": "atriz-lab-api",
         "version": "1.0.0"
     }
+    try:
+        services = await services_health()
+        robots = await robot_health()
+    except Exception as e:
+        # Redis is where the probes live: if it is down, so is the API
+        body.update(status="unhealthy", services={"redis": {"ok": False, "error": str(e)}})
+        return JSONResponse(body, status_code=503)
+
+    body["services"] = services
+    body["robots"] = dict(Counter(entry["status"] for entry in robots.values()))
+    if services is None:
+        body["status"] = "unknown"
+    elif not all(services[name]["ok"] for name in REQUIRED_SERVICES):
+        body["status"] = "unhealthy"
+        return JSONResponse(body, status_code=503)
+    elif not services["celery"]["ok"] or body["robots"].get("offline"):
+        body["status"] = "degraded"
+    return body
+
+@router.get("/health/ssh-pool")
+async def ssh_pool_stats():
+    """SSH connection pool hit/miss metrics for this API process"""
+    return get_ssh_pool().stats()
+
+@router.get("/health/cache")
+async def cache_stats():
+    """Read cache hit/miss metrics for this API process"""
+    return read_cache.stats()
+
+@router.get("/metrics")
+async def metrics():
+    """Prometheus metrics (request timing, robot run phases, queues, DB and Redis latency)"""
+    try:
+        for queue, depth in (await queue_depths(scheduler.worker_queues())).items():
+            CELERY_QUEUE_DEPTH.labels(queue).set(depth)
+    except Exception as e:
+        logger.warning("Could not read Celery queue depths: %s", e)
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE_LATEST)
 
 @router.get("/")
 async def root():
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from app.api.endpoints.tasks import current_user
+from app.services import reservation_service
+from app.services.reservation_service import ExperimentNotFound, ReservationConflict, ReservationNotFound
+
+router = APIRouter(prefix="/api/v1/reservations", tags=["reservations"])
+
+class ReservationRequest(BaseModel):
+    starts_at: datetime  # naive times are UTC
+    ends_at: datetime
+    robots: Optional[int] = Field(None, ge=1)  # how many robots; defaults to all of robot_hosts
+    robot_hosts: List[str] = []  # allocate among these robots only
+    group: Optional[str] = None  # or among the robots of one group
+    experiment_id: Optional[int] = None
+    note: Optional[str] = None
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+@router.post("/")
+async def create_reservation(request: ReservationRequest, user: str = Depends(current_user)):
+    """Book N robots for a time window; the concrete robots are allocated here"""
+    count = request.robots or len(request.robot_hosts)
+    if not count:
+        raise HTTPException(status_code=400, detail="Give the number of robots or the robots to book")
+    try:
+        return await reservation_service.book(
+            user, count, request.starts_at, request.ends_at,
+            robot_hosts=request.robot_hosts or None,
+            group=request.group,
+            experiment_id=request.experiment_id,
+            note=request.note,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExperimentNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ReservationConflict as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "free": e.free})
+
+@router.get("/")
+async def get_reservations(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    owner: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=2000),
+):
+    """Reservations overlapping a window (the next 7 days by default), by start time"""
+    start = start or _now()
+    end = end or start + timedelta(days=7)
+    return {"reservations": await reservation_service.list_reservations(start, end, owner=owner, limit=limit)}
+
+@router.get("/availability")
+async def get_availability(
+    start: Optional[datetime] = None,
+    days: float = Query(7, gt=0, le=reservation_service.MAX_CALENDAR_DAYS),
+    group: Optional[str] = None,
+    robot: List[str] = Query([]),
+):
+    """Bookings and free intervals of each robot from ``start`` (now by default) over ``days`` days"""
+    try:
+        robot_hosts = reservation_service.candidate_robots(robot or None, group)
+        start = start or _now()
+        return await reservation_service.availability(start, start + timedelta(days=days), robot_hosts)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/{reservation_id}")
+async def get_reservation(reservation_id: int):
+    """One reservation with its allocated robots"""
+    try:
+        return await reservation_service.get_reservation(reservation_id)
+    except ReservationNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.delete("/{reservation_id}")
+async def cancel_reservation(reservation_id: int, user: str = Depends(current_user)):
+    """Cancel one of your reservations and free its robots"""
+    try:
+        await reservation_service.cancel(reservation_id, user)
+    except ReservationNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    return {"reservation_id": reservation_id, "status": "cancelled"}
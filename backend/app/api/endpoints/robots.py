@@ -0,0 +1,37 @@
+from fastapi import APIRouter, HTTPException
+from redis.exceptions import RedisError
+from app.services.fleet_health import robot_health
+from app.services.scheduler import active_leases, registered_robots, robot_group, robot_queue
+
+router = APIRouter(prefix="/api/v1/robots", tags=["robots"])
+
+async def _robots(hosts):
+    try:
+        health = await robot_health(hosts)
+        leases = await active_leases(list(health))
+    except RedisError as e:
+        # Probes and leases live in Redis: without it there is nothing to report
+        raise HTTPException(status_code=503, detail=f"Robot status unavailable: {e}")
+    return [
+        {
+            **entry,
+            "group": robot_group(host),
+            "queue": robot_queue(host),
+            "busy": leases[host] is not None,
+            "task_id": leases[host],
+        }
+        for host, entry in health.items()
+    ]
+
+@router.get("/")
+async def get_robots():
+    """Registered robots with their cached reachability, battery, ROS status and current job"""
+    return {"robots": await _robots(None)}
+
+@router.get("/{robot_host}")
+async def get_robot(robot_host: str):
+    """Cached health and current job of one robot"""
+    if robot_host not in registered_robots():
+        raise HTTPException(status_code=404, detail="Robot not registered")
+    robots = await _robots([robot_host])
+    return robots[0]
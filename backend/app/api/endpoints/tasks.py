@@ -1,92 +1,520 @@
-from fastapi import APIRouter, HTTPException
-from typing import Dict, Any
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, List, Optional
+import asyncio
+import contextlib
+import json
+import logging
+import math
+import re
 import uuid
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.responses import conditional_json, ranged_response
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal, get_async_db, get_async_engine
+from app.services.cache_service import read_cache, task_key
+from app.services import admission, detached_runs, reservation_service, sweep_service
+from app.services.db_service import AsyncDBService
+from app.services.fleet_health import offline_robots
+from app.services.result_archive import ResultNotFound, result_archive
+from app.services.scheduler import PRIORITIES, robot_queue, scheduler, swarm_queue
+from app.services.script_cache import validate_file_name
+from app.services.stream_service import (
+    END_EVENT, follow_task_output, read_streams, stream_tail_id, task_stream_key, user_events_key
+)
 
 router = APIRouter(prefix="/api/v1/tasks", tags=["tasks"])
-
-# Mock task storage for testing
-MOCK_TASKS = {}
+logger = logging.getLogger(__name__)
 
 class RobotScriptRequest(BaseModel):
     robot_host: str
     user_script_content: str
     script_name: str
+    supporting_files: Dict[str, str] = {}  # extra files next to the script, by name
+    priority: str = "normal"  # demo, normal, batch
+    detached: bool = False  # keep running on the robot; results are collected by a poller
+    max_runtime: Optional[int] = None  # seconds, detached runs only
+
+class SwarmScriptRequest(BaseModel):
+    robot_hosts: List[str]
+    user_script_content: str
+    script_name: str
+    max_parallel: Optional[int] = Field(None, ge=1)
+    supporting_files: Dict[str, str] = {}
+    priority: str = "normal"
+    skip_offline: bool = True  # leave out robots whose last health probe failed
+    detached: bool = False
+    max_runtime: Optional[int] = None
+
+class SweepRequest(BaseModel):
+    robot_hosts: List[str]  # runs are spread round-robin over these robots
+    user_script_content: str  # the same controller for every run; it reads params.json
+    script_name: str
+    parameters: Dict[str, List[Any]]  # grid: every combination becomes a run
+    repetitions: int = Field(1, ge=1)
+    supporting_files: Dict[str, str] = {}
+    priority: str = "batch"
+    experiment_id: Optional[int] = None
+    skip_offline: bool = True
+
+USER_NAME = re.compile(r"^[A-Za-z0-9_.@-]{1,64}$")
+
+def _valid_user(user: Optional[str]) -> str:
+    user = user or settings.default_user
+    if not USER_NAME.match(user):
+        raise ValueError("User names are 1-64 letters, digits or _.@-")
+    return user
+
+def current_user(x_atriz_user: Optional[str] = Header(None)) -> str:
+    """Submitting user, from the X-Atriz-User header set by the lab frontend"""
+    try:
+        return _valid_user(x_atriz_user)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _check_priority(priority: str):
+    if priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"Unknown priority, expected one of {sorted(PRIORITIES)}")
+
+def _check_file_names(script_name: str, supporting_files: Dict[str, str]):
+    try:
+        for name in [script_name, *supporting_files]:
+            validate_file_name(name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def _admit(user: str, jobs: List[tuple]) -> admission.Admission:
+    """Admission control of the jobs ``(task id, robot hosts, queue)`` of one submission:
+    429 with a Retry-After estimate when they cannot be taken now"""
+    try:
+        return await admission.admit_jobs(user, jobs)
+    except admission.AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def _check_reserved(robot_hosts: List[str], user: str, detached: bool, max_runtime: Optional[int]):
+    """409 when another user's reservation covers a robot while the job would run"""
+    runtime = (max_runtime or settings.detached_max_runtime) if detached else settings.robot_script_timeout
+    try:
+        await reservation_service.check_dispatch(robot_hosts, user, runtime)
+    except reservation_service.RobotReserved as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
+
+async def _abandon(db: AsyncSession, task_ids: List[str], error: Exception):
+    """Enqueueing failed: release the admitted jobs and fail their rows so none is left pending forever"""
+    for task_id in task_ids:
+        await admission.release(task_id)
+    try:
+        await db.rollback()
+        await AsyncDBService(db).fail_pending_tasks(task_ids, f"Could not enqueue: {error}")
+    except Exception as e:
+        logger.warning("Could not mark %d unqueued tasks as failed: %s", len(task_ids), e)
+
+def _celery_state(task_id: str) -> Dict[str, Any]:
+    """Read the live state of a task from the Celery result backend (blocking)"""
+    from app.core.celery_app import celery_app
+
+    async_result = celery_app.AsyncResult(task_id)
+    state = async_result.state
+    if state == "SUCCESS":
+        result = async_result.result or {}
+        if result.get("status") == "detached":
+            # Launched and still running on the robots; the poller records the end
+            return {"status": "running", "detached": True, "result": result}
+        if result.get("status") == "completed":
+            return {"status": "success", "result": result}
+        return {"status": "failure", "error": result.get("error"), "result": result}
+    if state == "FAILURE":
+        return {"status": "failure", "error": str(async_result.result)}
+    if state in ("STARTED", "PROGRESS"):
+        return {"status": "running", "progress": async_result.info if state == "PROGRESS" else None}
+    return {"status": "queued"}
 
 @router.post("/robot/execute")
-async def execute_robot_script(request: RobotScriptRequest):
-    """Execute a Python script on a remote robot via SSH (mock for testing)"""
+async def execute_robot_script(request: RobotScriptRequest, db: AsyncSession = Depends(get_async_db), user: str = Depends(current_user)):
+    """Execute a Python script on a remote robot via SSH"""
+    _check_priority(request.priority)
+    _check_file_names(request.script_name, request.supporting_files)
+    # Fail fast instead of letting the worker wait for an SSH timeout
+    if await offline_robots([request.robot_host]):
+        raise HTTPException(status_code=503, detail=f"Robot {request.robot_host} is offline")
+    await _check_reserved([request.robot_host], user, request.detached, request.max_runtime)
+
+    task_id = str(uuid.uuid4())
+    admitted = await _admit(user, [(task_id, [request.robot_host], robot_queue(request.robot_host))])
     try:
-        # Generate mock task ID
-        task_id = str(uuid.uuid4())
-        
-        # Create mock task
-        task = {
-            "task_id": task_id,
-            "name": f"Execute {request.script_name}",
-            "task_type": "robot_script",
-            "status": "queued",
-            "robot_host": request.robot_host,
-            "script_name": request.script_name,
-            "created_at": datetime.now().isoformat() + "Z",
-            "script_content": request.user_script_content[:100] + "..." if len(request.user_script_content) > 100 else request.user_script_content
-        }
-        
-        MOCK_TASKS[task_id] = task
-        
-        return {
-            "task_id": task_id,
-            "status": "queued",
-            "message": "Robot script execution queued (mock)",
-            "robot_host": request.robot_host,
-            "script_name": request.script_name
-        }
+        # The row is committed before enqueueing so the worker always finds it
+        await AsyncDBService(db).create_task(
+            task_id=task_id,
+            name=f"Execute {request.script_name}",
+            task_type="robot_script",
+            host=request.robot_host,
+            command=request.script_name,
+            owner=user
+        )
+        if request.detached:
+            await run_in_threadpool(
+                scheduler.submit_detached,
+                [request.robot_host],
+                request.user_script_content,
+                request.script_name,
+                supporting_files=request.supporting_files or None,
+                max_runtime=request.max_runtime,
+                priority=request.priority,
+                task_id=task_id,
+                owner=user,
+                demotion=admitted.demotion
+            )
+        else:
+            await run_in_threadpool(
+                scheduler.submit_script,
+                request.robot_host,
+                request.user_script_content,
+                request.script_name,
+                supporting_files=request.supporting_files or None,
+                priority=request.priority,
+                task_id=task_id,
+                owner=user,
+                demotion=admitted.demotion
+            )
     except Exception as e:
+        await _abandon(db, [task_id], e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/status/{task_id}")
-async def get_task_status(task_id: str):
-    """Get the status of a task (mock for testing)"""
+    return {
+        "task_id": task_id,
+        "status": "queued",
+        "message": "Robot script execution queued",
+        "robot_host": request.robot_host,
+        "script_name": request.script_name
+    }
+
+@router.post("/swarm/execute")
+async def execute_swarm_script(request: SwarmScriptRequest, db: AsyncSession = Depends(get_async_db), user: str = Depends(current_user)):
+    """Deploy and run one script on several robots with a synchronized start"""
+    _check_priority(request.priority)
+    _check_file_names(request.script_name, request.supporting_files)
+    if not request.robot_hosts:
+        raise HTTPException(status_code=400, detail="At least one robot host is required")
+    skipped = await offline_robots(request.robot_hosts) if request.skip_offline else []
+    robot_hosts = [host for host in request.robot_hosts if host not in skipped]
+    if not robot_hosts:
+        raise HTTPException(status_code=503, detail="Every requested robot is offline")
+    await _check_reserved(robot_hosts, user, request.detached, request.max_runtime)
+
+    task_id = str(uuid.uuid4())
+    admitted = await _admit(user, [(task_id, robot_hosts, swarm_queue(robot_hosts))])
     try:
-        # Get task from mock storage
-        task = MOCK_TASKS.get(task_id)
-        
-        if not task:
-            raise HTTPException(status_code=404, detail="Task not found")
-        
-        # Simulate task progression
-        import random
-        statuses = ["queued", "running", "completed", "failed"]
-        current_status = random.choice(statuses)
-        
-        if current_status == "completed":
-            return {
-                "task_id": task_id,
-                "status": "success",
-                "message": "Task completed successfully (mock)",
-                "result": {
-                    "output": "Robot script executed successfully",
-                    "exit_code": 0,
-                    "execution_time": "2.5s"
-                }
-            }
-        elif current_status == "failed":
-            return {
-                "task_id": task_id,
-                "status": "failure",
-                "message": "Task failed (mock)",
-                "error": "Connection timeout to robot"
-            }
+        await AsyncDBService(db).create_task(
+            task_id=task_id,
+            name=f"Swarm {request.script_name} ({len(robot_hosts)} robots)",
+            task_type="swarm_script",
+            command=request.script_name,
+            owner=user
+        )
+        if request.detached:
+            await run_in_threadpool(
+                scheduler.submit_detached,
+                robot_hosts,
+                request.user_script_content,
+                request.script_name,
+                supporting_files=request.supporting_files or None,
+                max_runtime=request.max_runtime,
+                priority=request.priority,
+                task_id=task_id,
+                owner=user,
+                demotion=admitted.demotion
+            )
         else:
-            return {
-                "task_id": task_id,
-                "status": current_status,
-                "message": f"Task is {current_status} (mock)"
+            await run_in_threadpool(
+                scheduler.submit_swarm,
+                robot_hosts,
+                request.user_script_content,
+                request.script_name,
+                max_parallel=request.max_parallel,
+                supporting_files=request.supporting_files or None,
+                priority=request.priority,
+                task_id=task_id,
+                owner=user,
+                demotion=admitted.demotion
+            )
+    except Exception as e:
+        await _abandon(db, [task_id], e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {
+        "task_id": task_id,
+        "status": "queued",
+        "message": f"Swarm execution queued on {len(robot_hosts)} robots",
+        "robot_hosts": robot_hosts,
+        "skipped_robots": skipped,
+        "script_name": request.script_name
+    }
+
+@router.post("/sweep/execute")
+async def execute_sweep(request: SweepRequest, db: AsyncSession = Depends(get_async_db), user: str = Depends(current_user)):
+    """Expand a parameter grid into robot runs, insert them in one transaction and enqueue them as one chord"""
+    _check_priority(request.priority)
+    _check_file_names(request.script_name, request.supporting_files)
+    if sweep_service.PARAMS_FILE in request.supporting_files or request.script_name == sweep_service.PARAMS_FILE:
+        raise HTTPException(status_code=400, detail=f"{sweep_service.PARAMS_FILE} is written by the sweep itself")
+    if not request.robot_hosts or not request.parameters or not all(request.parameters.values()):
+        raise HTTPException(status_code=400, detail="At least one robot and one value per parameter are required")
+    total = request.repetitions
+    for values in request.parameters.values():
+        total *= len(values)
+    if total > settings.sweep_max_runs:
+        raise HTTPException(status_code=400, detail=f"Sweep expands to {total} runs, the limit is {settings.sweep_max_runs}")
+    skipped = await offline_robots(request.robot_hosts) if request.skip_offline else []
+    robot_hosts = [host for host in dict.fromkeys(request.robot_hosts) if host not in skipped]
+    if not robot_hosts:
+        raise HTTPException(status_code=503, detail="Every requested robot is offline")
+
+    sweep_id = str(uuid.uuid4())
+    runs = sweep_service.expand_grid(request.parameters, request.repetitions)
+    for run in runs:
+        run["task_id"] = str(uuid.uuid4())
+        run["robot_host"] = robot_hosts[run["index"] % len(robot_hosts)]
+        run["supporting_files"] = {**request.supporting_files, sweep_service.PARAMS_FILE: sweep_service.params_file(run)}
+    # Every run counts: against the user's and robots' buckets and the depth of its queue
+    admitted = await _admit(user, [(run["task_id"], [run["robot_host"]], robot_queue(run["robot_host"])) for run in runs])
+    try:
+        await AsyncDBService(db).create_tasks([
+            {
+                "task_id": run["task_id"],
+                "name": sweep_service.run_label(request.script_name, run),
+                "task_type": "sweep_run",
+                "experiment_id": request.experiment_id,
+                "sweep_id": sweep_id,
+                "host": run["robot_host"],
+                "command": request.script_name,
+                "owner": user,
             }
+            for run in runs
+        ])
+        await sweep_service.start_progress(sweep_id, len(runs), {
+            "script_name": request.script_name,
+            "experiment_id": request.experiment_id,
+            "parameters": sorted(request.parameters),
+            "repetitions": request.repetitions,
+            "robot_hosts": robot_hosts,
+        })
+        await run_in_threadpool(
+            scheduler.submit_sweep, sweep_id, runs, request.user_script_content, request.script_name, request.priority, user,
+            admitted.demotion
+        )
     except Exception as e:
+        await _abandon(db, [run["task_id"] for run in runs], e)
+        with contextlib.suppress(Exception):
+            await sweep_service.drop_progress(sweep_id)
         raise HTTPException(status_code=500, detail=str(e))
 
+    return {
+        "sweep_id": sweep_id,
+        "status": "queued",
+        "runs": len(runs),
+        "robot_hosts": robot_hosts,
+        "skipped_robots": skipped,
+        "task_ids": [run["task_id"] for run in runs],
+    }
+
+@router.get("/admission")
+async def get_admission_stats():
+    """Admitted robot jobs per queue and user, fair share and measured service rate"""
+    return await admission.admission_stats(scheduler.worker_queues())
+
+@router.get("/sweep/{sweep_id}")
+async def get_sweep_progress(sweep_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Progress of a parameter sweep (runs done per status)"""
+    progress = await sweep_service.get_progress(sweep_id)
+    if progress is not None:
+        return progress
+    # Aggregate expired from Redis: count the task rows instead
+    counts = await AsyncDBService(db).get_sweep_status_counts(sweep_id)
+    if not counts:
+        raise HTTPException(status_code=404, detail="Sweep not found")
+    total = sum(counts.values())
+    done = counts.get("success", 0) + counts.get("failure", 0)
+    return {
+        "sweep_id": sweep_id,
+        "total": total,
+        "done": done,
+        "percent": round(100.0 * done / total, 1),
+        "statuses": counts,
+    }
+
+def _task_status_ttl(status: Dict[str, Any]) -> float:
+    """Finished tasks no longer change; running ones are only cached briefly"""
+    if status["status"] in ("success", "failure"):
+        return settings.cache_ttl_task_final
+    return settings.cache_ttl_task_active
+
+@router.get("/status/{task_id}")
+async def get_task_status(task_id: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Get the status of a task"""
+    async def load():
+        task = await AsyncDBService(db).get_task(task_id)
+        if not task:
+            return None
+        if task.status in ("success", "failure"):
+            # Final state recorded by the worker (or the detached-run poller)
+            state = {"status": task.status, "result": json.loads(task.result) if task.result else None}
+            if task.error:
+                state["error"] = task.error
+        else:
+            try:
+                state = await run_in_threadpool(_celery_state, task_id)
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+            if state["status"] == "queued" and task.status == "progress":
+                # Started, but its Celery result already expired (e.g. a long detached run)
+                state = {"status": "running"}
+        return {
+            "task_id": task_id,
+            "name": task.name,
+            "task_type": task.task_type,
+            "robot_host": task.host,
+            "created_at": task.created_at.isoformat() if task.created_at else None,
+            **state
+        }
+
+    entry = await read_cache.get_or_load(task_key(task_id), load, _task_status_ttl)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return conditional_json(request, entry)
+
+@router.get("/results/{task_id}/{name}")
+async def download_task_result(task_id: str, name: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Download an archived task output in full or by byte range (``name`` as listed in ``archived``)"""
+    task = await AsyncDBService(db).get_task(task_id)
+    if not task or not task.result_ref:
+        raise HTTPException(status_code=404, detail="Task has no archived results")
+    try:
+        entry = await run_in_threadpool(result_archive.entry, task.result_ref, name)
+    except ResultNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    if not result_archive.can_read(entry):
+        raise HTTPException(status_code=501, detail=f"Archived with {entry['codec']}, which this server cannot decompress")
+
+    def read(start: int, end: int):
+        return result_archive.read_range(task.result_ref, name, start, end)
+
+    return ranged_response(
+        request, entry["size"], read, "text/plain; charset=utf-8",
+        {"ETag": f'"{entry["sha256"][:20]}"', "Content-Disposition": f'inline; filename="{task_id}.{name}.txt"'}
+    )
+
+@router.post("/cancel/{task_id}")
+async def cancel_detached_task(task_id: str):
+    """Stop a detached run on its robots; its final status is recorded by the poller"""
+    signalled = await detached_runs.cancel(task_id)
+    if signalled is None:
+        raise HTTPException(status_code=404, detail="Detached run not found")
+    return {"task_id": task_id, "signalled": signalled}
+
+async def _task_exists(task_id: str) -> bool:
+    # Own short session: an open stream must not hold a pooled connection
+    async with AsyncSessionLocal(bind=get_async_engine()) as db:
+        return await AsyncDBService(db).get_task(task_id) is not None
+
+@router.get("/stream/{task_id}")
+async def stream_task_output(task_id: str, last_event_id: Optional[str] = Header(None)):
+    """Stream live stdout/stderr of a task as Server-Sent Events"""
+    if not await _task_exists(task_id):
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    async def events():
+        async for entry_id, fields in follow_task_output(task_id, last_event_id or "0-0"):
+            if entry_id is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"id: {entry_id}\nevent: {fields.get('type')}\ndata: {json.dumps(fields)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.websocket("/ws/{task_id}")
+async def task_output_websocket(websocket: WebSocket, task_id: str, last_id: str = "0-0"):
+    """Stream live stdout/stderr of a task over a WebSocket"""
+    if not await _task_exists(task_id):
+        await websocket.close(code=1008, reason="Task not found")
+        return
+    await websocket.accept()
+    try:
+        async for entry_id, fields in follow_task_output(task_id, last_id):
+            if entry_id is None:
+                continue
+            await websocket.send_json({"id": entry_id, **fields})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+@router.websocket("/ws")
+async def user_events_websocket(websocket: WebSocket, user: Optional[str] = None, last_id: Optional[str] = None):
+    """Push the completion of every task of a user, plus the live output of the tasks it subscribes to
+
+    One socket per user (``?user=``, or the X-Atriz-User header) replaces
+    polling ``/status``: ``{"type": "task", "task_id", "status"}`` arrives once
+    when a task finishes. Send ``{"action": "subscribe", "task_id": ..., "last_id": "0-0"}``
+    or ``{"action": "unsubscribe", "task_id": ...}`` to multiplex task output
+    over the same socket. ``last_id`` resumes the events after a reconnect.
+    """
+    try:
+        user = _valid_user(user or websocket.headers.get("x-atriz-user"))
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    await websocket.accept()
+    events_key = user_events_key(user)
+    # Every followed stream and the last id seen, read together by one blocking XREAD
+    streams = {events_key: last_id or await stream_tail_id(events_key)}
+    subscriptions: Dict[str, str] = {}  # stream key -> task id
+
+    async def receive():
+        while True:
+            message = await websocket.receive_json()
+            if not isinstance(message, dict):
+                continue
+            task_id = str(message.get("task_id", ""))
+            key = task_stream_key(task_id)
+            if message.get("action") == "subscribe" and task_id:
+                if key not in streams and len(subscriptions) >= settings.websocket_max_subscriptions:
+                    await websocket.send_json({"type": "error", "task_id": task_id, "data": "Too many subscriptions"})
+                    continue
+                streams[key] = str(message.get("last_id") or "0-0")
+                subscriptions[key] = task_id
+            elif message.get("action") == "unsubscribe":
+                streams.pop(key, None)
+                subscriptions.pop(key, None)
+
+    receiver = asyncio.create_task(receive())
+    try:
+        while not receiver.done():
+            for key, entry_id, fields in await read_streams(streams, settings.user_events_block_ms):
+                if key == events_key:
+                    await websocket.send_json({"channel": "events", "id": entry_id, **fields})
+                    continue
+                task_id = subscriptions.get(key)
+                if task_id is None:
+                    continue  # unsubscribed while the read was blocked
+                await websocket.send_json({"channel": "output", "task_id": task_id, "id": entry_id, **fields})
+                if fields.get("type") == END_EVENT:
+                    streams.pop(key, None)
+                    subscriptions.pop(key, None)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        with contextlib.suppress(Exception, asyncio.CancelledError):
+            await receiver  # the client closing the socket ends up here as WebSocketDisconnect
+
 @router.get("/")
 async def get_active_tasks():
     """Get information about active tasks"""
@@ -94,7 +522,15 @@ async def get_active_tasks():
         "message": "Atriz Lab Task Management",
         "available_endpoints": [
             "POST /api/v1/tasks/robot/execute - Execute robot script",
-            "GET /api/v1/tasks/status/{task_id} - Check task status"
+            "POST /api/v1/tasks/swarm/execute - Execute one script on several robots",
+            "POST /api/v1/tasks/sweep/execute - Run one script over a parameter grid",
+            "GET /api/v1/tasks/sweep/{sweep_id} - Sweep progress",
+            "GET /api/v1/tasks/status/{task_id} - Check task status",
+            "GET /api/v1/tasks/results/{task_id}/{name} - Download an archived output (Range supported)",
+            "POST /api/v1/tasks/cancel/{task_id} - Stop a detached run",
+            "GET /api/v1/tasks/stream/{task_id} - Live task output (Server-Sent Events)",
+            "WS /api/v1/tasks/ws/{task_id} - Live task output (WebSocket)",
+            "WS /api/v1/tasks/ws?user={user} - Completion events of all of a user's tasks, multiplexed task output"
         ],
-        "note": "Use /status/{task_id} to check individual task status"
+        "note": "Subscribe to /ws for completion events instead of polling /status/{task_id}"
     }
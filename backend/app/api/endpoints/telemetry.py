@@ -0,0 +1,96 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.api.responses import conditional_json
+from app.core.config import settings
+from app.core.db import get_async_db
+from app.models.telemetry import TelemetrySample
+from app.services.cache_service import experiment_key, read_cache
+from app.services.db_service import AsyncDBService
+from app.services.replay_window import METHODS, RESAMPLE, ReplayWindowError, plan_window, replay_key
+from app.services.telemetry_service import (
+    TelemetryBufferFull,
+    TelemetryDecodeError,
+    get_telemetry_ingestor,
+    telemetry_version,
+)
+
+router = APIRouter(prefix="/api/v1/telemetry", tags=["telemetry"])
+
+MAX_ROBOT_ID_LENGTH = TelemetrySample.robot_id.type.length
+
+@router.post("/{experiment_id}/{robot_id}", status_code=202)
+async def ingest_telemetry(experiment_id: int, robot_id: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Ingest a binary-packed batch of telemetry samples from a robot"""
+    # Rejected here: the buffered batch would only fail at flush time, with the rest of it
+    if len(robot_id) > MAX_ROBOT_ID_LENGTH:
+        raise HTTPException(status_code=400, detail=f"robot_id is longer than {MAX_ROBOT_ID_LENGTH} characters")
+
+    async def load():
+        experiment = await AsyncDBService(db).get_experiment(experiment_id)
+        return experiment.to_dict() if experiment else None
+
+    # Served from the read cache: robots post many batches per second
+    if await read_cache.get_or_load(experiment_key(experiment_id), load, settings.cache_ttl_experiments) is None:
+        raise HTTPException(status_code=404, detail="Experiment not found")
+    payload = await request.body()
+    try:
+        accepted = get_telemetry_ingestor().add_batch(experiment_id, robot_id, payload)
+    except TelemetryDecodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except TelemetryBufferFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    return {"accepted": accepted}
+
+@router.get("/stats")
+async def telemetry_stats():
+    """Ingestion counters for this API process"""
+    return get_telemetry_ingestor().stats()
+
+@router.get("/{experiment_id}/replay")
+async def replay_telemetry(
+    experiment_id: int,
+    request: Request,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    points: Optional[int] = Query(None, ge=3),
+    method: str = RESAMPLE,
+    robot: Optional[List[str]] = Query(None),
+):
+    """Downsampled telemetry of every robot of a run over a time window (unix seconds, whole run by default)
+
+    ``resample`` aligns all robots on one clock of at most ``points`` steps,
+    ``lttb`` keeps up to ``points`` shape-preserving samples per robot and
+    ``minmax`` returns the per-step envelope of each value.
+    """
+    if method not in METHODS:
+        raise HTTPException(status_code=400, detail=f"Unknown method, expected one of {list(METHODS)}")
+    points = min(points or settings.replay_default_points, settings.replay_max_points)
+    robots = sorted(set(robot or []))
+    window = None
+    if start is not None or end is not None:
+        if start is None or end is None:
+            raise HTTPException(status_code=400, detail="Pass both start and end, or neither for the whole run")
+        try:
+            # Snapped before the cache lookup: nearby windows of one zoom level share an entry
+            window = plan_window(start, end, points)
+        except ReplayWindowError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    # Imported here: NumPy loads with the first replay request, not at API startup
+    from app.services.replay_service import get_replay_service
+
+    async def load():
+        return await get_replay_service().window(experiment_id, points, method, robots, window)
+
+    try:
+        # Part of the key: a flush of new samples makes every cached window of the run unreachable
+        version = await telemetry_version(experiment_id)
+    except RedisError as e:
+        raise HTTPException(status_code=503, detail=f"Telemetry version unavailable: {e}")
+    entry = await read_cache.get_or_load(
+        replay_key(experiment_id, version, method, points, window, robots), load, get_replay_service().cache_ttl
+    )
+    if entry is None:
+        raise HTTPException(status_code=404, detail="No telemetry for this experiment")
+    return conditional_json(request, entry, compress=True)
@@ -0,0 +1,109 @@
+import asyncio
+import contextlib
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
+from app.services.video_relay import (
+    QUALITIES,
+    CameraNotFound,
+    RenditionUnavailable,
+    TooManyViewers,
+    get_video_relay,
+)
+
+router = APIRouter(prefix="/api/v1/video", tags=["video"])
+
+MJPEG_BOUNDARY = "atrizframe"
+
+def _connect(camera: str, quality: str, client):
+    if quality not in QUALITIES:
+        raise HTTPException(status_code=400, detail=f"Unknown quality, expected one of {list(QUALITIES)}")
+    try:
+        return get_video_relay().connect(camera, quality, client)
+    except CameraNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RenditionUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except TooManyViewers as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+@router.get("/")
+async def list_cameras():
+    """Arena cameras and the state of their ingest in this API process"""
+    return [relay.status() for relay in get_video_relay().cameras.values()]
+
+@router.get("/stats")
+async def video_viewer_stats():
+    """Per-viewer delivery statistics: frames sent and dropped, latency from ingest"""
+    return get_video_relay().viewer_stats()
+
+@router.get("/{camera}/snapshot")
+async def camera_snapshot(camera: str, quality: str = "high"):
+    """Latest frame of a camera as a JPEG image"""
+    viewer = _connect(camera, "low" if quality == "low" else "high", "snapshot")
+    relay = get_video_relay()
+    try:
+        frame = await asyncio.wait_for(relay.camera(camera).next_frame(None), timeout=10)
+        data = await frame.rendition(viewer.rendition)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"No frame from camera {camera}")
+    finally:
+        relay.disconnect(viewer)
+    return Response(data, media_type="image/jpeg", headers={"Cache-Control": "no-store"})
+
+@router.get("/{camera}/mjpeg")
+async def camera_mjpeg(camera: str, request: Request, quality: str = "auto"):
+    """Live camera as multipart MJPEG (usable directly as an ``<img>`` source)"""
+    viewer = _connect(camera, quality, request.client.host if request.client else None)
+    relay = get_video_relay()
+
+    async def body():
+        try:
+            async for data in relay.camera(camera).frames(viewer):
+                yield (
+                    f"--{MJPEG_BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(data)}\r\n\r\n".encode()
+                    + data + b"\r\n"
+                )
+        finally:
+            relay.disconnect(viewer)
+
+    return StreamingResponse(
+        body(),
+        media_type=f"multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.websocket("/{camera}/ws")
+async def camera_websocket(websocket: WebSocket, camera: str, quality: str = "auto"):
+    """Live camera over a WebSocket: one binary message per JPEG frame
+
+    Send ``{"quality": "low" | "high" | "auto"}`` to change the rendition.
+    """
+    try:
+        viewer = _connect(camera, quality, websocket.client.host if websocket.client else None)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=str(e.detail))
+        return
+    relay = get_video_relay()
+    await websocket.accept()
+
+    async def receive():
+        while True:
+            message = await websocket.receive_json()
+            if isinstance(message, dict) and message.get("quality") in QUALITIES:
+                viewer.set_quality(message["quality"])
+
+    async def send():
+        async for data in relay.camera(camera).frames(viewer):
+            await websocket.send_bytes(data)
+
+    tasks = [asyncio.create_task(receive()), asyncio.create_task(send())]
+    try:
+        # Whichever ends first (usually the client going away) stops the other
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with contextlib.suppress(Exception, asyncio.CancelledError, WebSocketDisconnect):
+                await task
+        relay.disconnect(viewer)
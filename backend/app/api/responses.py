@@ -0,0 +1,93 @@
+import gzip
+import os
+import re
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+
+from app.services.cache_service import CachedEntry
+
+FILE_CHUNK_SIZE = 256 * 1024
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+GZIP_MIN_BYTES = 1400
+
+
+def conditional_json(request: Request, entry: CachedEntry, compress: bool = False) -> Response:
+    """Serve a cached JSON body with its ETag, or 304 when the client already has it
+
+    With ``compress``, large bodies are gzipped for clients that accept it.
+    """
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if compress:
+        headers["Vary"] = "Accept-Encoding"
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and entry.etag in (tag.strip().replace("W/", "", 1) for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    body = entry.body.encode("utf-8")
+    if compress and len(body) >= GZIP_MIN_BYTES and "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        body = gzip.compress(body, compresslevel=5)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive ``(start, end)`` of a single-range ``Range`` header, ``None`` for the whole body"""
+    if not header:
+        return None
+    match = _RANGE.match(header.strip())
+    # Multi-range requests are served whole, as RFC 9110 allows
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first:
+        start, end = int(first), int(last) if last else size - 1
+    else:
+        start, end = max(0, size - int(last)), size - 1
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, min(end, size - 1)
+
+
+def ranged_response(
+    request: Request,
+    size: int,
+    read: Callable[[int, int], Iterator[bytes]],
+    media_type: str,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """Stream ``read(start, end)`` with ``Range`` support (206 + Content-Range)"""
+    headers = {"Accept-Ranges": "bytes", **(headers or {})}
+    byte_range = parse_range(request.headers.get("range"), size) if size else None
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(read(0, size - 1), media_type=media_type, headers=headers)
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(read(start, end), status_code=206, media_type=media_type, headers=headers)
+
+
+def read_file_range(path: str) -> Callable[[int, int], Iterator[bytes]]:
+    """Range reader over a plain file, for ``ranged_response``"""
+    def read(start: int, end: int) -> Iterator[bytes]:
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(FILE_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+    return read
+
+
+def file_response(request: Request, path: str, media_type: str, filename: Optional[str] = None) -> Response:
+    """Serve a file from disk with ``Range`` support"""
+    headers = {}
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return ranged_response(request, os.path.getsize(path), read_file_range(path), media_type, headers)
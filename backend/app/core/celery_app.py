@@ -0,0 +1,51 @@
+"""
+Celery application shared by the API and the workers
+
+The API only needs the app to enqueue tasks by name and read their state, so
+it imports this module instead of ``app.tasks``, which pulls in the SSH stack.
+The workers (and beat) load ``app.tasks``, which registers the tasks here.
+"""
+
+from celery import Celery
+
+from app.core.config import settings
+
+# --- Configuración de Celery ---
+celery_app = Celery(
+    'atriz_tasks',
+    broker=settings.redis_url,
+    backend=settings.redis_url,
+    include=['app.tasks'],  # los workers registran las tareas al arrancar
+)
+
+# Configuración adicional de Celery
+celery_app.conf.update(
+    task_serializer='json',
+    accept_content=['json'],
+    result_serializer='json',
+    timezone='America/Bogota',
+    enable_utc=True,
+    task_track_started=True,
+    task_time_limit=30 * 60,  # 30 minutos
+    task_soft_time_limit=25 * 60,  # 25 minutos
+    # (solo en prefork: con el pool "threads" el plazo es WORKER_TASK_TIMEOUT en app.tasks)
+    # El resultado definitivo vive en Postgres y se avisa por el stream de eventos
+    # del usuario; en el backend de Redis solo hace falta un rato (chords, estado en curso)
+    result_expires=settings.celery_result_expires,
+    # Ejecuciones desacopladas: un poller periódico recoge salida y resultados
+    beat_schedule={
+        'poll-detached-runs': {
+            'task': 'poll_detached_runs',
+            'schedule': settings.detached_poll_interval,
+        },
+    },
+    # Planificación por robot: cola por robot/grupo, prioridades y sin acaparar trabajos
+    task_default_queue='default',
+    task_acks_late=True,
+    worker_prefetch_multiplier=1,
+    broker_transport_options={
+        'priority_steps': list(range(10)),
+        'sep': ':',
+        'queue_order_strategy': 'priority',
+    },
+)
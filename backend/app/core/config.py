@@ -1,5 +1,10 @@
 import os
-from typing import Optional
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+# Every entry point (API, worker, benchmarks) reads .env before the settings are built
+load_dotenv()
 
 class Settings:
     """Application settings loaded from environment variables"""
@@ -17,19 +22,192 @@ class Settings:
         self.postgres_db = os.getenv("POSTGRES_DB", "atriz_experiments")
         self.postgres_host = os.getenv("POSTGRES_HOST", "localhost")
         self.postgres_port = int(os.getenv("POSTGRES_PORT", "5432"))
+        self.db_pool_size = int(os.getenv("DB_POOL_SIZE", "10"))
+        self.db_max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+        self.db_pool_timeout = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+        self.db_pool_recycle = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+        self.status_flush_interval = float(os.getenv("STATUS_FLUSH_INTERVAL", "0.05"))
+        self.status_flush_max_batch = int(os.getenv("STATUS_FLUSH_MAX_BATCH", "500"))
         
         # Redis Configuration
         self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+        # Read cache (Redis) in front of dashboard polling; writes invalidate it
+        self.cache_enabled = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+        self.cache_ttl_experiments = float(os.getenv("CACHE_TTL_EXPERIMENTS", "30"))
+        self.cache_ttl_task_active = float(os.getenv("CACHE_TTL_TASK_ACTIVE", "2"))
+        self.cache_ttl_task_final = float(os.getenv("CACHE_TTL_TASK_FINAL", "300"))
         
         # Robot SSH Configuration
         self.robot_host = os.getenv("ROBOT_HOST", "192.168.1.100")
         self.robot_user = os.getenv("ROBOT_USER", "sphero")
         self.ssh_private_key_path = os.getenv("SSH_PRIVATE_KEY_PATH", "C:\\Users\\Public\\.ssh\\id_rsa_atriz")
-        
+
+        # Robot Fleet: registered robots and groups ("arena1=host1,host2;arena2=host3")
+        self.robot_hosts = [h.strip() for h in os.getenv("ROBOT_HOSTS", self.robot_host).split(",") if h.strip()]
+        self.robot_groups = self._parse_robot_groups(os.getenv("ROBOT_GROUPS", ""))
+
+        # Scheduling: one active script per robot, enforced with a Redis lease
+        self.robot_lease_ttl = float(os.getenv("ROBOT_LEASE_TTL", "120"))
+        self.robot_lease_retry_delay = float(os.getenv("ROBOT_LEASE_RETRY_DELAY", "5"))
+        self.worker_queues = os.getenv("WORKER_QUEUES", "")
+        # Robot jobs are network-bound: threads feeding one asyncio loop per process
+        self.worker_pool = os.getenv("WORKER_POOL", "threads")
+        self.worker_concurrency = int(os.getenv("WORKER_CONCURRENCY", "32"))
+        # Deadline of each task's coroutine: the threads pool ignores Celery time limits
+        self.worker_task_timeout = float(os.getenv("WORKER_TASK_TIMEOUT", str(25 * 60)))
+
+        # Fleet health: background probes of robots and backing services
+        self.fleet_health_interval = float(os.getenv("FLEET_HEALTH_INTERVAL", "15"))
+        self.fleet_probe_timeout = float(os.getenv("FLEET_PROBE_TIMEOUT", "5"))
+        self.fleet_probe_max_parallel = int(os.getenv("FLEET_PROBE_MAX_PARALLEL", "20"))
+        self.robot_battery_command = os.getenv(
+            "ROBOT_BATTERY_COMMAND", "cat /sys/class/power_supply/*/capacity 2>/dev/null | head -n 1"
+        )
+        self.robot_ros_command = os.getenv(
+            "ROBOT_ROS_COMMAND", "timeout 3 bash -c 'source /opt/ros/noetic/setup.bash && rosnode list' 2>/dev/null"
+        )
+
+        # SSH Connection Pool
+        self.ssh_pool_max_per_host = int(os.getenv("SSH_POOL_MAX_PER_HOST", "4"))
+        self.ssh_pool_idle_timeout = float(os.getenv("SSH_POOL_IDLE_TIMEOUT", "300"))
+        self.ssh_pool_health_check_interval = float(os.getenv("SSH_POOL_HEALTH_CHECK_INTERVAL", "30"))
+        self.ssh_keepalive_interval = float(os.getenv("SSH_KEEPALIVE_INTERVAL", "15"))
+        self.ssh_connect_timeout = float(os.getenv("SSH_CONNECT_TIMEOUT", "10"))
+
+        # Robot Script Execution
+        self.robot_script_timeout = float(os.getenv("ROBOT_SCRIPT_TIMEOUT", "60"))
+        self.task_output_max_chars = int(os.getenv("TASK_OUTPUT_MAX_CHARS", "1048576"))
+        self.task_stream_maxlen = int(os.getenv("TASK_STREAM_MAXLEN", "10000"))
+        self.task_stream_ttl = int(os.getenv("TASK_STREAM_TTL", "3600"))
+        # Followers of a stream that does not exist (yet, or any more) give up after this long
+        self.task_stream_max_idle = float(os.getenv("TASK_STREAM_MAX_IDLE", str(self.task_stream_ttl)))
+
+        # Result delivery: completion events pushed per user; final results live in Postgres
+        self.default_user = os.getenv("DEFAULT_USER", "anonymous")
+        self.user_events_maxlen = int(os.getenv("USER_EVENTS_MAXLEN", "1000"))
+        self.user_events_ttl = int(os.getenv("USER_EVENTS_TTL", "86400"))
+        self.user_events_block_ms = int(os.getenv("USER_EVENTS_BLOCK_MS", "1000"))
+        self.websocket_max_subscriptions = int(os.getenv("WEBSOCKET_MAX_SUBSCRIPTIONS", "50"))
+        self.celery_result_expires = int(os.getenv("CELERY_RESULT_EXPIRES", "1800"))
+
+        # Admission control of robot jobs: token buckets per user and robot, queue depth cap, fair share
+        self.admission_enabled = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+        self.admission_user_rate = float(os.getenv("ADMISSION_USER_RATE", "0.5"))  # jobs/s sustained
+        self.admission_user_burst = float(os.getenv("ADMISSION_USER_BURST", "10"))
+        self.admission_robot_rate = float(os.getenv("ADMISSION_ROBOT_RATE", "0.2"))
+        self.admission_robot_burst = float(os.getenv("ADMISSION_ROBOT_BURST", "5"))
+        self.admission_max_queue_depth = int(os.getenv("ADMISSION_MAX_QUEUE_DEPTH", "200"))
+        self.admission_min_share = int(os.getenv("ADMISSION_MIN_SHARE", "5"))
+        self.admission_fair_share_step = int(os.getenv("ADMISSION_FAIR_SHARE_STEP", "5"))
+        self.admission_rate_window = float(os.getenv("ADMISSION_RATE_WINDOW", "300"))
+        self.admission_default_retry_after = float(os.getenv("ADMISSION_DEFAULT_RETRY_AFTER", "30"))
+        self.admission_max_retry_after = float(os.getenv("ADMISSION_MAX_RETRY_AFTER", "600"))
+        self.admission_job_max_age = int(os.getenv("ADMISSION_JOB_MAX_AGE", "7200"))
+
+        # Reservations: robots booked for a time window; other users' jobs wait for the window to end
+        self.reservation_enabled = os.getenv("RESERVATION_ENABLED", "true").lower() == "true"
+        self.reservation_max_hours = float(os.getenv("RESERVATION_MAX_HOURS", "12"))  # longest booking
+        self.reservation_max_days_ahead = int(os.getenv("RESERVATION_MAX_DAYS_AHEAD", "90"))
+        self.reservation_fit_horizon = float(os.getenv("RESERVATION_FIT_HOURS", "24")) * 3600  # seconds looked at around a booking to pick robots
+        self.reservation_allocation_attempts = int(os.getenv("RESERVATION_ALLOCATION_ATTEMPTS", "3"))
+        self.reservation_max_retry_delay = float(os.getenv("RESERVATION_MAX_RETRY_DELAY", "600"))  # seconds a deferred job sleeps at most
+
+        # Detached runs: scripts keep running on the robot after the worker returns
+        self.detached_max_runtime = int(os.getenv("DETACHED_MAX_RUNTIME", "3600"))
+        self.detached_poll_interval = float(os.getenv("DETACHED_POLL_INTERVAL", "10"))
+        self.detached_log_chunk = int(os.getenv("DETACHED_LOG_CHUNK", str(256 * 1024)))
+        self.detached_unreachable_grace = float(os.getenv("DETACHED_UNREACHABLE_GRACE", "300"))
+
+        # File transfers (SFTP)
+        self.sftp_chunk_size = int(os.getenv("SFTP_CHUNK_SIZE", str(256 * 1024)))
+        self.sftp_max_requests = int(os.getenv("SFTP_MAX_REQUESTS", "16"))
+        self.robot_artifacts_dir = os.getenv("ROBOT_ARTIFACTS_DIR", "/var/tmp/atriz_artifacts")
+        self.artifacts_dir = os.getenv("ARTIFACTS_DIR", "/app/artifacts")
+
+        # Results archive: long outputs leave the task rows for compressed blobs
+        self.results_dir = os.getenv("RESULTS_DIR", "/app/results")
+        self.result_inline_max_chars = int(os.getenv("RESULT_INLINE_MAX_CHARS", "4096"))
+        self.result_frame_size = int(os.getenv("RESULT_FRAME_SIZE", str(1024 * 1024)))
+        self.result_compression_level = int(os.getenv("RESULT_COMPRESSION_LEVEL", "3"))
+        self.results_export_ttl = float(os.getenv("RESULTS_EXPORT_TTL", "300"))
+
+        # Content-addressed script cache on the robots
+        self.robot_cache_dir = os.getenv("ROBOT_CACHE_DIR", "/var/tmp/atriz_cache")
+        self.robot_cache_quota_bytes = int(os.getenv("ROBOT_CACHE_QUOTA_BYTES", str(256 * 1024 * 1024)))
+
+        # Swarm Execution
+        self.swarm_max_parallel = int(os.getenv("SWARM_MAX_PARALLEL", "10"))
+
+        # Parameter sweeps: one submission expands into many robot runs
+        self.sweep_max_runs = int(os.getenv("SWEEP_MAX_RUNS", "5000"))
+
+        # Telemetry Ingestion
+        self.telemetry_flush_interval = float(os.getenv("TELEMETRY_FLUSH_INTERVAL", "1.0"))
+        self.telemetry_flush_max_samples = int(os.getenv("TELEMETRY_FLUSH_MAX_SAMPLES", "20000"))
+        self.telemetry_max_buffered_samples = int(os.getenv("TELEMETRY_MAX_BUFFERED_SAMPLES", "500000"))
+        self.telemetry_rollup_levels = [int(level) for level in os.getenv("TELEMETRY_ROLLUP_LEVELS", "1,10,60").split(",")]
+        self.telemetry_max_flush_attempts = int(os.getenv("TELEMETRY_MAX_FLUSH_ATTEMPTS", "5"))  # then bad batches are quarantined
+        self.telemetry_quarantine_dir = os.getenv("TELEMETRY_QUARANTINE_DIR", os.path.join(self.results_dir, "telemetry_quarantine"))
+
+        # Telemetry replay: downsampled, clock-aligned windows of a whole run
+        self.replay_default_points = int(os.getenv("REPLAY_DEFAULT_POINTS", "1000"))
+        self.replay_max_points = int(os.getenv("REPLAY_MAX_POINTS", "5000"))
+        self.replay_max_gap = float(os.getenv("REPLAY_MAX_GAP", "1.0"))
+        self.replay_cache_ttl = float(os.getenv("REPLAY_CACHE_TTL", "3600"))
+
+        # Swarm metrics: post-processing of a stored run (metres, seconds)
+        self.swarm_metrics_step = float(os.getenv("SWARM_METRICS_STEP", "1.0"))
+        self.swarm_aggregation_radius = float(os.getenv("SWARM_AGGREGATION_RADIUS", "0.3"))
+        self.swarm_coverage_cell = float(os.getenv("SWARM_COVERAGE_CELL", "0.25"))
+        self.swarm_metrics_max_points = int(os.getenv("SWARM_METRICS_MAX_POINTS", "1000"))
+        self.swarm_metrics_max_steps = int(os.getenv("SWARM_METRICS_MAX_STEPS", "50000"))  # robot x time matrix width
+        self.arena_bounds = self._parse_bounds(os.getenv("ARENA_BOUNDS", ""))  # xmin,ymin,xmax,ymax; default: run extent
+
+        # Live video relay: one MJPEG ingest per arena camera, fanned out to the viewers
+        self.arena_cameras = self._parse_cameras(os.getenv("ARENA_CAMERAS", ""))  # arena1=http://cam/mjpeg;...
+        self.video_low_width = int(os.getenv("VIDEO_LOW_WIDTH", "480"))
+        self.video_low_quality = int(os.getenv("VIDEO_LOW_QUALITY", "50"))
+        self.video_idle_timeout = float(os.getenv("VIDEO_IDLE_TIMEOUT", "30"))
+        self.video_reconnect_delay = float(os.getenv("VIDEO_RECONNECT_DELAY", "2"))
+        self.video_read_timeout = float(os.getenv("VIDEO_READ_TIMEOUT", "10"))
+        self.video_max_frame_bytes = int(os.getenv("VIDEO_MAX_FRAME_BYTES", str(4 * 1024 * 1024)))
+        self.video_max_viewers = int(os.getenv("VIDEO_MAX_VIEWERS", "200"))
+
+        # Metrics: worker-side Prometheus exporter
+        self.worker_metrics_port = int(os.getenv("WORKER_METRICS_PORT", "9808"))
+        self.metrics_multiproc_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR", "/tmp/atriz_metrics")
+
         # Security
         self.secret_key = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
         self.algorithm = os.getenv("ALGORITHM", "HS256")
         self.access_token_expire_minutes = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
+    @staticmethod
+    def _parse_robot_groups(value: str) -> Dict[str, List[str]]:
+        groups = {}
+        for entry in value.split(";"):
+            if "=" not in entry:
+                continue
+            name, hosts = entry.split("=", 1)
+            groups[name.strip()] = [h.strip() for h in hosts.split(",") if h.strip()]
+        return groups
+
+    @staticmethod
+    def _parse_bounds(value: str) -> Optional[List[float]]:
+        if not value.strip():
+            return None
+        return [float(v) for v in value.split(",")]
+
+    @staticmethod
+    def _parse_cameras(value: str) -> Dict[str, str]:
+        cameras = {}
+        for entry in value.split(";"):
+            if "=" not in entry:
+                continue
+            name, url = entry.split("=", 1)
+            cameras[name.strip()] = url.strip()
+        return cameras
+
 # Global settings instance
 settings = Settings()
@@ -1,24 +1,87 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.core.metrics import instrument_engine
 
 # Database URL from settings
 DATABASE_URL = settings.database_url or f"postgresql://{settings.postgres_user}:{settings.postgres_password}@{settings.postgres_host}:{settings.postgres_port}/{settings.postgres_db}"
 
-# Create SQLAlchemy engine
-engine = create_engine(DATABASE_URL)
+# Engines are created on first use: importing the models or serving /health
+# does not load a database driver
+_engine = None
 
-# Create SessionLocal class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def get_engine() -> Engine:
+    """Get the shared sync SQLAlchemy engine (psycopg2)"""
+    global _engine
+    if _engine is None:
+        _engine = create_engine(DATABASE_URL)
+        instrument_engine(_engine)
+    return _engine
+
+# Async engine (asyncpg)
+ASYNC_DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+_async_engine = None
+
+def get_async_engine():
+    """Get the shared async SQLAlchemy engine"""
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            ASYNC_DATABASE_URL,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+            pool_pre_ping=True,
+            connect_args={"server_settings": {"application_name": "atriz-lab-api"}},
+        )
+        instrument_engine(_async_engine.sync_engine)
+    return _async_engine
+
+async def dispose_engines() -> None:
+    """Close the pooled connections of the engines that were created"""
+    global _engine, _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+    if _engine is not None:
+        _engine.dispose()
+        _engine = None
+
+# Async sessions are bound to the engine lazily, on first use
+AsyncSessionLocal = sessionmaker(class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+# Sync sessions, bound to the engine the same way
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+class SerializableMixin:
+    """``to_dict`` for every model"""
+
+    def to_dict(self, exclude=()):
+        """Serialize the row to a JSON-friendly dict"""
+        data = {}
+        for column in self.__table__.columns:
+            if column.name in exclude:
+                continue
+            value = getattr(self, column.name)
+            data[column.name] = value.isoformat() if hasattr(value, "isoformat") else value
+        return data
 
 # Create Base class for models
-Base = declarative_base()
+Base = declarative_base(cls=SerializableMixin)
 
 def get_db():
     """Dependency to get database session"""
-    db = SessionLocal()
+    db = SessionLocal(bind=get_engine())
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    """Dependency to get an async database session"""
+    async with AsyncSessionLocal(bind=get_async_engine()) as db:
+        yield db
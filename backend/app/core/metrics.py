@@ -0,0 +1,142 @@
+"""
+Prometheus metrics shared by the API and the Celery workers
+
+With ``PROMETHEUS_MULTIPROC_DIR`` set (several uvicorn workers, prefork Celery
+children) every process writes its samples to that directory and the exporters
+aggregate them; otherwise the default in-process registry is used.
+"""
+
+import os
+import time
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+from sqlalchemy import event
+from starlette.routing import Match
+
+# Remote phases go from milliseconds (cached upload) to minutes (long scripts)
+PHASE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+DB_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "COPY"}
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "atriz_http_request_duration_seconds", "HTTP request latency", ["method", "route", "status"]
+)
+ROBOT_PHASE_SECONDS = Histogram(
+    "atriz_robot_phase_duration_seconds", "Duration of each phase of a robot run", ["phase"], buckets=PHASE_BUCKETS
+)
+ROBOT_RUNS = Counter("atriz_robot_runs_total", "Robot runs by outcome", ["status"])
+ROBOT_BUSY = Gauge("atriz_robot_busy", "1 while a job holds the robot lease", ["robot"], multiprocess_mode="livemax")
+ROBOT_BUSY_SECONDS = Counter(
+    "atriz_robot_busy_seconds_total", "Time robots spent leased to a job (rate() = utilization)", ["robot"]
+)
+ADMISSION_DECISIONS = Counter(
+    "atriz_admission_decisions_total", "Robot job submissions by admission outcome", ["outcome"]
+)
+CELERY_QUEUE_DEPTH = Gauge(
+    "atriz_celery_queue_depth", "Messages waiting in each Celery queue", ["queue"], multiprocess_mode="livemax"
+)
+DB_QUERY_SECONDS = Histogram(
+    "atriz_db_query_duration_seconds", "Database statement latency", ["operation"], buckets=FAST_BUCKETS
+)
+DB_TRANSACTION_SECONDS = Histogram(
+    "atriz_db_transaction_duration_seconds", "Batched write transactions, commit included", ["operation"], buckets=FAST_BUCKETS
+)
+REDIS_COMMAND_SECONDS = Histogram(
+    "atriz_redis_command_duration_seconds", "Redis command latency", ["command"], buckets=FAST_BUCKETS
+)
+VIDEO_VIEWERS = Gauge(
+    "atriz_video_viewers", "Connected video viewers", ["camera", "rendition"], multiprocess_mode="livesum"
+)
+VIDEO_FRAMES_INGESTED = Counter("atriz_video_frames_ingested_total", "Frames received from each camera", ["camera"])
+VIDEO_FRAMES_SENT = Counter("atriz_video_frames_sent_total", "Frames delivered to viewers", ["camera", "rendition"])
+VIDEO_FRAMES_DROPPED = Counter(
+    "atriz_video_frames_dropped_total", "Frames skipped because a viewer was still busy with an older one", ["camera", "rendition"]
+)
+VIDEO_FRAME_LATENCY_SECONDS = Histogram(
+    "atriz_video_frame_latency_seconds", "Camera ingest to viewer delivery", ["camera", "rendition"], buckets=FAST_BUCKETS
+)
+
+
+def _registry():
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render_metrics() -> bytes:
+    """Current samples in the Prometheus text format"""
+    return generate_latest(_registry())
+
+
+def start_worker_exporter(port: int) -> None:
+    """Serve the metrics of every worker process over HTTP (background thread)"""
+    start_http_server(port, registry=_registry())
+
+
+def mark_process_dead(pid: int) -> None:
+    """Drop the live gauges of an exited worker child"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
+
+
+def instrument_engine(engine) -> None:
+    """Time every statement executed by a (sync) SQLAlchemy engine"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("atriz_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["atriz_query_start"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+        DB_QUERY_SECONDS.labels(operation if operation in DB_OPERATIONS else "OTHER").observe(
+            time.perf_counter() - started
+        )
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing HTTP requests by route template (not raw path)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUEST_SECONDS.labels(scope["method"], self._route(scope), str(status)).observe(
+                time.perf_counter() - started
+            )
+
+    @staticmethod
+    def _route(scope) -> str:
+        for route in scope["app"].routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return "unmatched"
@@ -0,0 +1,37 @@
+import asyncio
+import weakref
+
+import redis.asyncio as aioredis
+from redis.asyncio.client import Pipeline
+
+from app.core.config import settings
+from app.core.metrics import REDIS_COMMAND_SECONDS
+
+
+class _TimedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        with REDIS_COMMAND_SECONDS.labels("PIPELINE").time():
+            return await super().execute(raise_on_error)
+
+
+class TimedRedis(aioredis.Redis):
+    """Redis client recording the latency of every command"""
+
+    async def execute_command(self, *args, **options):
+        with REDIS_COMMAND_SECONDS.labels(str(args[0]).upper()).time():
+            return await super().execute_command(*args, **options)
+
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> Pipeline:
+        return _TimedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+# One client per event loop: redis.asyncio connections are bound to their loop
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aioredis.Redis]" = weakref.WeakKeyDictionary()
+
+
+def get_redis() -> aioredis.Redis:
+    """Get the async Redis client for the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = TimedRedis.from_url(settings.redis_url, decode_responses=True)
+    return client
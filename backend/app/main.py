@@ -1,8 +1,33 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.api.endpoints import health, experiments, tasks
-import uvicorn
+from app.core.db import dispose_engines
+from app.core.metrics import MetricsMiddleware
+from app.api.endpoints import health, experiments, tasks, telemetry, robots, video, reservations
+from app.services.fleet_health import get_fleet_monitor
+from app.services.ssh_pool import get_ssh_pool
+from app.services.telemetry_service import get_telemetry_ingestor
+from app.services.video_relay import get_video_relay
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the background subsystems, then stop them in reverse order on shutdown
+
+    Nothing here connects to anything: database engines, Redis clients, SSH
+    connections and camera streams are opened by whatever uses them first.
+    """
+    get_telemetry_ingestor().start()
+    get_fleet_monitor().start()
+    try:
+        yield
+    finally:
+        await get_video_relay().stop()
+        await get_fleet_monitor().stop()
+        # Flush the samples still buffered before the engines go away
+        await get_telemetry_ingestor().stop()
+        await get_ssh_pool().close()
+        await dispose_engines()
 
 # Create FastAPI instance
 app = FastAPI(
@@ -10,7 +35,8 @@ app = FastAPI(
     description="API for Atriz Lab experiments and data management",
     version=settings.api_version,
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # Configure CORS
@@ -22,10 +48,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Time every request by route
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(health.router)
 app.include_router(experiments.router)
 app.include_router(tasks.router)
+app.include_router(telemetry.router)
+app.include_router(robots.router)
+app.include_router(video.router)
+app.include_router(reservations.router)
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run(app, host="0.0.0.0", port=8000)
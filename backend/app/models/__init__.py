@@ -1,5 +1,7 @@
 # SQLAlchemy Models Package
 from .experiment import Experiment
 from .task import Task
+from .telemetry import TelemetrySample, TelemetryRollup
+from .reservation import Reservation, ReservationSlot
 
-__all__ = ["Experiment", "Task"]
+__all__ = ["Experiment", "Task", "TelemetrySample", "TelemetryRollup", "Reservation", "ReservationSlot"]
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, Float
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, Float, Index, DDL, event, literal_column
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.sql import func
 from app.core.db import Base
 
@@ -26,7 +27,29 @@ class Experiment(Base):
     
     # Metadata
     is_active = Column(Boolean, default=True)
-    tags = Column(String(500), nullable=True)  # comma-separated tags
+    tags = Column(ARRAY(String(64)), nullable=True)
     
     def __repr__(self):
         return f"<Experiment(id={self.id}, name='{self.name}', status='{self.status}')>"
+
+Index("ix_experiments_status_created_at", Experiment.status, Experiment.created_at)
+Index("ix_experiments_robot_host_created_at", Experiment.robot_host, Experiment.created_at)
+Index("ix_experiments_tags", Experiment.tags, postgresql_using="gin")
+
+# Full-text document of an experiment. Constants are literals rather than bind
+# parameters, so queries repeat the exact expression of the GIN index below.
+SEARCH_CONFIG = literal_column("'simple'::regconfig")
+SEARCH_DOCUMENT = func.to_tsvector(
+    SEARCH_CONFIG,
+    func.coalesce(Experiment.name, literal_column("''")).op("||")(literal_column("' '"))
+    .op("||")(func.coalesce(Experiment.description, literal_column("''"))),
+)
+
+event.listen(
+    Experiment.__table__,
+    "after_create",
+    DDL("""
+        CREATE INDEX IF NOT EXISTS ix_experiments_search ON experiments
+        USING gin (to_tsvector('simple'::regconfig, coalesce(name, '') || ' ' || coalesce(description, '')))
+    """).execute_if(dialect="postgresql")
+)
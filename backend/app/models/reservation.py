@@ -0,0 +1,55 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, CheckConstraint, DDL, event
+from sqlalchemy.sql import func
+from app.core.db import Base
+
+class Reservation(Base):
+    __tablename__ = "reservations"
+
+    # One booking: ``robot_count`` robots for a time window, allocated as slots
+    id = Column(Integer, primary_key=True, index=True)
+    owner = Column(String(64), nullable=False, index=True)
+    experiment_id = Column(Integer, ForeignKey("experiments.id"), nullable=True)
+    robot_group = Column(String(64), nullable=True)  # group the robots were taken from, if one was asked for
+    robot_count = Column(Integer, nullable=False)
+    starts_at = Column(DateTime(timezone=True), nullable=False)
+    ends_at = Column(DateTime(timezone=True), nullable=False)
+    note = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (CheckConstraint("ends_at > starts_at", name="ck_reservations_window"),)
+
+    def __repr__(self):
+        return f"<Reservation(id={self.id}, owner='{self.owner}', robots={self.robot_count}, starts_at={self.starts_at})>"
+
+class ReservationSlot(Base):
+    __tablename__ = "reservation_slots"
+
+    # One allocated robot of a reservation; owner and window are copied so
+    # conflict and dispatch checks read this table alone
+    id = Column(Integer, primary_key=True)
+    reservation_id = Column(Integer, ForeignKey("reservations.id", ondelete="CASCADE"), nullable=False, index=True)
+    robot_host = Column(String(255), nullable=False)
+    owner = Column(String(64), nullable=False)
+    starts_at = Column(DateTime(timezone=True), nullable=False)
+    ends_at = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<ReservationSlot(reservation_id={self.reservation_id}, robot_host='{self.robot_host}', starts_at={self.starts_at})>"
+
+# Time window of a slot. Queries repeat the exact expression of the GiST
+# indexes below ('[)' bounds: back-to-back bookings do not overlap).
+SLOT_PERIOD = func.tstzrange(ReservationSlot.starts_at, ReservationSlot.ends_at)
+
+# Postgres rejects overlapping slots of one robot itself, so two concurrent
+# bookings can never both get it; the exclusion constraint's GiST index
+# (robot, period) also serves the conflict and dispatch checks, and the
+# period index serves calendar windows over the whole fleet.
+for statement in (
+    "CREATE EXTENSION IF NOT EXISTS btree_gist",
+    """
+    ALTER TABLE reservation_slots ADD CONSTRAINT reservation_slots_no_overlap
+    EXCLUDE USING gist (robot_host WITH =, tstzrange(starts_at, ends_at) WITH &&)
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_reservation_slots_period ON reservation_slots USING gist (tstzrange(starts_at, ends_at))",
+):
+    event.listen(ReservationSlot.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
@@ -14,6 +14,8 @@ class Task(Base):
     
     # Foreign key to experiment
     experiment_id = Column(Integer, ForeignKey("experiments.id"), nullable=True)
+    sweep_id = Column(String(64), nullable=True, index=True)  # parameter sweep this run belongs to
+    owner = Column(String(64), nullable=True, index=True)  # submitting user, whose event stream gets the completion
     
     # Task parameters
     host = Column(String(255), nullable=True)
@@ -24,6 +26,7 @@ class Task(Base):
     # Results
     result = Column(Text, nullable=True)
     error = Column(Text, nullable=True)
+    result_ref = Column(String(500), nullable=True)  # results archive directory of outputs too long to keep inline
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
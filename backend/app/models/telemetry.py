@@ -0,0 +1,62 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float, SmallInteger, ForeignKey, DDL, event
+from sqlalchemy.dialects.postgresql import ARRAY
+from app.core.db import Base
+
+class TelemetrySample(Base):
+    __tablename__ = "telemetry_samples"
+
+    # Time-series key: one row per robot sample
+    experiment_id = Column(Integer, ForeignKey("experiments.id"), primary_key=True)
+    robot_id = Column(String(64), primary_key=True)
+    ts = Column(DateTime(timezone=True), primary_key=True)
+
+    # Pose
+    x = Column(Float(precision=24), nullable=False)
+    y = Column(Float(precision=24), nullable=False)
+    theta = Column(Float(precision=24), nullable=False)
+
+    # Sensors
+    floor_color = Column(SmallInteger, nullable=True)  # color index reported by the RVR color sensor
+    ir = Column(ARRAY(SmallInteger), nullable=True)
+    lidar_min = Column(Float(precision=24), nullable=True)
+    lidar_mean = Column(Float(precision=24), nullable=True)
+    lidar_front = Column(Float(precision=24), nullable=True)
+
+    def __repr__(self):
+        return f"<TelemetrySample(experiment_id={self.experiment_id}, robot_id='{self.robot_id}', ts={self.ts})>"
+
+class TelemetryRollup(Base):
+    __tablename__ = "telemetry_rollups"
+
+    # One row per robot and time bucket, for each rollup resolution
+    experiment_id = Column(Integer, ForeignKey("experiments.id"), primary_key=True)
+    robot_id = Column(String(64), primary_key=True)
+    bucket_seconds = Column(Integer, primary_key=True)
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+
+    # Additive aggregates so buckets can be merged across flushes
+    sample_count = Column(Integer, nullable=False)
+    x_sum = Column(Float, nullable=False)
+    y_sum = Column(Float, nullable=False)
+    x_min = Column(Float, nullable=False)
+    x_max = Column(Float, nullable=False)
+    y_min = Column(Float, nullable=False)
+    y_max = Column(Float, nullable=False)
+    lidar_min = Column(Float, nullable=True)
+
+    def __repr__(self):
+        return f"<TelemetryRollup(experiment_id={self.experiment_id}, robot_id='{self.robot_id}', bucket_seconds={self.bucket_seconds}, bucket_start={self.bucket_start})>"
+
+# Turn the samples table into a TimescaleDB hypertable when the extension is available
+event.listen(
+    TelemetrySample.__table__,
+    "after_create",
+    DDL("""
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'timescaledb') THEN
+                PERFORM create_hypertable('telemetry_samples', 'ts', if_not_exists => TRUE);
+            END IF;
+        END $$;
+    """).execute_if(dialect="postgresql")
+)
@@ -0,0 +1,295 @@
+import json
+import logging
+import time
+from collections import Counter
+from typing import Any, Dict, NamedTuple, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.metrics import ADMISSION_DECISIONS
+from app.core.redis import get_redis
+from app.services.scheduler import DEFAULT_QUEUE
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "atriz:admission"
+COMPLETION_BUCKET = 10  # seconds per completion counter, for the service rate
+MAX_DEMOTION = 2  # priority steps a busy user can lose: never down to the next class (see PRIORITIES)
+
+ADMITTED, RATE_LIMITED, FAIR_SHARE, QUEUE_FULL = range(4)
+OUTCOMES = {ADMITTED: "admitted", RATE_LIMITED: "rate_limited", FAIR_SHARE: "fair_share", QUEUE_FULL: "queue_full"}
+
+# One round trip, atomic, for one submission of one or more jobs (a sweep
+# submits all its runs at once): drop stale jobs, check the depth and the
+# user's fair share of every queue the jobs go to, then every token bucket,
+# then consume and record the jobs.
+# KEYS: jobs (zset) and jobs per user (hash) of each queue, token buckets, job keys
+# ARGV: now, user, max age, max depth, min share, #queues, #buckets, #jobs,
+#       then jobs per queue, (rate, burst, cost) per bucket, (member, queue index, job) per job
+_ADMIT_SCRIPT = """
+local now, user = tonumber(ARGV[1]), ARGV[2]
+local max_age, max_depth, min_share = tonumber(ARGV[3]), tonumber(ARGV[4]), tonumber(ARGV[5])
+local nq, nb, nj = tonumber(ARGV[6]), tonumber(ARGV[7]), tonumber(ARGV[8])
+
+local stats = {}
+local worst = 1
+for q = 1, nq do
+    local jobs, per_user = KEYS[2 * q - 1], KEYS[2 * q]
+    for _, member in ipairs(redis.call('zrangebyscore', jobs, '-inf', now - max_age)) do
+        redis.call('zrem', jobs, member)
+        local owner = string.match(member, '|(.*)$')
+        if redis.call('hincrby', per_user, owner, -1) <= 0 then
+            redis.call('hdel', per_user, owner)
+        end
+    end
+    local cost = tonumber(ARGV[8 + q])
+    local depth = redis.call('zcard', jobs)
+    local queued = tonumber(redis.call('hget', per_user, user) or '0')
+    local users = redis.call('hlen', per_user)
+    if queued == 0 then
+        users = users + 1
+    end
+    local share = math.max(min_share, math.floor(max_depth / users))
+    if depth + cost > max_depth then
+        return {3, 0, q, depth, queued, share, users}
+    end
+    if queued + cost > share then
+        return {2, 0, q, depth, queued, share, users}
+    end
+    stats[q] = {depth, queued, share, users}
+    if queued > stats[worst][2] then
+        worst = q
+    end
+end
+
+-- A bucket must hold one token, or the whole cost if that fits in a burst;
+-- a larger submission leaves it in debt, so the next one waits for the refill
+local wait = 0
+local levels = {}
+local base = 8 + nq
+for i = 1, nb do
+    local rate, burst, cost = tonumber(ARGV[base + 3 * i - 2]), tonumber(ARGV[base + 3 * i - 1]), tonumber(ARGV[base + 3 * i])
+    local state = redis.call('hmget', KEYS[2 * nq + i], 'tokens', 'ts')
+    local level = tonumber(state[1]) or burst
+    local since = now - (tonumber(state[2]) or now)
+    level = math.min(burst, level + math.max(0, since) * rate)
+    local needed = math.max(1, math.min(cost, burst))
+    if level < needed then
+        wait = math.max(wait, (needed - level) / rate)
+    end
+    levels[i] = level - cost
+end
+local s = stats[worst]
+if wait > 0 then
+    return {1, math.ceil(wait * 1000), worst, s[1], s[2], s[3], s[4]}
+end
+
+for i = 1, nb do
+    local rate, burst = tonumber(ARGV[base + 3 * i - 2]), tonumber(ARGV[base + 3 * i - 1])
+    redis.call('hset', KEYS[2 * nq + i], 'tokens', tostring(levels[i]), 'ts', ARGV[1])
+    redis.call('pexpire', KEYS[2 * nq + i], math.ceil((burst - levels[i]) / rate * 1000) + 1000)
+end
+base = base + 3 * nb
+for j = 1, nj do
+    local member, q, job = ARGV[base + 3 * j - 2], tonumber(ARGV[base + 3 * j - 1]), ARGV[base + 3 * j]
+    redis.call('zadd', KEYS[2 * q - 1], now, member)
+    redis.call('hincrby', KEYS[2 * q], user, 1)
+    redis.call('set', KEYS[2 * nq + nb + j], job, 'px', max_age * 1000)
+end
+for q = 1, nq do
+    redis.call('pexpire', KEYS[2 * q - 1], max_age * 1000)
+    redis.call('pexpire', KEYS[2 * q], max_age * 1000)
+end
+return {0, 0, worst, s[1], s[2], s[3], s[4]}
+"""
+
+# KEYS: job key, jobs of the queue, jobs per user, completion counter
+# ARGV: member, user, counter TTL
+_RELEASE_SCRIPT = """
+if redis.call('del', KEYS[1]) == 0 then
+    return 0
+end
+if redis.call('zrem', KEYS[2], ARGV[1]) == 1 then
+    if redis.call('hincrby', KEYS[3], ARGV[2], -1) <= 0 then
+        redis.call('hdel', KEYS[3], ARGV[2])
+    end
+end
+redis.call('incr', KEYS[4])
+redis.call('expire', KEYS[4], ARGV[3])
+return 1
+"""
+
+
+class AdmissionRejected(RuntimeError):
+    """Raised when a submission is refused; ``retry_after`` is in seconds"""
+
+    def __init__(self, reason: str, message: str, retry_after: float):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Admission(NamedTuple):
+    queue: str
+    demotion: int  # priority steps added to the job: users with a backlog yield to the others
+    queued: int  # the user's jobs in the queue before this one
+    share: int
+    users: int
+
+
+def jobs_key(queue: str) -> str:
+    """Admitted jobs of a queue that did not finish yet (task id | user, scored by admission time)"""
+    return f"{PREFIX}:{queue}:jobs"
+
+
+def users_key(queue: str) -> str:
+    return f"{PREFIX}:{queue}:users"
+
+
+def job_key(task_id: str) -> str:
+    return f"{PREFIX}:job:{task_id}"
+
+
+def bucket_key(kind: str, name: str) -> str:
+    return f"{PREFIX}:bucket:{kind}:{name}"
+
+
+def completions_key(queue: str, bucket: int) -> str:
+    return f"{PREFIX}:{queue}:done:{bucket}"
+
+
+async def service_rate(queue: str) -> Optional[float]:
+    """Admitted jobs of the queue finished per second, over at most the last ``admission_rate_window``
+
+    ``None`` while nothing finished in the window (nothing to base an estimate on).
+    """
+    last = int(time.time() // COMPLETION_BUCKET)
+    buckets = max(1, int(settings.admission_rate_window // COMPLETION_BUCKET))
+    counts = [int(count or 0) for count in await get_redis().mget([completions_key(queue, last - i) for i in range(buckets)])]
+    finished = sum(counts)
+    if not finished:
+        return None
+    # Measured since the oldest completion in the window, not over a window still filling up
+    span = max(i for i, count in enumerate(counts) if count) + 1
+    return finished / (span * COMPLETION_BUCKET)
+
+
+def _bounded(seconds: float) -> float:
+    return min(settings.admission_max_retry_after, max(1.0, seconds))
+
+
+def _retry_after(jobs: int, rate: Optional[float]) -> float:
+    """Seconds until ``jobs`` more jobs finish at ``rate`` (the configured default when unmeasured)"""
+    return _bounded(jobs / rate if rate else settings.admission_default_retry_after)
+
+
+async def admit(task_id: str, user: str, robot_hosts: Sequence[str], queue: str) -> Admission:
+    """Admit one robot job or raise AdmissionRejected; see ``admit_jobs``"""
+    return await admit_jobs(user, [(task_id, robot_hosts, queue)])
+
+
+async def admit_jobs(user: str, jobs: Sequence[Tuple[str, Sequence[str], str]]) -> Admission:
+    """Admit the robot jobs ``(task id, robot hosts, queue)`` of one submission, all or none
+
+    Each job takes a token from the bucket of its user and of each of its
+    robots; a submission larger than a bucket's burst is admitted only with a
+    full bucket and leaves it in debt, so a 500-run sweep holds off the next
+    submissions until the tokens are earned back. Every queue the jobs go to
+    needs room for them under ``admission_max_queue_depth``, and the user must
+    stay under their fair share of that depth (split between the users with
+    jobs there). Admitted jobs are tracked until ``release``. The returned
+    Admission describes the queue where the user has the most jobs waiting.
+    Raises ValueError when more jobs go to one queue than it can ever hold.
+    """
+    if not settings.admission_enabled or not jobs:
+        return Admission(jobs[0][2] if jobs else DEFAULT_QUEUE, 0, 0, 0, 0)
+    per_queue = Counter(queue for _, _, queue in jobs)
+    queues = list(per_queue)
+    for queue, cost in per_queue.items():
+        if cost > settings.admission_max_queue_depth:
+            raise ValueError(
+                f"{cost} jobs for queue {queue}, admission control lets at most "
+                f"{settings.admission_max_queue_depth} wait there; submit fewer at a time"
+            )
+    per_robot = Counter(host for _, hosts, _ in jobs for host in set(hosts))
+    limits = [(bucket_key("user", user), settings.admission_user_rate, settings.admission_user_burst, len(jobs))]
+    limits += [(bucket_key("robot", host), settings.admission_robot_rate, settings.admission_robot_burst, cost)
+               for host, cost in sorted(per_robot.items())]
+
+    keys = [key for queue in queues for key in (jobs_key(queue), users_key(queue))]
+    keys += [key for key, _, _, _ in limits]
+    keys += [job_key(task_id) for task_id, _, _ in jobs]
+    args = [
+        time.time(), user, settings.admission_job_max_age, settings.admission_max_queue_depth,
+        settings.admission_min_share, len(queues), len(limits), len(jobs),
+    ]
+    args += [per_queue[queue] for queue in queues]
+    for _, rate, burst, cost in limits:
+        args += [rate, burst, cost]
+    for task_id, _, queue in jobs:
+        member = f"{task_id}|{user}"
+        args += [member, queues.index(queue) + 1, json.dumps({"queue": queue, "member": member, "user": user})]
+    try:
+        outcome, wait_ms, index, depth, queued, share, users = await get_redis().eval(_ADMIT_SCRIPT, len(keys), *keys, *args)
+    except Exception as e:
+        # Redis is also the broker: if it is really down, enqueueing fails next anyway
+        logger.warning("Admission check failed, admitting %d jobs of %s: %s", len(jobs), user, e)
+        return Admission(jobs[0][2], 0, 0, 0, 0)
+
+    queue = queues[index - 1]
+    cost = per_queue[queue]
+    ADMISSION_DECISIONS.labels(OUTCOMES[outcome]).inc(len(jobs))
+    if outcome == ADMITTED:
+        demotion = min(MAX_DEMOTION, queued // settings.admission_fair_share_step)
+        return Admission(queue, demotion, queued, share, users)
+    if outcome == RATE_LIMITED:
+        raise AdmissionRejected("rate_limited", "Too many submissions, slow down", _bounded(wait_ms / 1000))
+    rate = await service_rate(queue)
+    if outcome == FAIR_SHARE:
+        # The user's slice of the throughput is what frees their slots
+        raise AdmissionRejected(
+            "fair_share",
+            f"{queued} of your jobs are already waiting on {queue}, {cost} more would exceed "
+            f"your fair share ({share} with {users} users)",
+            _retry_after(queued + cost - share, rate / users if rate else None),
+        )
+    raise AdmissionRejected(
+        "queue_full", f"Queue {queue} has no room for {cost} more jobs ({depth} waiting)",
+        _retry_after(depth + cost - settings.admission_max_queue_depth, rate),
+    )
+
+
+async def release(task_id: str) -> None:
+    """Forget an admitted job once it finished (or was never enqueued). Never raises"""
+    if not settings.admission_enabled:
+        return
+    try:
+        redis = get_redis()
+        raw = await redis.get(job_key(task_id))
+        if raw is None:
+            return  # not admitted here (artifact collection) or already released
+        job = json.loads(raw)
+        bucket = int(time.time() // COMPLETION_BUCKET)
+        await redis.eval(
+            _RELEASE_SCRIPT, 4, job_key(task_id), jobs_key(job["queue"]), users_key(job["queue"]),
+            completions_key(job["queue"], bucket), job["member"], job["user"],
+            int(settings.admission_rate_window + COMPLETION_BUCKET),
+        )
+    except Exception as e:
+        logger.warning("Could not release admission of task %s: %s", task_id, e)
+
+
+async def admission_stats(queues: Sequence[str]) -> Dict[str, Any]:
+    """Admitted jobs per queue and user, with the measured service rate"""
+    redis = get_redis()
+    stats = {}
+    for queue in queues:
+        users = {user: int(count) for user, count in (await redis.hgetall(users_key(queue))).items()}
+        rate = await service_rate(queue)
+        stats[queue] = {
+            "jobs": await redis.zcard(jobs_key(queue)),
+            "max_depth": settings.admission_max_queue_depth,
+            "users": users,
+            "fair_share": max(settings.admission_min_share, settings.admission_max_queue_depth // max(1, len(users))),
+            "service_rate": round(rate, 4) if rate else None,
+        }
+    return stats
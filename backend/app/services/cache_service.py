@@ -0,0 +1,193 @@
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, NamedTuple, Optional, Union
+
+import redis
+
+from app.core.config import settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "atriz:cache:"
+# Bumped on every experiment write: list pages are keyed by it, so one INCR
+# invalidates all of them and old pages simply expire
+EXPERIMENTS_GENERATION_KEY = f"{PREFIX}experiments:generation"
+# Every invalidation of a key also bumps its guard. A reader stores what it
+# loaded only if the guard did not move since its miss: a load that raced
+# with a write can never put the old value back after the invalidation.
+GUARD_TTL = 24 * 3600  # far longer than any load
+_SET_IF_UNCHANGED = """
+if (redis.call('GET', KEYS[2]) or '') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'PX', ARGV[3])
+return 1
+"""
+
+
+class CachedEntry(NamedTuple):
+    body: str  # serialized JSON, served as is
+    etag: str
+
+
+def make_etag(body: str) -> str:
+    return '"' + hashlib.sha1(body.encode("utf-8")).hexdigest()[:20] + '"'
+
+
+def guard_key(key: str) -> str:
+    return f"{key}:guard"
+
+
+def experiment_key(experiment_id: int) -> str:
+    return f"{PREFIX}experiment:{experiment_id}"
+
+
+def task_key(task_id: str) -> str:
+    return f"{PREFIX}task:{task_id}"
+
+
+class ReadCache:
+    """Redis read-through cache for dashboard queries
+
+    Values are stored as serialized JSON with a TTL; writers invalidate the
+    affected keys after their commit (see ``GUARD_TTL`` for loads racing with
+    them). Redis errors never fail a request: the value is loaded from the
+    source instead.
+    """
+
+    def __init__(self, enabled: Optional[bool] = None):
+        self.enabled = settings.cache_enabled if enabled is None else enabled
+        self._sync_client: Optional[redis.Redis] = None
+        self._stats = {"hits": 0, "misses": 0, "errors": 0, "invalidations": 0, "stale_loads": 0}
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Union[float, Callable[[Any], float]],
+    ) -> Optional[CachedEntry]:
+        """Cached value of ``key``, or ``loader()`` stored for ``ttl`` seconds
+        (a callable ``ttl`` gets the value); ``None`` results are not cached"""
+        guard = None
+        if self.enabled:
+            try:
+                body, guard = await get_redis().mget(key, guard_key(key))
+            except Exception as e:
+                self._error("read", e)
+                body = None
+            if body is not None:
+                self._stats["hits"] += 1
+                return CachedEntry(body, make_etag(body))
+            self._stats["misses"] += 1
+
+        value = await loader()
+        if value is None:
+            return None
+        body = json.dumps(value, default=str, separators=(",", ":"))
+        if self.enabled:
+            seconds = ttl(value) if callable(ttl) else ttl
+            try:
+                stored = await get_redis().eval(
+                    _SET_IF_UNCHANGED, 2, key, guard_key(key), guard or "", body, max(1, int(seconds * 1000))
+                )
+                if not stored:
+                    self._stats["stale_loads"] += 1
+            except Exception as e:
+                self._error("write", e)
+        return CachedEntry(body, make_etag(body))
+
+    async def experiment_list_key(self, after_id: Optional[int], limit: int, filters: Optional[Dict[str, Any]] = None) -> str:
+        generation = None
+        if self.enabled:
+            try:
+                generation = await get_redis().get(EXPERIMENTS_GENERATION_KEY)
+            except Exception as e:
+                self._error("read", e)
+        key = f"{PREFIX}experiments:{generation or 0}:{after_id}:{limit}"
+        filters = {name: value for name, value in (filters or {}).items() if value not in (None, [], "")}
+        if filters:
+            # One page per distinct search; the generation still invalidates them all
+            key += ":" + hashlib.sha1(json.dumps(filters, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+        return key
+
+    async def invalidate_experiments(self, experiment_ids: Iterable[int] = ()) -> None:
+        """Drop cached experiments and every cached list page"""
+        if not self.enabled:
+            return
+        try:
+            async with get_redis().pipeline(transaction=False) as pipe:
+                for experiment_id in experiment_ids:
+                    _invalidate(pipe, experiment_key(experiment_id))
+                pipe.incr(EXPERIMENTS_GENERATION_KEY)
+                await pipe.execute()
+            self._stats["invalidations"] += 1
+        except Exception as e:
+            self._error("invalidate", e)
+
+    async def invalidate_tasks(self, task_ids: Iterable[str]) -> None:
+        keys = [task_key(task_id) for task_id in task_ids]
+        if not self.enabled or not keys:
+            return
+        try:
+            async with get_redis().pipeline(transaction=False) as pipe:
+                for key in keys:
+                    _invalidate(pipe, key)
+                await pipe.execute()
+            self._stats["invalidations"] += 1
+        except Exception as e:
+            self._error("invalidate", e)
+
+    def invalidate_experiments_sync(self, experiment_ids: Iterable[int] = ()) -> None:
+        """Blocking variant for the synchronous DBService"""
+        if not self.enabled:
+            return
+        try:
+            pipe = self._sync_redis().pipeline(transaction=False)
+            for experiment_id in experiment_ids:
+                _invalidate(pipe, experiment_key(experiment_id))
+            pipe.incr(EXPERIMENTS_GENERATION_KEY)
+            pipe.execute()
+            self._stats["invalidations"] += 1
+        except Exception as e:
+            self._error("invalidate", e)
+
+    def invalidate_tasks_sync(self, task_ids: Iterable[str]) -> None:
+        keys = [task_key(task_id) for task_id in task_ids]
+        if not self.enabled or not keys:
+            return
+        try:
+            pipe = self._sync_redis().pipeline(transaction=False)
+            for key in keys:
+                _invalidate(pipe, key)
+            pipe.execute()
+            self._stats["invalidations"] += 1
+        except Exception as e:
+            self._error("invalidate", e)
+
+    def _sync_redis(self) -> redis.Redis:
+        if self._sync_client is None:
+            self._sync_client = redis.Redis.from_url(settings.redis_url, decode_responses=True)
+        return self._sync_client
+
+    def _error(self, operation: str, error: Exception) -> None:
+        self._stats["errors"] += 1
+        logger.warning("Read cache %s failed: %s", operation, error)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "enabled": self.enabled,
+            "hit_ratio": self._stats["hits"] / lookups if lookups else None,
+        }
+
+
+def _invalidate(pipe, key: str) -> None:
+    pipe.delete(key)
+    pipe.incr(guard_key(key))
+    pipe.expire(guard_key(key), GUARD_TTL)
+
+
+read_cache = ReadCache()
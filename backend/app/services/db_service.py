@@ -1,7 +1,43 @@
+from datetime import datetime
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from app.models.experiment import Experiment
+from typing import Any, Dict, List, Optional, Sequence
+from app.models.experiment import Experiment, SEARCH_CONFIG, SEARCH_DOCUMENT
 from app.models.task import Task
+from app.services.cache_service import read_cache
+
+def experiment_filters(
+    status: Optional[str] = None,
+    robot_host: Optional[str] = None,
+    tags: Optional[Sequence[str]] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    q: Optional[str] = None,
+) -> list:
+    """WHERE clauses for experiment searches, each one backed by an index"""
+    clauses = []
+    if status is not None:
+        clauses.append(Experiment.status == status)
+    if robot_host is not None:
+        clauses.append(Experiment.robot_host == robot_host)
+    if tags:
+        # Every tag must be present (array containment, GIN index)
+        clauses.append(Experiment.tags.contains(list(tags)))
+    if created_after is not None:
+        clauses.append(Experiment.created_at >= created_after)
+    if created_before is not None:
+        clauses.append(Experiment.created_at < created_before)
+    if q:
+        clauses.append(SEARCH_DOCUMENT.op("@@")(func.websearch_to_tsquery(SEARCH_CONFIG, q)))
+    return clauses
+
+def experiment_query(after_id: Optional[int] = None, limit: int = 100, **filters):
+    """One keyset page of a filtered experiment search"""
+    query = select(Experiment).where(*experiment_filters(**filters))
+    if after_id is not None:
+        query = query.where(Experiment.id > after_id)
+    return query.order_by(Experiment.id).limit(limit)
 
 class DBService:
     """Service for database operations"""
@@ -10,26 +46,28 @@ class DBService:
         self.db = db
     
     # Experiment operations
-    def create_experiment(self, name: str, description: str = None, robot_host: str = None) -> Experiment:
+    def create_experiment(self, name: str, description: str = None, robot_host: str = None, tags: List[str] = None) -> Experiment:
         """Create a new experiment"""
         experiment = Experiment(
             name=name,
             description=description,
             robot_host=robot_host,
+            tags=tags or None,
             status="pending"
         )
         self.db.add(experiment)
         self.db.commit()
         self.db.refresh(experiment)
+        read_cache.invalidate_experiments_sync()
         return experiment
     
     def get_experiment(self, experiment_id: int) -> Optional[Experiment]:
         """Get experiment by ID"""
         return self.db.query(Experiment).filter(Experiment.id == experiment_id).first()
     
-    def get_experiments(self, skip: int = 0, limit: int = 100) -> List[Experiment]:
-        """Get all experiments with pagination"""
-        return self.db.query(Experiment).offset(skip).limit(limit).all()
+    def get_experiments(self, after_id: int = None, limit: int = 100, **filters) -> List[Experiment]:
+        """Get experiments with keyset pagination (ids greater than ``after_id``); see ``experiment_filters``"""
+        return self.db.execute(experiment_query(after_id, limit, **filters)).scalars().all()
     
     def update_experiment_status(self, experiment_id: int, status: str) -> Optional[Experiment]:
         """Update experiment status"""
@@ -38,6 +76,7 @@ class DBService:
             experiment.status = status
             self.db.commit()
             self.db.refresh(experiment)
+            read_cache.invalidate_experiments_sync([experiment_id])
         return experiment
     
     # Task operations
@@ -55,6 +94,14 @@ class DBService:
         self.db.refresh(task)
         return task
     
+    def create_tasks(self, tasks: List[Dict[str, Any]]) -> int:
+        """Insert many tasks in one statement and one commit (no per-row refresh)"""
+        if not tasks:
+            return 0
+        self.db.execute(insert(Task), [{"status": "pending", **task} for task in tasks])
+        self.db.commit()
+        return len(tasks)
+    
     def get_task(self, task_id: str) -> Optional[Task]:
         """Get task by Celery task ID"""
         return self.db.query(Task).filter(Task.task_id == task_id).first()
@@ -70,4 +117,98 @@ class DBService:
                 task.error = error
             self.db.commit()
             self.db.refresh(task)
+            read_cache.invalidate_tasks_sync([task_id])
+        return task
+
+
+class AsyncDBService:
+    """Async counterpart of DBService for use inside the FastAPI event loop"""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    # Experiment operations
+    async def create_experiment(self, name: str, description: str = None, robot_host: str = None, tags: List[str] = None) -> Experiment:
+        """Create a new experiment"""
+        experiment = Experiment(
+            name=name,
+            description=description,
+            robot_host=robot_host,
+            tags=tags or None,
+            status="pending"
+        )
+        self.db.add(experiment)
+        await self.db.commit()
+        await self.db.refresh(experiment)
+        await read_cache.invalidate_experiments()
+        return experiment
+    
+    async def get_experiment(self, experiment_id: int) -> Optional[Experiment]:
+        """Get experiment by ID"""
+        return await self.db.get(Experiment, experiment_id)
+    
+    async def get_experiments(self, after_id: int = None, limit: int = 100, **filters) -> List[Experiment]:
+        """Get experiments with keyset pagination (ids greater than ``after_id``); see ``experiment_filters``"""
+        result = await self.db.execute(experiment_query(after_id, limit, **filters))
+        return result.scalars().all()
+    
+    async def update_experiment_status(self, experiment_id: int, status: str) -> Optional[Experiment]:
+        """Update experiment status"""
+        experiment = await self.get_experiment(experiment_id)
+        if experiment:
+            experiment.status = status
+            await self.db.commit()
+            await self.db.refresh(experiment)
+            await read_cache.invalidate_experiments([experiment_id])
+        return experiment
+    
+    # Task operations
+    async def create_task(self, task_id: str, name: str, task_type: str, experiment_id: int = None, host: str = None, command: str = None, owner: str = None) -> Task:
+        """Create a new task"""
+        task = Task(
+            task_id=task_id,
+            name=name,
+            task_type=task_type,
+            experiment_id=experiment_id,
+            host=host,
+            command=command,
+            owner=owner,
+            status="pending"
+        )
+        self.db.add(task)
+        await self.db.commit()
+        await self.db.refresh(task)
         return task
+    
+    async def get_task(self, task_id: str) -> Optional[Task]:
+        """Get task by Celery task ID"""
+        result = await self.db.execute(select(Task).where(Task.task_id == task_id))
+        return result.scalars().first()
+    
+    async def create_tasks(self, tasks: List[Dict[str, Any]]) -> int:
+        """Insert many tasks in one statement and one commit (no per-row refresh)"""
+        if not tasks:
+            return 0
+        await self.db.execute(insert(Task), [{"status": "pending", **task} for task in tasks])
+        await self.db.commit()
+        return len(tasks)
+    
+    async def fail_pending_tasks(self, task_ids: Sequence[str], error: str) -> int:
+        """Mark tasks that never left ``pending`` as failed (e.g. they could not be enqueued)"""
+        if not task_ids:
+            return 0
+        result = await self.db.execute(
+            update(Task)
+            .where(Task.task_id.in_(task_ids), Task.status == "pending")
+            .values(status="failure", error=error)
+        )
+        await self.db.commit()
+        await read_cache.invalidate_tasks(task_ids)
+        return result.rowcount
+    
+    async def get_sweep_status_counts(self, sweep_id: str) -> Dict[str, int]:
+        """Number of runs of a sweep per task status"""
+        result = await self.db.execute(
+            select(Task.status, func.count()).where(Task.sweep_id == sweep_id).group_by(Task.status)
+        )
+        return {status: count for status, count in result.all()}
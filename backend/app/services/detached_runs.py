@@ -0,0 +1,221 @@
+import json
+import logging
+import posixpath
+import shlex
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.redis import get_redis
+from app.services.script_cache import script_cache
+from app.services.ssh_pool import get_ssh_pool
+from app.services.stream_service import TaskOutputStream
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_RUNS_KEY = "atriz:detached:active"  # set of task ids still running on robots
+POLLER_LOCK_KEY = "atriz:detached:poller"
+STDOUT_LOG = "stdout.log"
+STDERR_LOG = "stderr.log"
+EXIT_CODE_FILE = "exit_code"
+TIMEOUT_EXIT_CODE = 124    # exit status of timeout(1) when the deadline hits
+CANCELLED_EXIT_CODE = 143  # 128 + SIGTERM: stopped through kill_command
+
+
+def handle_key(task_id: str) -> str:
+    return f"atriz:detached:run:{task_id}"
+
+
+def artifacts_dir(run_id: str) -> str:
+    """Directory exported to the script as ``ATRIZ_ARTIFACTS_DIR``; kept after the run"""
+    return posixpath.join(settings.robot_artifacts_dir, run_id)
+
+
+def launch_command(run_id: str, script_name: str, max_runtime: int) -> str:
+    """Start the staged script in its own session and print its PID
+
+    ``setsid nohup`` detaches it from the SSH channel, ``timeout`` enforces the
+    deadline on the robot itself, and the exit status lands in ``exit_code``
+    (written then renamed, so the poller never reads a partial file).
+    """
+    run_dir = script_cache.run_dir(run_id)
+    artifacts = artifacts_dir(run_id)
+    inner = (
+        f"ATRIZ_ARTIFACTS_DIR={shlex.quote(artifacts)} "
+        f"timeout -s TERM -k 10 {int(max_runtime)} python3 {shlex.quote(script_name)} "
+        f"> {STDOUT_LOG} 2> {STDERR_LOG}; "
+        f"echo $? > {EXIT_CODE_FILE}.tmp && mv {EXIT_CODE_FILE}.tmp {EXIT_CODE_FILE}"
+    )
+    return (
+        f"cd {shlex.quote(run_dir)} && mkdir -p {shlex.quote(artifacts)} && "
+        f"{{ setsid nohup sh -c {shlex.quote(inner)} > /dev/null 2>&1 < /dev/null & echo $!; }}"
+    )
+
+
+def state_command(run_id: str, pid: int) -> str:
+    """Print ``exit=<code>``, ``state=running`` or ``state=lost`` in one round trip"""
+    run_dir = shlex.quote(script_cache.run_dir(run_id))
+    return (
+        f"cd {run_dir} 2>/dev/null || {{ echo state=lost; exit 0; }}; "
+        f"if [ -f {EXIT_CODE_FILE} ]; then echo \"exit=$(cat {EXIT_CODE_FILE})\"; "
+        f"elif kill -0 {int(pid)} 2>/dev/null; then echo state=running; else echo state=lost; fi"
+    )
+
+
+def kill_command(pid: int) -> str:
+    """Terminate a detached run
+
+    Only the children of the supervising shell get SIGTERM, so the shell
+    survives to record the exit status; the whole group is the fallback.
+    """
+    return f"pkill -TERM -P {int(pid)} 2>/dev/null || kill -TERM -- -{int(pid)} 2>/dev/null || true"
+
+
+def parse_state(output: str) -> Dict[str, Any]:
+    line = output.strip().splitlines()[-1] if output.strip() else ""
+    if line.startswith("exit="):
+        try:
+            return {"state": "finished", "exit_code": int(line.split("=", 1)[1])}
+        except ValueError:
+            return {"state": "finished", "exit_code": None}
+    return {"state": line.split("=", 1)[1] if line.startswith("state=") else "lost"}
+
+
+def complete_utf8(data: bytes) -> int:
+    """Length of ``data`` up to its last complete UTF-8 character
+
+    A poll can end in the middle of a multi-byte character; its first bytes
+    are left for the next poll instead of being decoded as U+FFFD.
+    """
+    for back in range(1, min(4, len(data)) + 1):
+        byte = data[-back]
+        if byte & 0xC0 == 0x80:
+            continue  # continuation byte: the lead byte is further back
+        needed = 2 if byte & 0xE0 == 0xC0 else 3 if byte & 0xF0 == 0xE0 else 4 if byte & 0xF8 == 0xF0 else 1
+        return len(data) - back if needed > back else len(data)
+    return len(data)
+
+
+async def read_new_output(sftp, entry: Dict[str, Any], stream: Optional[TaskOutputStream]) -> None:
+    """Publish the log bytes written since the last poll and advance the offsets"""
+    run_dir = script_cache.run_dir(entry["run_id"])
+    for name, log in (("stdout", STDOUT_LOG), ("stderr", STDERR_LOG)):
+        offset_field = f"{name}_offset"
+        path = run_dir + log
+        if not await sftp.exists(path):
+            continue
+        async with sftp.open(path, "rb") as f:
+            data = await f.read(settings.detached_log_chunk, entry.get(offset_field, 0))
+        data = data[:complete_utf8(data)]
+        if not data:
+            continue
+        entry[offset_field] = entry.get(offset_field, 0) + len(data)
+        if stream:
+            await stream.publish(name, data.decode("utf-8", errors="replace"))
+
+
+async def read_tail(sftp, path: str, max_chars: int) -> Dict[str, Any]:
+    """Last ``max_chars`` bytes of a remote log (bounded memory, like streamed runs)"""
+    if not await sftp.exists(path):
+        return {"text": "", "truncated": False}
+    size = (await sftp.stat(path)).size or 0
+    start = max(0, size - max_chars)
+    async with sftp.open(path, "rb") as f:
+        data = await f.read(size - start, start)
+    return {"text": data.decode("utf-8", errors="replace"), "truncated": start > 0}
+
+
+async def list_artifacts(sftp, run_id: str) -> List[Dict[str, Any]]:
+    directory = artifacts_dir(run_id)
+    if not await sftp.exists(directory):
+        return []
+    return [
+        {"name": entry.filename, "size": entry.attrs.size}
+        for entry in await sftp.readdir(directory)
+        if entry.filename not in (".", "..")
+    ]
+
+
+async def save_handle(handle: Dict[str, Any]) -> None:
+    """Store (or update) the run handle of a detached task and mark it active"""
+    redis = get_redis()
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.set(handle_key(handle["task_id"]), json.dumps(handle))
+        pipe.sadd(ACTIVE_RUNS_KEY, handle["task_id"])
+        await pipe.execute()
+
+
+async def load_handle(task_id: str) -> Optional[Dict[str, Any]]:
+    raw = await get_redis().get(handle_key(task_id))
+    return json.loads(raw) if raw else None
+
+
+async def active_handles() -> List[Dict[str, Any]]:
+    redis = get_redis()
+    task_ids = sorted(await redis.smembers(ACTIVE_RUNS_KEY))
+    if not task_ids:
+        return []
+    handles = []
+    for task_id, raw in zip(task_ids, await redis.mget([handle_key(t) for t in task_ids])):
+        if raw:
+            handles.append(json.loads(raw))
+        else:
+            await redis.srem(ACTIVE_RUNS_KEY, task_id)
+    return handles
+
+
+async def complete_handle(handle: Dict[str, Any]) -> bool:
+    """Retire a finished run; ``False`` if another poller already did"""
+    redis = get_redis()
+    if not await redis.srem(ACTIVE_RUNS_KEY, handle["task_id"]):
+        return False
+    # Kept for a day for inspection, then gone
+    await redis.set(handle_key(handle["task_id"]), json.dumps(handle), ex=24 * 3600)
+    return True
+
+
+async def acquire_poller_lock(owner: str, ttl: float) -> bool:
+    """Only one poller at a time, even with several beat-driven workers"""
+    return bool(await get_redis().set(POLLER_LOCK_KEY, owner, nx=True, px=int(ttl * 1000)))
+
+
+async def release_poller_lock(owner: str) -> None:
+    redis = get_redis()
+    if await redis.get(POLLER_LOCK_KEY) == owner:
+        await redis.delete(POLLER_LOCK_KEY)
+
+
+async def cancel(task_id: str) -> Optional[Dict[str, Any]]:
+    """Terminate every still-running robot of a detached task; the poller then
+    harvests them as usual. ``None`` if the task is unknown"""
+    handle = await load_handle(task_id)
+    if handle is None:
+        return None
+    signalled = {}
+    for host, entry in handle["robots"].items():
+        if entry["state"] != "running":
+            continue
+        try:
+            async with get_ssh_pool().connection(host) as conn:
+                await conn.run(kill_command(entry["pid"]), check=True)
+            signalled[host] = True
+        except Exception as e:
+            logger.warning("Could not cancel run of task %s on %s: %s", task_id, host, e)
+            signalled[host] = False
+    return signalled
+
+
+def new_robot_entry(host: str, run_id: str, pid: int, max_runtime: int) -> Dict[str, Any]:
+    now = time.time()
+    return {
+        "host": host,
+        "run_id": run_id,
+        "pid": pid,
+        "state": "running",
+        "started_at": now,
+        "deadline": now + max_runtime,
+        "stdout_offset": 0,
+        "stderr_offset": 0,
+        "poll_errors": 0,
+        "result": None,
+    }
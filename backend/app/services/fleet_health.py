@@ -0,0 +1,246 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.db import get_async_engine
+from app.core.redis import get_redis
+from app.services.scheduler import registered_robots
+from app.services.ssh_pool import get_ssh_pool
+
+logger = logging.getLogger(__name__)
+
+ROBOTS_KEY = "atriz:health:robots"      # hash: host -> JSON probe result
+SERVICES_KEY = "atriz:health:services"  # JSON probe result of Postgres, Redis and Celery
+LEADER_KEY = "atriz:health:leader"      # only one API process probes the fleet
+
+ROS_MARKER = "--ros--"
+
+
+def _probe_command() -> str:
+    """One round trip: battery level, then the running ROS nodes and the exit code"""
+    return (
+        f"echo \"battery=$({settings.robot_battery_command})\"; echo {ROS_MARKER}; "
+        f"{settings.robot_ros_command}; echo \"ros_exit=$?\""
+    )
+
+
+def _parse_probe(output: str) -> Dict[str, Any]:
+    battery = None
+    nodes: List[str] = []
+    ros_ok = False
+    in_ros = False
+    for line in output.splitlines():
+        line = line.strip()
+        if line.startswith("battery="):
+            value = line.split("=", 1)[1]
+            try:
+                battery = float(value)
+            except ValueError:
+                battery = None
+        elif line == ROS_MARKER:
+            in_ros = True
+        elif line.startswith("ros_exit="):
+            ros_ok = line.split("=", 1)[1] == "0"
+            in_ros = False
+        elif in_ros and line:
+            nodes.append(line)
+    return {"battery_percent": battery, "ros_ok": ros_ok, "ros_nodes": nodes}
+
+
+class FleetHealthMonitor:
+    """Periodically probes every robot and backing service and caches the result in Redis
+
+    Robots are probed concurrently (SSH banner, command latency, battery and ROS
+    nodes), each bounded by ``probe_timeout`` so a dead robot costs one timeout
+    per interval instead of one per request. Every API process runs a monitor,
+    but a Redis leader key lets only one of them probe at a time; readers only
+    ever touch the cached result.
+    """
+
+    def __init__(self, interval: float = 15.0, probe_timeout: float = 5.0, max_parallel: int = 20):
+        self.interval = interval
+        self.probe_timeout = probe_timeout
+        self.max_parallel = max_parallel
+        self.owner = str(uuid.uuid4())
+        self._loop_task: Optional[asyncio.Task] = None
+
+    async def probe_robot(self, host: str) -> Dict[str, Any]:
+        """Probe one robot; never raises"""
+        result: Dict[str, Any] = {"host": host, "checked_at": time.time()}
+        started = time.perf_counter()
+        try:
+            result.update(await asyncio.wait_for(self._probe_robot(host), self.probe_timeout))
+        except Exception as e:
+            result.update({
+                "status": "offline",
+                "error": str(e) or type(e).__name__,
+                "connect_ms": round((time.perf_counter() - started) * 1000, 1),
+            })
+        return result
+
+    async def _probe_robot(self, host: str) -> Dict[str, Any]:
+        started = time.perf_counter()
+        async with get_ssh_pool().connection(host) as conn:
+            connected = time.perf_counter()
+            completed = await conn.run(_probe_command())
+            latency = time.perf_counter() - connected
+            probe = _parse_probe(completed.stdout or "")
+            return {
+                "status": "online" if probe["ros_ok"] else "degraded",
+                "banner": conn.get_extra_info("server_version"),
+                "connect_ms": round((connected - started) * 1000, 1),
+                "latency_ms": round(latency * 1000, 1),
+                **probe,
+            }
+
+    async def probe_services(self) -> Dict[str, Any]:
+        """Check Postgres, Redis and the Celery workers concurrently"""
+        postgres, redis, celery = await asyncio.gather(
+            self._check(self._check_postgres()),
+            self._check(self._check_redis()),
+            self._check(self._check_celery()),
+        )
+        return {"postgres": postgres, "redis": redis, "celery": celery, "checked_at": time.time()}
+
+    async def _check(self, coro) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            detail = await asyncio.wait_for(coro, self.probe_timeout)
+            return {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 1), **(detail or {})}
+        except Exception as e:
+            return {"ok": False, "error": str(e) or type(e).__name__}
+
+    async def _check_postgres(self) -> None:
+        async with get_async_engine().connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async def _check_redis(self) -> None:
+        await get_redis().ping()
+
+    async def _check_celery(self) -> Dict[str, Any]:
+        from app.core.celery_app import celery_app
+
+        replies = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: celery_app.control.ping(timeout=min(1.0, self.probe_timeout))
+        )
+        workers = sorted(name for reply in replies for name in reply)
+        if not workers:
+            raise RuntimeError("No Celery worker answered")
+        return {"workers": workers}
+
+    async def run_once(self) -> Dict[str, Any]:
+        """Probe everything now and publish the results"""
+        slots = asyncio.Semaphore(self.max_parallel)
+
+        async def probe(host: str) -> Dict[str, Any]:
+            async with slots:
+                return await self.probe_robot(host)
+
+        hosts = registered_robots()
+        robots, services = await asyncio.gather(
+            asyncio.gather(*(probe(host) for host in hosts)),
+            self.probe_services(),
+        )
+        ttl_ms = int(self.interval * 3 * 1000)
+        async with get_redis().pipeline(transaction=True) as pipe:
+            pipe.delete(ROBOTS_KEY)
+            if robots:
+                pipe.hset(ROBOTS_KEY, mapping={r["host"]: json.dumps(r) for r in robots})
+                pipe.pexpire(ROBOTS_KEY, ttl_ms)
+            pipe.set(SERVICES_KEY, json.dumps(services), px=ttl_ms)
+            await pipe.execute()
+        return {"robots": robots, "services": services}
+
+    async def _is_leader(self) -> bool:
+        redis = get_redis()
+        ttl_ms = int(self.interval * 2 * 1000)
+        if await redis.set(LEADER_KEY, self.owner, nx=True, px=ttl_ms):
+            return True
+        if await redis.get(LEADER_KEY) == self.owner:
+            await redis.pexpire(LEADER_KEY, ttl_ms)
+            return True
+        return False
+
+    async def _run_loop(self) -> None:
+        while True:
+            started = time.monotonic()
+            try:
+                if await self._is_leader():
+                    await self.run_once()
+            except Exception as e:
+                logger.warning("Fleet health probe failed: %s", e)
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def start(self) -> None:
+        """Start probing in the background"""
+        if self._loop_task is None:
+            self._loop_task = asyncio.get_running_loop().create_task(self._run_loop())
+
+    async def stop(self) -> None:
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            try:
+                await self._loop_task
+            except asyncio.CancelledError:
+                pass
+            self._loop_task = None
+
+
+def _fresh(entry: Dict[str, Any], max_age: float) -> Dict[str, Any]:
+    """Results older than ``max_age`` seconds are reported as unknown"""
+    if time.time() - entry.get("checked_at", 0) > max_age:
+        return {**entry, "status": "unknown", "stale": True}
+    return entry
+
+
+async def robot_health(hosts: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """Cached probe result per robot (one Redis call; ``unknown`` when never probed)"""
+    redis = get_redis()
+    if hosts is None:
+        raw = await redis.hgetall(ROBOTS_KEY)
+        hosts = list(dict.fromkeys(registered_robots() + list(raw)))
+    else:
+        hosts = list(hosts)
+        raw = dict(zip(hosts, await redis.hmget(ROBOTS_KEY, hosts))) if hosts else {}
+    max_age = settings.fleet_health_interval * 3
+    return {
+        host: _fresh(json.loads(raw[host]), max_age) if raw.get(host) else {"host": host, "status": "unknown"}
+        for host in hosts
+    }
+
+
+async def services_health() -> Optional[Dict[str, Any]]:
+    """Cached probe result of the backing services, ``None`` when never probed"""
+    raw = await get_redis().get(SERVICES_KEY)
+    return json.loads(raw) if raw else None
+
+
+async def offline_robots(hosts: Sequence[str]) -> List[str]:
+    """Robots whose latest probe failed; robots without a fresh probe are given the benefit of the doubt"""
+    try:
+        health = await robot_health(hosts)
+    except Exception as e:
+        logger.warning("Could not read fleet health: %s", e)
+        return []
+    return [host for host, entry in health.items() if entry["status"] == "offline"]
+
+
+_monitor: Optional[FleetHealthMonitor] = None
+
+
+def get_fleet_monitor() -> FleetHealthMonitor:
+    """Get the process-wide fleet health monitor"""
+    global _monitor
+    if _monitor is None:
+        _monitor = FleetHealthMonitor(
+            interval=settings.fleet_health_interval,
+            probe_timeout=settings.fleet_probe_timeout,
+            max_parallel=settings.fleet_probe_max_parallel,
+        )
+    return _monitor
@@ -0,0 +1,289 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.core.db import get_async_engine
+from app.models.telemetry import TelemetryRollup, TelemetrySample
+from app.services.replay_window import MINMAX, METHODS, RESAMPLE, ReplayWindowError, epoch_seconds, plan_window
+from app.services.replay_window import timestamp as _timestamp
+
+FIELDS = ("x", "y", "theta", "lidar_min")
+ROLLUP_FIELDS = ("x", "y", "lidar_min")  # rollups keep no heading
+DECIMALS = 3
+
+Series = Dict[str, np.ndarray]  # "t" (unix seconds, sorted) plus one array per field
+
+
+def choose_level(step: float, levels: Sequence[int]) -> Optional[int]:
+    """Coarsest rollup resolution that still has at least one bucket per step, ``None`` for raw samples"""
+    usable = [level for level in levels if level <= step]
+    return max(usable) if usable else None
+
+
+def resample(series: Series, grid: np.ndarray, fields: Sequence[str], max_gap: float) -> Dict[str, np.ndarray]:
+    """Linear interpolation of every field onto ``grid``; NaN across gaps longer than ``max_gap``"""
+    t = series["t"]
+    # Samples around each grid point: t[i - 1] <= grid < t[i]
+    i = np.searchsorted(t, grid, side="right")
+    before = t[np.clip(i - 1, 0, len(t) - 1)]
+    after = t[np.clip(i, 0, len(t) - 1)]
+    missing = (grid < t[0]) | (grid > t[-1]) | ((after - before) > max_gap)
+    out = {}
+    for name in fields:
+        values = series[name]
+        valid = ~np.isnan(values)
+        if not valid.any():
+            out[name] = np.full(len(grid), np.nan)
+            continue
+        if name == "theta":
+            # Interpolate the unwrapped heading, so -pi -> pi is not a full turn
+            resampled = np.interp(grid, t[valid], np.unwrap(values[valid]))
+            resampled = (resampled + np.pi) % (2 * np.pi) - np.pi
+        else:
+            resampled = np.interp(grid, t[valid], values[valid])
+        resampled[missing] = np.nan
+        out[name] = resampled
+    return out
+
+
+def _bucket_argmax(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Index of the maximum of each segment ``values[starts[k]:starts[k + 1]]``"""
+    segment = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(values))))
+    order = np.lexsort((-values, segment))
+    return order[np.searchsorted(segment[order], np.arange(len(starts)))]
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets over the points ``(x, y)``, vectorized
+
+    Each bucket keeps the point forming the largest triangle with the point
+    kept in the previous bucket and the average of the next one. A first pass
+    anchors on the previous bucket's average, the second on the point the
+    first pass kept, so the loop over buckets runs in NumPy.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    starts, counts = edges[:-1], np.diff(edges)
+    starts, counts = starts[counts > 0], counts[counts > 0]
+    inner = slice(1, n - 1)
+    mean_x = np.add.reduceat(x[inner], starts - 1) / counts
+    mean_y = np.add.reduceat(y[inner], starts - 1) / counts
+    # Next-bucket averages, with the last point closing the series
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    anchor_x = np.append(x[0], mean_x[:-1])
+    anchor_y = np.append(y[0], mean_y[:-1])
+    px, py = x[inner], y[inner]
+    for _ in range(2):
+        ax, ay = np.repeat(anchor_x, counts), np.repeat(anchor_y, counts)
+        cx, cy = np.repeat(next_x, counts), np.repeat(next_y, counts)
+        area = np.abs((ax - cx) * (py - ay) - (ax - px) * (cy - ay))
+        chosen = _bucket_argmax(area, starts - 1) + 1
+        anchor_x = np.append(x[0], x[chosen[:-1]])
+        anchor_y = np.append(y[0], y[chosen[:-1]])
+    return np.concatenate(([0], chosen, [n - 1]))
+
+
+def minmax(series: Series, start: float, step: float, buckets: int, fields: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Per clock bucket, the minimum and maximum of each field (NaN for empty buckets)"""
+    t = series["t"]
+    edges = np.searchsorted(t, start + step * np.arange(buckets + 1))
+    counts = np.diff(edges)
+    filled = counts > 0
+    out = {}
+    for name in fields:
+        # Rollups carry their own per-bucket envelope in <field>_min/<field>_max
+        low = series.get(f"{name}_min", series[name])
+        high = series.get(f"{name}_max", series[name])
+        mins = np.full(buckets, np.nan)
+        maxs = np.full(buckets, np.nan)
+        if filled.any():
+            offsets = edges[:-1][filled]
+            # Samples past the last bucket must not extend its segment
+            mins[filled] = np.fmin.reduceat(low[:edges[-1]], offsets)
+            maxs[filled] = np.fmax.reduceat(high[:edges[-1]], offsets)
+        out[f"{name}_min"] = mins
+        out[f"{name}_max"] = maxs
+    return out
+
+
+def to_json_list(values: np.ndarray, decimals: int = DECIMALS) -> List[Optional[float]]:
+    """Rounded floats, NaN as null"""
+    return [None if v != v else v for v in np.round(values, decimals).tolist()]
+
+
+def _split_by_robot(rows: List[tuple], fields: Sequence[str]) -> Dict[str, Series]:
+    """Rows ``(robot_id, t, *fields)`` ordered by robot and time -> one column set per robot"""
+    if not rows:
+        return {}
+    robots = [row[0] for row in rows]
+    values = np.array([row[1:] for row in rows], dtype=np.float64)
+    boundaries = [0] + [i for i in range(1, len(robots)) if robots[i] != robots[i - 1]] + [len(robots)]
+    result = {}
+    for first, last in zip(boundaries[:-1], boundaries[1:]):
+        block = values[first:last]
+        result[robots[first]] = {"t": block[:, 0], **{name: block[:, k + 1] for k, name in enumerate(fields)}}
+    return result
+
+
+class ReplayService:
+    """Time-windowed, downsampled multi-robot telemetry for the replay view
+
+    The window is served from raw samples only when zoomed in below the
+    finest rollup; otherwise from the rollup buckets written at ingestion,
+    so a whole run costs a few thousand rows per robot instead of every sample.
+    """
+
+    def __init__(self, rollup_levels: Sequence[int], max_gap: float):
+        self.rollup_levels = tuple(sorted(rollup_levels))
+        self.max_gap = max_gap
+
+    async def bounds(self, conn, experiment_id: int) -> Optional[Tuple[float, float]]:
+        """First and last telemetry time of an experiment (from the coarsest rollup when there is one)"""
+        if self.rollup_levels:
+            level = self.rollup_levels[-1]
+            row = (await conn.execute(
+                select(
+                    epoch_seconds(func.min(TelemetryRollup.bucket_start)),
+                    epoch_seconds(func.max(TelemetryRollup.bucket_start)),
+                ).where(TelemetryRollup.experiment_id == experiment_id, TelemetryRollup.bucket_seconds == level)
+            )).first()
+            if row and row[0] is not None:
+                return float(row[0]), float(row[1]) + level
+        row = (await conn.execute(
+            select(
+                epoch_seconds(func.min(TelemetrySample.ts)),
+                epoch_seconds(func.max(TelemetrySample.ts)),
+            ).where(TelemetrySample.experiment_id == experiment_id)
+        )).first()
+        if not row or row[0] is None:
+            return None
+        return float(row[0]), float(row[1])
+
+    async def load_samples(self, conn, experiment_id: int, start: float, end: float, robots: Sequence[str]) -> Dict[str, Series]:
+        query = (
+            select(
+                TelemetrySample.robot_id, epoch_seconds(TelemetrySample.ts),
+                *(getattr(TelemetrySample, name) for name in FIELDS),
+            )
+            .where(
+                TelemetrySample.experiment_id == experiment_id,
+                TelemetrySample.ts >= _timestamp(start),
+                TelemetrySample.ts < _timestamp(end),
+            )
+            .order_by(TelemetrySample.robot_id, TelemetrySample.ts)
+        )
+        if robots:
+            query = query.where(TelemetrySample.robot_id.in_(robots))
+        rows = (await conn.execute(query)).all()
+        return await asyncio.get_running_loop().run_in_executor(None, _split_by_robot, rows, FIELDS)
+
+    async def load_rollups(self, conn, experiment_id: int, level: int, start: float, end: float, robots: Sequence[str]) -> Dict[str, Series]:
+        r = TelemetryRollup
+        query = (
+            select(
+                r.robot_id,
+                # Bucket centre as the sample time, the bucket mean as the value
+                epoch_seconds(r.bucket_start) + level / 2,
+                r.x_sum / r.sample_count, r.y_sum / r.sample_count, r.lidar_min,
+                r.x_min, r.x_max, r.y_min, r.y_max,
+            )
+            .where(
+                r.experiment_id == experiment_id,
+                r.bucket_seconds == level,
+                r.bucket_start >= _timestamp(start - level),
+                r.bucket_start < _timestamp(end),
+            )
+            .order_by(r.robot_id, r.bucket_start)
+        )
+        if robots:
+            query = query.where(r.robot_id.in_(robots))
+        rows = (await conn.execute(query)).all()
+        columns = ("x", "y", "lidar_min", "x_min", "x_max", "y_min", "y_max")
+        return await asyncio.get_running_loop().run_in_executor(None, _split_by_robot, rows, columns)
+
+    async def window(
+        self,
+        experiment_id: int,
+        points: int = 1000,
+        method: str = RESAMPLE,
+        robots: Sequence[str] = (),
+        window: Optional[Tuple[float, float, float]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Replay payload of a ``plan_window`` window (the whole run when ``None``);
+        ``None`` when the experiment has no telemetry"""
+        if method not in METHODS:
+            raise ReplayWindowError(f"Unknown method, expected one of {list(METHODS)}")
+        async with get_async_engine().connect() as conn:
+            if window is None:
+                bounds = await self.bounds(conn, experiment_id)
+                if bounds is None:
+                    return None
+                window = plan_window(bounds[0], max(bounds[1], bounds[0] + 1), points)
+            step, start, end = window
+            level = choose_level(step, self.rollup_levels)
+            if level is None:
+                data = await self.load_samples(conn, experiment_id, start, end, robots)
+            else:
+                data = await self.load_rollups(conn, experiment_id, level, start, end, robots)
+        payload = await asyncio.get_running_loop().run_in_executor(
+            None, self._build, data, method, start, end, step, points, level
+        )
+        payload.update({"experiment_id": experiment_id, "robot_count": len(data)})
+        return payload
+
+    def _build(self, data: Dict[str, Series], method: str, start: float, end: float, step: float,
+               points: int, level: Optional[int]) -> Dict[str, Any]:
+        fields = FIELDS if level is None else ROLLUP_FIELDS
+        buckets = int(round((end - start) / step))
+        payload: Dict[str, Any] = {
+            "method": method,
+            "start": start,
+            "end": end,
+            "step": step,
+            "source": "samples" if level is None else f"rollup_{level}s",
+            "fields": list(fields),
+        }
+        robots: Dict[str, Any] = {}
+        if method == RESAMPLE:
+            grid = start + step * np.arange(buckets + 1)
+            max_gap = max(self.max_gap, 2 * (level or 0), step)
+            payload["t"] = to_json_list(grid - start)
+            for robot, series in data.items():
+                robots[robot] = {name: to_json_list(values) for name, values in resample(series, grid, fields, max_gap).items()}
+        elif method == MINMAX:
+            payload["t"] = to_json_list(step * np.arange(buckets))
+            for robot, series in data.items():
+                robots[robot] = {name: to_json_list(values) for name, values in minmax(series, start, step, buckets, fields).items()}
+        else:
+            for robot, series in data.items():
+                keep = lttb_indices(series["x"], series["y"], points)
+                robots[robot] = {"t": to_json_list(series["t"][keep] - start)}
+                robots[robot].update({name: to_json_list(series[name][keep]) for name in fields})
+        payload["robots"] = robots
+        return payload
+
+    @staticmethod
+    def cache_ttl(payload: Dict[str, Any]) -> float:
+        """Windows that ended a while ago no longer change; live ones are cached briefly"""
+        if payload["end"] < time.time() - 2 * max(settings.telemetry_flush_interval, 60):
+            return settings.replay_cache_ttl
+        return settings.cache_ttl_task_active
+
+
+_replay: Optional[ReplayService] = None
+
+
+def get_replay_service() -> ReplayService:
+    """Get the process-wide replay service"""
+    global _replay
+    if _replay is None:
+        _replay = ReplayService(settings.telemetry_rollup_levels, settings.replay_max_gap)
+    return _replay
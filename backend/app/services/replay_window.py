@@ -0,0 +1,70 @@
+import hashlib
+import math
+from datetime import datetime, timezone
+from typing import Optional, Sequence, Tuple
+
+from sqlalchemy import Float, cast, func
+
+from app.services.cache_service import PREFIX
+
+# Planning and cache keys of replay windows, without NumPy: the API imports this
+# at startup and loads the replay service on the first replay request
+
+RESAMPLE = "resample"  # every robot interpolated onto one shared clock
+LTTB = "lttb"          # per robot, the samples that best keep the shape of its path
+MINMAX = "minmax"      # per robot and clock bucket, the envelope of each value
+METHODS = (RESAMPLE, LTTB, MINMAX)
+
+# Clock steps a window snaps to: the same zoom level always asks for the same
+# buckets, so windows are cacheable like map tiles
+STEPS = (1 / 30, 0.1, 0.2, 0.5, 1, 2, 5, 10, 15, 30, 60, 120, 300, 600, 1800, 3600)
+
+
+class ReplayWindowError(ValueError):
+    """The requested replay window or resolution is invalid"""
+
+
+def choose_step(span: float, points: int) -> float:
+    """Smallest clock step that covers ``span`` seconds in at most ``points`` buckets"""
+    wanted = span / max(1, points)
+    for step in STEPS:
+        if step >= wanted:
+            return step
+    return float(math.ceil(wanted / STEPS[-1]) * STEPS[-1])
+
+
+def snap_window(start: float, end: float, step: float) -> Tuple[float, float]:
+    return math.floor(start / step) * step, math.ceil(end / step) * step
+
+
+def plan_window(start: float, end: float, points: int) -> Tuple[float, float, float]:
+    """``(step, start, end)`` of a window snapped to its clock step"""
+    if not (math.isfinite(start) and math.isfinite(end)):
+        raise ReplayWindowError("start and end must be finite unix seconds")
+    if end <= start:
+        raise ReplayWindowError("end must be after start")
+    step = choose_step(end - start, points)
+    start, end = snap_window(start, end, step)
+    try:
+        timestamp(start), timestamp(end)
+    except (OverflowError, OSError, ValueError):
+        raise ReplayWindowError("start and end are out of the supported time range")
+    return step, start, end
+
+
+def replay_key(experiment_id: int, version: str, method: str, points: int, window: Optional[Tuple[float, float, float]],
+               robots: Sequence[str]) -> str:
+    """Cache key of a replay window; ``window`` is the snapped ``(step, start, end)``, ``None`` for the whole run.
+    ``version`` is the experiment's telemetry version: samples flushed since make older entries unreachable"""
+    robots_hash = hashlib.sha1(",".join(sorted(robots)).encode()).hexdigest()[:12] if robots else "all"
+    span = "full" if window is None else "{:g}:{:.3f}:{:.3f}".format(*window)
+    return f"{PREFIX}replay:{experiment_id}:v{version}:{method}:{points}:{span}:{robots_hash}"
+
+
+def epoch_seconds(column):
+    """Unix seconds of a timestamp column, as a float"""
+    return cast(func.extract("epoch", column), Float)
+
+
+def timestamp(seconds: float) -> datetime:
+    return datetime.fromtimestamp(seconds, tz=timezone.utc)
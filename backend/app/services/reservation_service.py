@@ -0,0 +1,323 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import settings
+from app.core.db import get_async_engine
+from app.models.experiment import Experiment
+from app.models.reservation import SLOT_PERIOD, Reservation, ReservationSlot
+from app.services.scheduler import registered_robots, robot_group
+
+logger = logging.getLogger(__name__)
+
+EXCLUSION_VIOLATION = "23P01"  # SQLSTATE of reservation_slots_no_overlap
+FOREIGN_KEY_VIOLATION = "23503"  # SQLSTATE of a reservation naming a deleted experiment
+MAX_CALENDAR_DAYS = 31  # longest availability window served at once
+START_GRACE = timedelta(minutes=1)  # a booking "from now" may start slightly in the past
+
+
+class ReservationConflict(RuntimeError):
+    """Not enough free robots for the requested window; ``free`` is how many are"""
+
+    def __init__(self, message: str, free: int):
+        super().__init__(message)
+        self.free = free
+
+
+class ReservationNotFound(LookupError):
+    """No reservation with this id"""
+
+
+class ExperimentNotFound(LookupError):
+    """The reservation names an experiment that does not exist"""
+
+
+class RobotReserved(Exception):
+    """Raised at dispatch when another user's reservation covers a robot"""
+
+    def __init__(self, robot_host: str, owner: str, ends_at: datetime):
+        super().__init__(f"Robot {robot_host} is reserved by {owner} until {ends_at.isoformat()}")
+        self.robot_host = robot_host
+        self.owner = owner
+        self.ends_at = ends_at
+
+    @property
+    def retry_after(self) -> float:
+        """Seconds until the reservation ends, within the lease retry delay and ``reservation_max_retry_delay``"""
+        wait = (self.ends_at - datetime.now(timezone.utc)).total_seconds()
+        return min(settings.reservation_max_retry_delay, max(settings.robot_lease_retry_delay, wait))
+
+
+def utc(value: datetime) -> datetime:
+    """Timezone-aware ``value``; naive datetimes are taken as UTC"""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def overlaps(start: datetime, end: datetime):
+    """Slots overlapping ``[start, end)``: served by the GiST indexes on the slot period"""
+    return SLOT_PERIOD.op("&&")(func.tstzrange(start, end))
+
+
+def slots_query(robot_hosts: Optional[Sequence[str]], start: datetime, end: datetime):
+    """Slots of ``robot_hosts`` (every robot when ``None``) overlapping ``[start, end)``, by robot and time"""
+    query = select(
+        ReservationSlot.reservation_id, ReservationSlot.robot_host, ReservationSlot.owner,
+        ReservationSlot.starts_at, ReservationSlot.ends_at,
+    ).where(overlaps(start, end))
+    if robot_hosts is not None:
+        query = query.where(ReservationSlot.robot_host.in_(list(robot_hosts)))
+    return query.order_by(ReservationSlot.robot_host, ReservationSlot.starts_at)
+
+
+def blocking_query(robot_hosts: Sequence[str], owner: Optional[str], start: datetime, end: datetime):
+    """The latest-ending slot of someone other than ``owner`` on ``robot_hosts`` overlapping ``[start, end)``"""
+    query = select(ReservationSlot.robot_host, ReservationSlot.owner, ReservationSlot.ends_at).where(
+        ReservationSlot.robot_host.in_(list(robot_hosts)), overlaps(start, end)
+    )
+    if owner is not None:
+        query = query.where(ReservationSlot.owner != owner)
+    return query.order_by(ReservationSlot.ends_at.desc()).limit(1)
+
+
+def validate_window(starts_at: datetime, ends_at: datetime, now: Optional[datetime] = None) -> None:
+    """Raise ValueError unless the window can be booked"""
+    now = now or datetime.now(timezone.utc)
+    if ends_at <= starts_at:
+        raise ValueError("ends_at must be after starts_at")
+    if ends_at - starts_at > timedelta(hours=settings.reservation_max_hours):
+        raise ValueError(f"Reservations last at most {settings.reservation_max_hours:g} hours")
+    if starts_at < now - START_GRACE:
+        raise ValueError("Reservations cannot start in the past")
+    if starts_at > now + timedelta(days=settings.reservation_max_days_ahead):
+        raise ValueError(f"Reservations open {settings.reservation_max_days_ahead} days ahead")
+
+
+def candidate_robots(robot_hosts: Optional[Sequence[str]] = None, group: Optional[str] = None) -> List[str]:
+    """Robots a booking may take: the listed ones, the members of ``group`` or the whole fleet"""
+    if robot_hosts:
+        unknown = sorted(set(robot_hosts) - set(registered_robots()))
+        if unknown:
+            raise ValueError(f"Robots not registered: {', '.join(unknown)}")
+        return list(dict.fromkeys(robot_hosts))
+    if group is not None:
+        if group not in settings.robot_groups:
+            raise ValueError(f"Unknown robot group '{group}'")
+        return list(settings.robot_groups[group])
+    return registered_robots()
+
+
+def pick_robots(pool: Sequence[str], count: int, slots: Sequence[Any], starts_at: datetime, ends_at: datetime,
+                same_group: bool = True) -> List[str]:
+    """``count`` robots of ``pool`` free over ``[starts_at, ends_at)``, best fit first
+
+    ``slots`` are the bookings around the window. Robots whose neighbouring
+    bookings leave the least idle time around it come first, so long free
+    stretches stay whole for later, larger bookings. With ``same_group``,
+    robots of one group (one arena) are preferred when a group has enough.
+    Raises ReservationConflict when fewer than ``count`` are free.
+    """
+    horizon = timedelta(seconds=settings.reservation_fit_horizon)
+    busy = set()
+    previous: Dict[str, datetime] = {}
+    following: Dict[str, datetime] = {}
+    for slot in slots:
+        slot_start, slot_end = utc(slot.starts_at), utc(slot.ends_at)
+        if slot_start < ends_at and slot_end > starts_at:
+            busy.add(slot.robot_host)
+        elif slot_end <= starts_at:
+            previous[slot.robot_host] = max(previous.get(slot.robot_host, slot_end), slot_end)
+        else:
+            following[slot.robot_host] = min(following.get(slot.robot_host, slot_start), slot_start)
+
+    free = [host for host in pool if host not in busy]
+    if len(free) < count:
+        raise ReservationConflict(
+            f"Only {len(free)} of the {count} robots asked for are free from {starts_at.isoformat()} to {ends_at.isoformat()}",
+            len(free),
+        )
+
+    def idle(host: str) -> timedelta:
+        before = starts_at - max(previous.get(host, starts_at - horizon), starts_at - horizon)
+        after = min(following.get(host, ends_at + horizon), ends_at + horizon) - ends_at
+        return before + after
+
+    free.sort(key=idle)  # stable: pool order breaks ties
+    if same_group:
+        for group in dict.fromkeys(robot_group(host) for host in free):
+            members = [host for host in free if robot_group(host) == group]
+            if group is not None and len(members) >= count:
+                return members[:count]
+    return free[:count]
+
+
+def _reservation(row: Any, robots: Sequence[str]) -> Dict[str, Any]:
+    data = {key: value.isoformat() if hasattr(value, "isoformat") else value for key, value in row._mapping.items()}
+    data["robots"] = sorted(robots)
+    return data
+
+
+async def book(owner: str, count: int, starts_at: datetime, ends_at: datetime, robot_hosts: Optional[Sequence[str]] = None,
+               group: Optional[str] = None, experiment_id: Optional[int] = None, note: Optional[str] = None) -> Dict[str, Any]:
+    """Allocate ``count`` concrete robots for ``[starts_at, ends_at)`` and record the reservation
+
+    Free robots are read from the slots around the window (an index scan,
+    not every booking), then inserted in the same transaction. Two bookings
+    racing for a robot cannot both commit: the exclusion constraint rejects
+    the second, which is retried against the new state. Raises
+    ExperimentNotFound when ``experiment_id`` names no experiment.
+    """
+    starts_at, ends_at = utc(starts_at), utc(ends_at)
+    validate_window(starts_at, ends_at)
+    pool = candidate_robots(robot_hosts, group)
+    if not 1 <= count <= len(pool):
+        raise ValueError(f"Between 1 and {len(pool)} robots can be booked from this pool")
+    horizon = timedelta(seconds=settings.reservation_fit_horizon)
+
+    for attempt in range(settings.reservation_allocation_attempts):
+        try:
+            async with get_async_engine().begin() as conn:
+                if experiment_id is not None and (await conn.execute(
+                    select(Experiment.id).where(Experiment.id == experiment_id)
+                )).first() is None:
+                    raise ExperimentNotFound(f"Experiment {experiment_id} not found")
+                slots = (await conn.execute(slots_query(pool, starts_at - horizon, ends_at + horizon))).all()
+                robots = pick_robots(pool, count, slots, starts_at, ends_at, same_group=not robot_hosts and group is None)
+                row = (await conn.execute(
+                    insert(Reservation).values(
+                        owner=owner, experiment_id=experiment_id, robot_group=group, robot_count=count,
+                        starts_at=starts_at, ends_at=ends_at, note=note,
+                    ).returning(*Reservation.__table__.columns)
+                )).one()
+                await conn.execute(insert(ReservationSlot), [
+                    {"reservation_id": row.id, "robot_host": host, "owner": owner, "starts_at": starts_at, "ends_at": ends_at}
+                    for host in robots
+                ])
+        except IntegrityError as e:
+            code = getattr(e.orig, "pgcode", None)
+            if code == FOREIGN_KEY_VIOLATION:
+                # Experiment deleted between the check and the insert
+                raise ExperimentNotFound(f"Experiment {experiment_id} not found") from e
+            if code != EXCLUSION_VIOLATION:
+                raise
+            logger.info("Robots of a reservation by %s were booked meanwhile, retrying (attempt %d)", owner, attempt + 1)
+            continue
+        return _reservation(row, robots)
+    raise ReservationConflict("The robots were booked by someone else meanwhile, try again", 0)
+
+
+async def get_reservation(reservation_id: int) -> Dict[str, Any]:
+    """One reservation with its robots; raises ReservationNotFound"""
+    query = (
+        select(*Reservation.__table__.columns, func.array_agg(ReservationSlot.robot_host).label("robots"))
+        .join(ReservationSlot, ReservationSlot.reservation_id == Reservation.id)
+        .where(Reservation.id == reservation_id)
+        .group_by(Reservation.id)
+    )
+    async with get_async_engine().connect() as conn:
+        row = (await conn.execute(query)).first()
+    if row is None:
+        raise ReservationNotFound(f"Reservation {reservation_id} not found")
+    return _reservation(row, row.robots)
+
+
+async def list_reservations(start: datetime, end: datetime, owner: Optional[str] = None, limit: int = 500) -> List[Dict[str, Any]]:
+    """Reservations overlapping ``[start, end)``, by start time; found through the slot period index"""
+    query = (
+        select(*Reservation.__table__.columns, func.array_agg(ReservationSlot.robot_host).label("robots"))
+        .join(ReservationSlot, ReservationSlot.reservation_id == Reservation.id)
+        .where(overlaps(utc(start), utc(end)))
+        .group_by(Reservation.id)
+        .order_by(Reservation.starts_at, Reservation.id)
+        .limit(limit)
+    )
+    if owner is not None:
+        query = query.where(Reservation.owner == owner)
+    async with get_async_engine().connect() as conn:
+        rows = (await conn.execute(query)).all()
+    return [_reservation(row, row.robots) for row in rows]
+
+
+async def cancel(reservation_id: int, user: str) -> None:
+    """Delete a reservation and free its robots; only its owner may. Raises ReservationNotFound or PermissionError"""
+    async with get_async_engine().begin() as conn:
+        owner = (await conn.execute(
+            select(Reservation.owner).where(Reservation.id == reservation_id).with_for_update()
+        )).scalar()
+        if owner is None:
+            raise ReservationNotFound(f"Reservation {reservation_id} not found")
+        if owner != user:
+            raise PermissionError(f"Reservation {reservation_id} belongs to {owner}")
+        await conn.execute(delete(ReservationSlot).where(ReservationSlot.reservation_id == reservation_id))
+        await conn.execute(delete(Reservation).where(Reservation.id == reservation_id))
+
+
+def free_intervals(bookings: Sequence[Dict[str, Any]], start: datetime, end: datetime) -> List[List[str]]:
+    """Gaps of ``[start, end)`` not covered by ``bookings`` (sorted, non-overlapping)"""
+    gaps = []
+    cursor = start
+    for booking in bookings:
+        if booking["starts_at"] > cursor:
+            gaps.append([cursor.isoformat(), booking["starts_at"].isoformat()])
+        cursor = max(cursor, booking["ends_at"])
+    if cursor < end:
+        gaps.append([cursor.isoformat(), end.isoformat()])
+    return gaps
+
+
+async def availability(start: datetime, end: datetime, robot_hosts: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """Bookings and free intervals of each robot over ``[start, end)``, e.g. a week of the calendar
+
+    One index scan returns only the slots overlapping the window, whatever
+    the number of bookings outside it.
+    """
+    start, end = utc(start), utc(end)
+    if end <= start:
+        raise ValueError("end must be after start")
+    if end - start > timedelta(days=MAX_CALENDAR_DAYS):
+        raise ValueError(f"Availability windows span at most {MAX_CALENDAR_DAYS} days")
+    hosts = list(robot_hosts) if robot_hosts else registered_robots()
+    async with get_async_engine().connect() as conn:
+        rows = (await conn.execute(slots_query(hosts, start, end))).all()
+
+    bookings: Dict[str, List[Dict[str, Any]]] = {host: [] for host in hosts}
+    for row in rows:
+        bookings.setdefault(row.robot_host, []).append({
+            "reservation_id": row.reservation_id,
+            "owner": row.owner,
+            "starts_at": max(utc(row.starts_at), start),
+            "ends_at": min(utc(row.ends_at), end),
+        })
+    robots = []
+    for host, booked in bookings.items():
+        robots.append({
+            "robot_host": host,
+            "group": robot_group(host),
+            "reserved_seconds": sum((b["ends_at"] - b["starts_at"]).total_seconds() for b in booked),
+            "free": free_intervals(booked, start, end),
+            "bookings": [{**b, "starts_at": b["starts_at"].isoformat(), "ends_at": b["ends_at"].isoformat()} for b in booked],
+        })
+    return {"start": start.isoformat(), "end": end.isoformat(), "robots": robots}
+
+
+async def check_dispatch(robot_hosts: Sequence[str], owner: Optional[str], runtime: float) -> None:
+    """Raise RobotReserved when a booking of someone other than ``owner`` covers one of
+    ``robot_hosts`` during the next ``runtime`` seconds
+
+    A job only starts if it can finish before another user's reservation
+    begins; the owner's own bookings never block it. Fails open (with a
+    warning) when the database cannot be read.
+    """
+    if not settings.reservation_enabled or not robot_hosts:
+        return
+    now = datetime.now(timezone.utc)
+    try:
+        async with get_async_engine().connect() as conn:
+            row = (await conn.execute(blocking_query(robot_hosts, owner, now, now + timedelta(seconds=runtime)))).first()
+    except Exception as e:
+        logger.warning("Reservation check failed, dispatching to %s anyway: %s", ", ".join(robot_hosts), e)
+        return
+    if row is not None:
+        raise RobotReserved(row.robot_host, row.owner, utc(row.ends_at))
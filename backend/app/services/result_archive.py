@@ -0,0 +1,379 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import uuid
+import zipfile
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.db import get_async_engine
+from app.models.experiment import Experiment
+from app.models.task import Task
+
+try:
+    import zstandard
+except ImportError:  # optional: blobs fall back to gzip frames
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+ARCHIVED_FIELDS = ("output", "error")
+EXPORT_NAME = "export.zip"
+TELEMETRY_BATCH_ROWS = 50000
+
+
+class ResultNotFound(LookupError):
+    """Raised when an archived result or its manifest does not exist"""
+
+
+class ExportUnavailable(RuntimeError):
+    """Raised when the columnar export cannot be built (pyarrow missing)"""
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+
+
+class ResultArchive:
+    """Compressed store of large task outputs on local disk, readable by byte range
+
+    Each task gets a directory ``tasks/<id[:2]>/<id>/`` under ``root`` with one
+    blob per archived text and a ``manifest.json``. Blobs are a sequence of
+    independent frames of ``frame_size`` uncompressed bytes (zstd, or gzip
+    members without zstandard), so a range is served by decompressing only the
+    frames it covers. The task row keeps a short tail of each text and the
+    directory in ``result_ref``.
+    """
+
+    def __init__(self, root: Optional[str] = None, inline_max_chars: Optional[int] = None,
+                 frame_size: Optional[int] = None, level: Optional[int] = None):
+        self.root = os.path.abspath(root or settings.results_dir)
+        self.inline_max_chars = inline_max_chars if inline_max_chars is not None else settings.result_inline_max_chars
+        self.frame_size = frame_size or settings.result_frame_size
+        self.level = level if level is not None else settings.result_compression_level
+
+    @staticmethod
+    def task_dir(task_id: str) -> str:
+        task_id = _safe_name(task_id)
+        return f"tasks/{task_id[:2]}/{task_id}"
+
+    @staticmethod
+    def experiment_dir(experiment_id: int) -> str:
+        return f"experiments/{int(experiment_id)}"
+
+    def path(self, ref: str, name: str = "") -> str:
+        """Absolute path of ``ref``/``name``; refuses anything outside the root"""
+        path = os.path.abspath(os.path.join(self.root, ref, name))
+        if path != self.root and not path.startswith(self.root + os.sep):
+            raise ResultNotFound(f"Invalid result reference '{ref}'")
+        return path
+
+    # --- Writing ---
+    def _compress(self, frame: bytes) -> Tuple[str, bytes]:
+        if zstandard is not None:
+            return "zstd", zstandard.ZstdCompressor(level=self.level).compress(frame)
+        return "gzip", gzip.compress(frame, compresslevel=min(max(self.level, 1), 9))
+
+    def write_blob(self, ref: str, name: str, data: bytes) -> Dict[str, Any]:
+        """Store ``data`` as compressed frames; returns its manifest entry"""
+        directory = self.path(ref)
+        os.makedirs(directory, exist_ok=True)
+        frames = []
+        codec = None
+        offset = 0
+        tmp_path = os.path.join(directory, f".{name}.tmp")
+        with open(tmp_path, "wb") as f:
+            for start in range(0, len(data), self.frame_size):
+                codec, compressed = self._compress(data[start:start + self.frame_size])
+                f.write(compressed)
+                frames.append([offset, len(compressed), min(self.frame_size, len(data) - start)])
+                offset += len(compressed)
+        # Written then renamed: readers never see a half-written blob
+        os.replace(tmp_path, os.path.join(directory, name))
+        return {
+            "codec": codec or "zstd",
+            "size": len(data),
+            "stored_size": offset,
+            "sha256": hashlib.sha256(data).hexdigest(),
+            "frames": frames,
+        }
+
+    def _write_manifest(self, ref: str, files: Dict[str, Dict[str, Any]]) -> None:
+        path = self.path(ref, MANIFEST)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"created_at": time.time(), "files": files}, f)
+        os.replace(tmp_path, path)
+
+    def archive_outcome(self, task_id: str, outcome: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[str]]:
+        """Move the long outputs of a task outcome (and of each swarm robot) to blobs
+
+        Returns the outcome to store in the row, where archived texts are cut to
+        their last ``inline_max_chars`` characters and named in ``archived``,
+        and the archive reference (``None`` when everything fit inline).
+        """
+        ref = self.task_dir(task_id)
+        files: Dict[str, Dict[str, Any]] = {}
+
+        def _archive(part: Dict[str, Any], prefix: str) -> Dict[str, Any]:
+            part = dict(part)
+            for field in ARCHIVED_FIELDS:
+                text = part.get(field)
+                if not isinstance(text, str) or len(text) <= self.inline_max_chars:
+                    continue
+                name = f"{prefix}{field}"
+                files[name] = self.write_blob(ref, name, text.encode("utf-8"))
+                part[field] = text[-self.inline_max_chars:]
+                part.setdefault("archived", {})[field] = name
+            return part
+
+        archived = _archive(outcome, "")
+        if isinstance(outcome.get("robots"), dict):
+            archived["robots"] = {
+                host: _archive(result, f"{_safe_name(host)}.") if isinstance(result, dict) else result
+                for host, result in outcome["robots"].items()
+            }
+        if not files:
+            return outcome, None
+        self._write_manifest(ref, files)
+        archived["archive"] = ref
+        return archived, ref
+
+    # --- Reading ---
+    def manifest(self, ref: str) -> Dict[str, Any]:
+        try:
+            with open(self.path(ref, MANIFEST)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise ResultNotFound(f"No archive at '{ref}'")
+
+    def entry(self, ref: str, name: str) -> Dict[str, Any]:
+        entry = self.manifest(ref)["files"].get(name)
+        if entry is None:
+            raise ResultNotFound(f"No archived result '{name}'")
+        return entry
+
+    @staticmethod
+    def can_read(entry: Dict[str, Any]) -> bool:
+        return entry["codec"] == "gzip" or zstandard is not None
+
+    @staticmethod
+    def _decompress(codec: str, data: bytes) -> bytes:
+        if codec == "gzip":
+            return gzip.decompress(data)
+        return zstandard.ZstdDecompressor().decompress(data)
+
+    def read_range(self, ref: str, name: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Uncompressed bytes ``start..end`` (inclusive) of an archived blob"""
+        entry = self.entry(ref, name)
+        end = entry["size"] - 1 if end is None else min(end, entry["size"] - 1)
+        raw_start = 0
+        with open(self.path(ref, name), "rb") as f:
+            for offset, length, raw_size in entry["frames"]:
+                raw_end = raw_start + raw_size - 1
+                if raw_end >= start and raw_start <= end:
+                    f.seek(offset)
+                    frame = self._decompress(entry["codec"], f.read(length))
+                    yield frame[max(0, start - raw_start):end - raw_start + 1]
+                if raw_end >= end:
+                    break
+                raw_start += raw_size
+
+    def read_text(self, ref: str, name: str) -> str:
+        return b"".join(self.read_range(ref, name)).decode("utf-8", errors="replace")
+
+    def full_outcome(self, outcome: Dict[str, Any]) -> Dict[str, Any]:
+        """Inverse of ``archive_outcome``: the outcome with archived texts restored"""
+        ref = outcome.get("archive")
+        if not ref:
+            return outcome
+
+        def _restore(part: Dict[str, Any]) -> Dict[str, Any]:
+            part = dict(part)
+            for field, name in (part.pop("archived", None) or {}).items():
+                part[field] = self.read_text(ref, name)
+            return part
+
+        restored = _restore(outcome)
+        restored.pop("archive", None)
+        if isinstance(outcome.get("robots"), dict):
+            restored["robots"] = {
+                host: _restore(result) if isinstance(result, dict) else result
+                for host, result in outcome["robots"].items()
+            }
+        return restored
+
+    # --- Experiment export ---
+    def export_path(self, experiment_id: int) -> str:
+        return self.path(self.experiment_dir(experiment_id), EXPORT_NAME)
+
+    async def export_experiment(self, experiment_id: int, max_age: Optional[float] = None) -> str:
+        """Build (or reuse, when younger than ``max_age``) the bulk export of an experiment
+
+        A zip of ``experiment.json``, ``runs.parquet`` (one row per task and
+        robot, full outputs included) and ``telemetry.parquet``. Parquet files
+        are zstd-compressed, so the zip only stores them.
+        """
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ExportUnavailable("pyarrow is required for columnar exports")
+
+        path = self.export_path(experiment_id)
+        max_age = settings.results_export_ttl if max_age is None else max_age
+        try:
+            if time.time() - os.path.getmtime(path) < max_age:
+                return path
+        except OSError:
+            pass
+
+        async with get_async_engine().connect() as conn:
+            experiment = (await conn.execute(select(Experiment).where(Experiment.id == experiment_id))).first()
+            if experiment is None:
+                raise ResultNotFound(f"Experiment {experiment_id} not found")
+            tasks = (await conn.execute(
+                select(Task).where(Task.experiment_id == experiment_id).order_by(Task.id)
+            )).all()
+
+            loop = asyncio.get_running_loop()
+            directory = self.path(self.experiment_dir(experiment_id))
+            os.makedirs(directory, exist_ok=True)
+            # Unique temporaries: two concurrent builds never write the same file
+            build_id = uuid.uuid4().hex
+            telemetry_path = os.path.join(directory, f".telemetry.{build_id}.tmp")
+            runs_path = os.path.join(directory, f".runs.{build_id}.tmp")
+            zip_path = f"{path}.{build_id}.tmp"
+            try:
+                rows = await self._write_telemetry(conn, experiment_id, telemetry_path)
+            except BaseException:
+                _remove_quietly(telemetry_path)
+                raise
+
+        try:
+            runs = await loop.run_in_executor(None, self._run_rows, tasks)
+            await loop.run_in_executor(None, _write_parquet, runs_path, runs, RUN_COLUMNS)
+            info = {
+                **{key: _jsonable(value) for key, value in experiment._mapping.items() if key not in ("output", "error")},
+                "tasks": len(tasks),
+                "runs": len(runs),
+                "telemetry_samples": rows,
+                "exported_at": time.time(),
+            }
+            await loop.run_in_executor(None, self._zip_export, path, zip_path, info, runs_path, telemetry_path)
+        finally:
+            # The parts, and the zip itself if it was never renamed into place
+            _remove_quietly(runs_path, telemetry_path, zip_path)
+        return path
+
+    async def _write_telemetry(self, conn, experiment_id: int, path: str) -> int:
+        """Stream the samples of an experiment into a Parquet file, one row group per batch"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        from app.models.telemetry import TelemetrySample
+
+        loop = asyncio.get_running_loop()
+        schema = pa.schema([
+            ("robot_id", pa.string()), ("ts", pa.timestamp("us", tz="UTC")),
+            ("x", pa.float32()), ("y", pa.float32()), ("theta", pa.float32()),
+            ("floor_color", pa.int16()), ("ir", pa.list_(pa.int16())),
+            ("lidar_min", pa.float32()), ("lidar_mean", pa.float32()), ("lidar_front", pa.float32()),
+        ])
+        columns = [getattr(TelemetrySample, name) for name in schema.names]
+        query = (
+            select(*columns)
+            .where(TelemetrySample.experiment_id == experiment_id)
+            .order_by(TelemetrySample.robot_id, TelemetrySample.ts)
+        )
+        rows = 0
+        writer = pq.ParquetWriter(path, schema, compression="zstd")
+        try:
+            result = await conn.stream(query.execution_options(yield_per=TELEMETRY_BATCH_ROWS))
+            async for batch in result.partitions(TELEMETRY_BATCH_ROWS):
+                table = pa.Table.from_pylist([dict(row._mapping) for row in batch], schema=schema)
+                await loop.run_in_executor(None, writer.write_table, table)
+                rows += len(batch)
+        finally:
+            writer.close()
+        return rows
+
+    def _run_rows(self, tasks) -> List[Dict[str, Any]]:
+        rows = []
+        for task in tasks:
+            base = {
+                "task_id": task.task_id,
+                "task_type": task.task_type,
+                "task_status": task.status,
+                "created_at": task.created_at,
+                "completed_at": task.completed_at,
+            }
+            try:
+                outcome = self.full_outcome(json.loads(task.result)) if task.result else {}
+            except (ValueError, ResultNotFound) as e:
+                logger.warning("Could not read the result of task %s: %s", task.task_id, e)
+                outcome = {}
+            results = outcome.get("robots") if isinstance(outcome.get("robots"), dict) else {task.host: outcome}
+            for host, result in results.items():
+                result = result if isinstance(result, dict) else {}
+                rows.append({
+                    **base,
+                    "robot_host": host,
+                    "status": result.get("status"),
+                    "exit_code": result.get("exit_code"),
+                    "started_at": result.get("started_at"),
+                    "finished_at": result.get("finished_at"),
+                    "output": result.get("output"),
+                    "error": result.get("error") or (task.error if len(results) == 1 else None),
+                })
+        return rows
+
+    @staticmethod
+    def _zip_export(path: str, tmp_path: str, info: Dict[str, Any], runs_path: str, telemetry_path: str) -> None:
+        with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_STORED) as archive:
+            archive.writestr("experiment.json", json.dumps(info, indent=2))
+            archive.write(runs_path, "runs.parquet")
+            archive.write(telemetry_path, "telemetry.parquet")
+        os.replace(tmp_path, path)
+
+
+RUN_COLUMNS = [
+    ("task_id", "string"), ("task_type", "string"), ("task_status", "string"),
+    ("created_at", "timestamp"), ("completed_at", "timestamp"),
+    ("robot_host", "string"), ("status", "string"), ("exit_code", "int32"),
+    ("started_at", "float64"), ("finished_at", "float64"),
+    ("output", "large_string"), ("error", "large_string"),
+]
+
+
+def _write_parquet(path: str, rows: List[Dict[str, Any]], columns) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {
+        "string": pa.string(), "large_string": pa.large_string(), "int32": pa.int32(),
+        "float64": pa.float64(), "timestamp": pa.timestamp("us", tz="UTC"),
+    }
+    schema = pa.schema([(name, types[kind]) for name, kind in columns])
+    pq.write_table(pa.Table.from_pylist(rows, schema=schema), path, compression="zstd")
+
+
+def _remove_quietly(*paths: str) -> None:
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _jsonable(value: Any) -> Any:
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+result_archive = ResultArchive()
@@ -0,0 +1,359 @@
+import asyncio
+import logging
+import re
+import time
+import uuid
+from typing import Dict, List, Optional, Sequence
+
+from app.core.config import settings
+from app.core.metrics import ROBOT_BUSY, ROBOT_BUSY_SECONDS
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE = "default"
+
+# Celery priority per submission class (Redis transport: 0 is served first).
+# Three steps apart: admission control can demote a job by up to two steps
+# (users with a backlog) without it reaching the next class.
+PRIORITIES = {
+    "demo": 0,      # teacher demo in front of the class
+    "normal": 3,
+    "batch": 6,     # student sweeps and background batches
+}
+
+# Compare-and-delete / compare-and-extend so only the lease owner can touch it
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+_RENEW_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class RobotBusy(Exception):
+    """Raised when another job holds the lease of a requested robot"""
+
+    def __init__(self, robot_host: str):
+        super().__init__(f"Robot {robot_host} is running another job")
+        self.robot_host = robot_host
+
+
+def _queue_safe(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+
+
+def robot_group(robot_host: str) -> Optional[str]:
+    """Name of the configured group containing ``robot_host``, if any"""
+    for group, hosts in settings.robot_groups.items():
+        if robot_host in hosts:
+            return group
+    return None
+
+
+def registered_robots() -> List[str]:
+    """Every robot of the fleet: ROBOT_HOSTS plus the members of ROBOT_GROUPS"""
+    hosts = list(settings.robot_hosts) + [h for hosts in settings.robot_groups.values() for h in hosts]
+    return list(dict.fromkeys(hosts))
+
+
+def robot_queue(robot_host: str) -> str:
+    """Celery queue serving a robot: its group queue, its own queue when it is
+    a registered robot, otherwise the default queue"""
+    group = robot_group(robot_host)
+    if group:
+        return f"robots.{_queue_safe(group)}"
+    if robot_host in settings.robot_hosts:
+        return f"robots.{_queue_safe(robot_host)}"
+    return DEFAULT_QUEUE
+
+
+def swarm_queue(robot_hosts: Sequence[str]) -> str:
+    """Queue for a multi-robot job: the shared queue when all robots share one"""
+    queues = {robot_queue(host) for host in robot_hosts}
+    return queues.pop() if len(queues) == 1 else DEFAULT_QUEUE
+
+
+def priority_value(priority: str, demotion: int = 0) -> int:
+    """Celery priority of a submission class, ``demotion`` steps later (9 at most)"""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority '{priority}', expected one of {sorted(PRIORITIES)}")
+    return min(9, PRIORITIES[priority] + demotion)
+
+
+def task_signature(name: str, **options):
+    """Signature of a worker task by name
+
+    The API enqueues through it without importing ``app.tasks`` (and the SSH
+    stack behind it); where the tasks are loaded, the task itself is used.
+    """
+    from app.core.celery_app import celery_app
+
+    return celery_app.signature(name, **options)
+
+
+def lease_key(robot_host: str) -> str:
+    return f"atriz:robot_lease:{robot_host}"
+
+
+class RobotLease:
+    """Exclusive Redis lease on a set of robots: one active script per robot
+
+    Leases expire after ``ttl`` seconds unless renewed, so a crashed worker
+    never books a robot forever; while held they are renewed in the
+    background every third of the TTL.
+    """
+
+    def __init__(self, robot_hosts: Sequence[str], owner: Optional[str] = None, ttl: Optional[float] = None):
+        # Sorted so two multi-robot jobs always lock in the same order
+        self.robot_hosts = sorted(set(robot_hosts))
+        self.owner = owner or str(uuid.uuid4())
+        self.ttl_ms = int((ttl or settings.robot_lease_ttl) * 1000)
+        self._renewer: Optional[asyncio.Task] = None
+        # Wall clock, not monotonic: a detached run's lease is released by another process
+        self._acquired_at: Optional[float] = None
+
+    @classmethod
+    def resume(cls, robot_hosts: Sequence[str], owner: str, acquired_at: float) -> "RobotLease":
+        """A lease held since ``acquired_at`` and handed off by the process that took it
+        (a detached run's), marked busy here so ``release`` accounts for it"""
+        lease = cls(robot_hosts, owner=owner)
+        lease._acquired_at = acquired_at
+        lease._mark_busy()
+        return lease
+
+    @property
+    def acquired_at(self) -> Optional[float]:
+        return self._acquired_at
+
+    async def acquire(self, renew: bool = True) -> None:
+        """Take every lease or none; raises RobotBusy naming the first busy robot
+
+        With ``renew=False`` the lease simply lasts ``ttl`` seconds: used by
+        detached runs, whose lease outlives the worker that took it.
+        """
+        redis = get_redis()
+        acquired = []
+        for host in self.robot_hosts:
+            if not await redis.set(lease_key(host), self.owner, nx=True, px=self.ttl_ms):
+                # Re-entrant for the same owner (e.g. a retried delivery)
+                if await redis.get(lease_key(host)) != self.owner:
+                    await self._release(acquired)
+                    raise RobotBusy(host)
+            acquired.append(host)
+        self._acquired_at = time.time()
+        self._mark_busy()
+        if renew:
+            self._renewer = asyncio.get_running_loop().create_task(self._renew_loop())
+
+    def hand_off(self) -> None:
+        """Stop tracking a lease that stays held and is released elsewhere (see ``resume``)"""
+        self._stop_renewing()
+        self._acquired_at = None
+        for host in self.robot_hosts:
+            ROBOT_BUSY.labels(host).set(0)
+
+    async def release(self) -> None:
+        self._stop_renewing()
+        if self._acquired_at is not None:
+            held = max(0.0, time.time() - self._acquired_at)
+            self._acquired_at = None
+            for host in self.robot_hosts:
+                ROBOT_BUSY.labels(host).set(0)
+                ROBOT_BUSY_SECONDS.labels(host).inc(held)
+        await self._release(self.robot_hosts)
+
+    def _mark_busy(self) -> None:
+        for host in self.robot_hosts:
+            ROBOT_BUSY.labels(host).set(1)
+
+    def _stop_renewing(self) -> None:
+        if self._renewer is not None:
+            self._renewer.cancel()
+            self._renewer = None
+
+    async def _release(self, hosts: Sequence[str]) -> None:
+        redis = get_redis()
+        for host in hosts:
+            try:
+                await redis.eval(_RELEASE_SCRIPT, 1, lease_key(host), self.owner)
+            except Exception as e:
+                logger.warning("Could not release lease of %s: %s", host, e)
+
+    async def _renew_loop(self) -> None:
+        redis = get_redis()
+        while True:
+            await asyncio.sleep(self.ttl_ms / 3000)
+            for host in self.robot_hosts:
+                try:
+                    if not await redis.eval(_RENEW_SCRIPT, 1, lease_key(host), self.owner, self.ttl_ms):
+                        logger.warning("Lease of %s was lost while running", host)
+                except Exception as e:
+                    logger.warning("Could not renew lease of %s: %s", host, e)
+
+    async def __aenter__(self) -> "RobotLease":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.release()
+
+
+async def queue_depths(queues: Sequence[str]) -> Dict[str, int]:
+    """Messages waiting in each Celery queue, all priority levels included
+
+    The Redis transport keeps one list per priority step: ``<queue>`` for
+    priority 0 and ``<queue>:<n>`` for the others.
+    """
+    steps = range(10)
+    async with get_redis().pipeline(transaction=False) as pipe:
+        for queue in queues:
+            for step in steps:
+                pipe.llen(queue if step == 0 else f"{queue}:{step}")
+        lengths = await pipe.execute()
+    return {queue: sum(lengths[i * len(steps):(i + 1) * len(steps)]) for i, queue in enumerate(queues)}
+
+
+async def active_leases(robot_hosts: Sequence[str]) -> Dict[str, Optional[str]]:
+    """Current lease owner (task id) of each robot, ``None`` when idle"""
+    owners = await get_redis().mget([lease_key(host) for host in robot_hosts])
+    return dict(zip(robot_hosts, owners))
+
+
+class RobotScheduler:
+    """Routes robot jobs to per-robot/group Celery queues with priorities"""
+
+    def submit_script(
+        self,
+        robot_host: str,
+        user_script_content: str,
+        script_name: str,
+        supporting_files: Optional[Dict[str, str]] = None,
+        priority: str = "normal",
+        task_id: Optional[str] = None,
+        owner: Optional[str] = None,
+        demotion: int = 0,
+    ):
+        return task_signature(
+            "run_robot_script",
+            args=(robot_host, user_script_content, script_name, supporting_files),
+            kwargs={"owner": owner},
+            task_id=task_id,
+            queue=robot_queue(robot_host),
+            priority=priority_value(priority, demotion),
+        ).apply_async()
+
+    def submit_swarm(
+        self,
+        robot_hosts: List[str],
+        user_script_content: str,
+        script_name: str,
+        max_parallel: Optional[int] = None,
+        supporting_files: Optional[Dict[str, str]] = None,
+        priority: str = "normal",
+        task_id: Optional[str] = None,
+        owner: Optional[str] = None,
+        demotion: int = 0,
+    ):
+        return task_signature(
+            "run_swarm_script",
+            args=(robot_hosts, user_script_content, script_name, max_parallel, supporting_files),
+            kwargs={"owner": owner},
+            task_id=task_id,
+            queue=swarm_queue(robot_hosts),
+            priority=priority_value(priority, demotion),
+        ).apply_async()
+
+    def submit_detached(
+        self,
+        robot_hosts: List[str],
+        user_script_content: str,
+        script_name: str,
+        supporting_files: Optional[Dict[str, str]] = None,
+        max_runtime: Optional[int] = None,
+        priority: str = "normal",
+        task_id: Optional[str] = None,
+        owner: Optional[str] = None,
+        demotion: int = 0,
+    ):
+        return task_signature(
+            "launch_detached_run",
+            args=(robot_hosts, user_script_content, script_name, supporting_files, max_runtime),
+            kwargs={"owner": owner},
+            task_id=task_id,
+            queue=swarm_queue(robot_hosts),
+            priority=priority_value(priority, demotion),
+        ).apply_async()
+
+    def submit_sweep(
+        self,
+        sweep_id: str,
+        runs: List[Dict],
+        user_script_content: str,
+        script_name: str,
+        priority: str = "batch",
+        owner: Optional[str] = None,
+        demotion: int = 0,
+    ):
+        """Enqueue every run of a sweep as one chord: the runs (each on its
+        robot's queue) as the header, ``finish_sweep`` as the callback
+
+        ``runs`` items carry ``task_id``, ``robot_host`` and ``supporting_files``.
+        """
+        from celery import chord
+
+        value = priority_value(priority, demotion)
+        header = [
+            task_signature(
+                "run_robot_script",
+                args=(run["robot_host"], user_script_content, script_name, run["supporting_files"]),
+                kwargs={"sweep_id": sweep_id, "owner": owner},
+                task_id=run["task_id"],
+                queue=robot_queue(run["robot_host"]),
+                priority=value,
+            )
+            for run in runs
+        ]
+        callback = task_signature("finish_sweep", args=(sweep_id, owner), queue=DEFAULT_QUEUE, priority=value)
+        return chord(header)(callback)
+
+    def submit_artifact_collection(
+        self,
+        experiment_id: int,
+        robot_hosts: List[str],
+        remote_dir: Optional[str] = None,
+        pattern: str = "*",
+        priority: str = "batch",
+    ):
+        return task_signature(
+            "collect_artifacts",
+            args=(experiment_id, robot_hosts, remote_dir, pattern),
+            queue=swarm_queue(robot_hosts),
+            priority=priority_value(priority),
+        ).apply_async()
+
+    def submit_swarm_metrics(self, experiment_id: int, params: Optional[Dict] = None, priority: str = "batch"):
+        return task_signature(
+            "compute_swarm_metrics",
+            args=(experiment_id, params),
+            queue=DEFAULT_QUEUE,
+            priority=priority_value(priority),
+        ).apply_async()
+
+    def worker_queues(self) -> List[str]:
+        """Every queue a catch-all worker should consume"""
+        queues = [DEFAULT_QUEUE]
+        for host in registered_robots():
+            queue = robot_queue(host)
+            if queue not in queues:
+                queues.append(queue)
+        return queues
+
+
+scheduler = RobotScheduler()
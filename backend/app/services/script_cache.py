@@ -0,0 +1,118 @@
+import hashlib
+import posixpath
+import shlex
+from typing import Any, Dict, Optional, Union
+
+from app.core.config import settings
+from app.core.metrics import ROBOT_PHASE_SECONDS
+
+FileContent = Union[str, bytes]
+
+
+def content_hash(content: FileContent) -> str:
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return hashlib.sha256(content).hexdigest()
+
+
+def validate_file_name(name: str) -> str:
+    """Run files live flat in the run directory; reject paths and dot names"""
+    if not name or name in (".", "..") or posixpath.basename(name) != name or "\\" in name:
+        raise ValueError(f"Invalid file name '{name}'")
+    return name
+
+
+class RobotScriptCache:
+    """Content-addressed store of scripts and supporting files on each robot
+
+    Blobs live in ``<cache_dir>/blobs/<sha256>``. Staging a run checks which
+    blobs the robot already has in one command, uploads only the missing ones
+    and hard-links everything into ``<cache_dir>/runs/<run_id>/`` under the
+    original names. Blob mtimes are touched on every hit, so eviction by disk
+    quota drops the least recently used blobs first.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, quota_bytes: Optional[int] = None):
+        self.cache_dir = (cache_dir or settings.robot_cache_dir).rstrip("/")
+        self.quota_bytes = quota_bytes if quota_bytes is not None else settings.robot_cache_quota_bytes
+        self.blob_dir = f"{self.cache_dir}/blobs"
+        self.run_root = f"{self.cache_dir}/runs"
+
+    def run_dir(self, run_id: str) -> str:
+        return f"{self.run_root}/{validate_file_name(run_id)}/"
+
+    async def stage(self, conn, files: Dict[str, FileContent], run_id: str) -> Dict[str, Any]:
+        """Make ``files`` available in the run directory, uploading only missing blobs"""
+        hashes = {validate_file_name(name): content_hash(content) for name, content in files.items()}
+        with ROBOT_PHASE_SECONDS.labels("mkdir").time():
+            missing = await self._missing_blobs(conn, set(hashes.values()))
+
+        with ROBOT_PHASE_SECONDS.labels("upload").time():
+            return await self._upload_and_link(conn, files, hashes, missing, run_id)
+
+    async def _upload_and_link(self, conn, files: Dict[str, FileContent], hashes: Dict[str, str], missing: set, run_id: str) -> Dict[str, Any]:
+        uploaded = 0
+        uploaded_bytes = 0
+        if missing:
+            async with conn.start_sftp_client() as sftp:
+                for name, digest in hashes.items():
+                    if digest not in missing:
+                        continue
+                    missing.discard(digest)
+                    content = files[name]
+                    data = content.encode("utf-8") if isinstance(content, str) else content
+                    # Write then rename, so a dropped upload never leaves a corrupt blob
+                    tmp_path = f"{self.blob_dir}/{digest}.{run_id}.tmp"
+                    async with sftp.open(tmp_path, "wb") as remote_file:
+                        await remote_file.write(data)
+                    await sftp.posix_rename(tmp_path, f"{self.blob_dir}/{digest}")
+                    uploaded += 1
+                    uploaded_bytes += len(data)
+
+        run_dir = self.run_dir(run_id)
+        # Eviction is best effort: a failure there must not fail the run
+        await conn.run(f"{self._link_command(run_dir, hashes)} && {{ {self._evict_command()} || true; }}", check=True)
+        return {
+            "run_dir": run_dir,
+            "blobs": len(set(hashes.values())),
+            "uploaded": uploaded,
+            "uploaded_bytes": uploaded_bytes,
+        }
+
+    async def _missing_blobs(self, conn, digests) -> set:
+        """One round trip: touch the blobs present, list the absent ones"""
+        blob_dir = shlex.quote(self.blob_dir)
+        command = (
+            f"mkdir -p {blob_dir} && cd {blob_dir} && "
+            f"for h in {' '.join(sorted(digests))}; do "
+            f"if [ -f \"$h\" ]; then touch \"$h\"; else echo \"$h\"; fi; done"
+        )
+        result = await conn.run(command, check=True)
+        return set(result.stdout.split())
+
+    def _link_command(self, run_dir: str, hashes: Dict[str, str]) -> str:
+        quoted_dir = shlex.quote(run_dir)
+        links = " && ".join(
+            f"{{ ln -f {shlex.quote(self.blob_dir + '/' + digest)} {shlex.quote(run_dir + name)} 2>/dev/null"
+            f" || cp {shlex.quote(self.blob_dir + '/' + digest)} {shlex.quote(run_dir + name)}; }}"
+            for name, digest in hashes.items()
+        )
+        return f"mkdir -p {quoted_dir} && {links}"
+
+    def _evict_command(self) -> str:
+        """Delete least recently used blobs until the cache fits the quota"""
+        blob_dir = shlex.quote(self.blob_dir)
+        quota = int(self.quota_bytes)
+        return (
+            f"cd {blob_dir} && total=$(find . -type f -printf '%s\\n' | awk '{{s += $1}} END {{print s + 0}}') && "
+            f"if [ \"$total\" -gt {quota} ]; then "
+            f"for f in $(ls -tr | grep -v '\\.tmp$'); do [ \"$total\" -le {quota} ] && break; "
+            f"size=$(stat -c %s \"$f\"); rm -f \"$f\"; total=$((total - size)); done; fi"
+        )
+
+    def cleanup_command(self, run_id: str) -> str:
+        """Remove a run directory; the blobs stay cached"""
+        return f"rm -rf {shlex.quote(self.run_dir(run_id))}"
+
+
+script_cache = RobotScriptCache()
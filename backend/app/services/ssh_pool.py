@@ -0,0 +1,243 @@
+import asyncio
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    import asyncssh
+
+PoolKey = Tuple[str, int, Tuple[Tuple[str, Any], ...]]
+
+
+def split_host(host: str) -> Tuple[str, int]:
+    """Split an optional ``host:port`` robot address into host and port"""
+    if host.count(":") == 1:
+        name, port = host.rsplit(":", 1)
+        if port.isdigit():
+            return name, int(port)
+    return host, 22
+
+
+_client_class = None
+
+
+def _pooled_client_class():
+    """SSH client callbacks used to notice dropped pooled connections
+
+    asyncssh (and the crypto stack under it) is imported on the first
+    connection, so processes that never reach a robot do not load it.
+    """
+    global _client_class
+    if _client_class is None:
+        import asyncssh
+
+        class _PooledClient(asyncssh.SSHClient):
+            def __init__(self):
+                self.closed = False
+
+            def connection_lost(self, exc: Optional[Exception]) -> None:
+                self.closed = True
+
+        _client_class = _PooledClient
+    return _client_class
+
+
+class _PooledConnection:
+    """An SSH connection owned by the pool plus its bookkeeping"""
+
+    def __init__(self, conn: "asyncssh.SSHClientConnection", client: Any):
+        self.conn = conn
+        self.client = client
+        self.last_used = time.monotonic()
+        self.last_checked = self.last_used
+
+    @property
+    def is_closed(self) -> bool:
+        return self.client.closed
+
+
+class _HostPool:
+    """Idle connections and the connection limit for a single robot"""
+
+    def __init__(self, max_size: int):
+        self.idle: List[_PooledConnection] = []
+        self.limit = asyncio.Semaphore(max_size)
+        self.in_use = 0
+
+
+class SSHConnectionPool:
+    """Per-host pool of keep-alive SSH connections to the robots"""
+
+    def __init__(
+        self,
+        username: str,
+        client_keys: List[str],
+        max_per_host: int = 4,
+        idle_timeout: float = 300,
+        health_check_interval: float = 30,
+        keepalive_interval: float = 15,
+        connect_timeout: float = 10,
+    ):
+        self.username = username
+        self.client_keys = client_keys
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.keepalive_interval = keepalive_interval
+        self.connect_timeout = connect_timeout
+        self._pools: Dict[PoolKey, _HostPool] = {}
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "health_check_failures": 0,
+            "connect_errors": 0,
+        }
+
+    def _key(self, host: str, options: Dict[str, Any]) -> PoolKey:
+        name, port = split_host(host)
+        return name, port, tuple(sorted((k, repr(v)) for k, v in options.items()))
+
+    @asynccontextmanager
+    async def connection(self, host: str, **options) -> AsyncIterator["asyncssh.SSHClientConnection"]:
+        """Borrow a connection to ``host``, opening one only on a pool miss
+
+        Extra ``options`` are passed to ``asyncssh.connect`` and become part of
+        the pool key, so e.g. compressed and plain connections are not mixed.
+        """
+        key = self._key(host, options)
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = _HostPool(self.max_per_host)
+
+        async with pool.limit:
+            pooled = await self._checkout(key, pool, options)
+            pool.in_use += 1
+            try:
+                yield pooled.conn
+            finally:
+                pool.in_use -= 1
+                self._checkin(pool, pooled)
+        self.evict_idle()
+
+    async def _checkout(self, key: PoolKey, pool: _HostPool, options: Dict[str, Any]) -> _PooledConnection:
+        now = time.monotonic()
+        while pool.idle:
+            pooled = pool.idle.pop()
+            if pooled.is_closed or now - pooled.last_used > self.idle_timeout:
+                self._discard(pooled)
+                continue
+            if now - pooled.last_checked > self.health_check_interval and not await self._is_healthy(pooled):
+                self._stats["health_check_failures"] += 1
+                self._discard(pooled)
+                continue
+            self._stats["hits"] += 1
+            return pooled
+
+        self._stats["misses"] += 1
+        return await self._open(key, options)
+
+    def _checkin(self, pool: _HostPool, pooled: _PooledConnection) -> None:
+        if pooled.is_closed:
+            self._discard(pooled)
+            return
+        pooled.last_used = time.monotonic()
+        pool.idle.append(pooled)
+
+    async def _open(self, key: PoolKey, options: Dict[str, Any]) -> _PooledConnection:
+        name, port, _ = key
+        connect_options = {
+            "username": self.username,
+            "client_keys": self.client_keys,
+            "known_hosts": None,
+            "keepalive_interval": self.keepalive_interval,
+            "connect_timeout": self.connect_timeout,
+        }
+        connect_options.update(options)
+        import asyncssh
+
+        try:
+            conn, client = await asyncssh.create_connection(
+                _pooled_client_class(), name, port, **connect_options
+            )
+        except Exception:
+            self._stats["connect_errors"] += 1
+            raise
+        return _PooledConnection(conn, client)
+
+    async def _is_healthy(self, pooled: _PooledConnection) -> bool:
+        import asyncssh
+
+        try:
+            await asyncio.wait_for(pooled.conn.run("true", check=True), timeout=self.connect_timeout)
+        except (asyncssh.Error, OSError, asyncio.TimeoutError):
+            return False
+        pooled.last_checked = time.monotonic()
+        return True
+
+    def _discard(self, pooled: _PooledConnection) -> None:
+        self._stats["evictions"] += 1
+        pooled.conn.close()
+
+    def evict_idle(self) -> int:
+        """Close idle connections that exceeded the idle timeout"""
+        now = time.monotonic()
+        evicted = 0
+        for pool in self._pools.values():
+            keep = []
+            for pooled in pool.idle:
+                if pooled.is_closed or now - pooled.last_used > self.idle_timeout:
+                    self._discard(pooled)
+                    evicted += 1
+                else:
+                    keep.append(pooled)
+            pool.idle = keep
+        return evicted
+
+    async def close(self) -> None:
+        """Close every idle connection held by the pool"""
+        idle = [pooled for pool in self._pools.values() for pooled in pool.idle]
+        for pool in self._pools.values():
+            pool.idle = []
+        for pooled in idle:
+            pooled.conn.close()
+        await asyncio.gather(*(pooled.conn.wait_closed() for pooled in idle), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool hit/miss counters and per-host connection counts"""
+        lookups = self._stats["hits"] + self._stats["misses"]
+        hosts = {}
+        for (name, port, _), pool in self._pools.items():
+            address = name if port == 22 else f"{name}:{port}"
+            entry = hosts.setdefault(address, {"idle": 0, "in_use": 0})
+            entry["idle"] += len(pool.idle)
+            entry["in_use"] += pool.in_use
+        return {
+            **self._stats,
+            "hit_ratio": self._stats["hits"] / lookups if lookups else 0.0,
+            "hosts": hosts,
+        }
+
+
+# One pool per event loop: pooled connections are bound to the loop that opened them
+_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, SSHConnectionPool]" = weakref.WeakKeyDictionary()
+
+
+def get_ssh_pool() -> SSHConnectionPool:
+    """Get the SSH connection pool for the running event loop"""
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        pool = _pools[loop] = SSHConnectionPool(
+            username=settings.robot_user,
+            client_keys=[settings.ssh_private_key_path],
+            max_per_host=settings.ssh_pool_max_per_host,
+            idle_timeout=settings.ssh_pool_idle_timeout,
+            health_check_interval=settings.ssh_pool_health_check_interval,
+            keepalive_interval=settings.ssh_keepalive_interval,
+            connect_timeout=settings.ssh_connect_timeout,
+        )
+    return pool
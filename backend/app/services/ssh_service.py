@@ -1,8 +1,64 @@
 import asyncio
-import asyncssh
+import hashlib
 import os
-from typing import Dict, Any, List
+import posixpath
+import re
+import shlex
+import uuid
+from typing import Awaitable, Callable, Dict, Any, List, Optional
 from app.core.config import settings
+from app.services.script_cache import script_cache
+from app.services.ssh_pool import get_ssh_pool
+
+# Offered to the robot when a transfer asks for compression
+COMPRESSION_ALGS = ["zlib@openssh.com", "zlib"]
+HASH_BLOCK_SIZE = 1024 * 1024
+
+def _sha256_file(path: str, limit: Optional[int] = None) -> str:
+    """SHA-256 of a local file, or of its first ``limit`` bytes"""
+    digest = hashlib.sha256()
+    remaining = limit
+    with open(path, "rb") as f:
+        while remaining is None or remaining > 0:
+            block = f.read(HASH_BLOCK_SIZE if remaining is None else min(HASH_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            digest.update(block)
+            if remaining is not None:
+                remaining -= len(block)
+    return digest.hexdigest()
+
+async def _remote_sha256(conn, remote_path: str, limit: Optional[int] = None) -> str:
+    """SHA-256 of a remote file, or of its first ``limit`` bytes, computed on the robot"""
+    path = shlex.quote(remote_path)
+    source = f"head -c {int(limit)} {path}" if limit is not None else f"cat {path}"
+    result = await conn.run(f"{source} | sha256sum", check=True)
+    return result.stdout.split()[0]
+
+async def _pipelined(offset: int, total: int, chunk_size: int, max_requests: Optional[int], copy_chunk: Callable[[int, int], Awaitable[None]]) -> None:
+    """Copy ``[offset, total)`` in fixed-size chunks keeping up to ``max_requests`` in flight"""
+    window = asyncio.Semaphore(max_requests or settings.sftp_max_requests)
+    pending = set()
+    errors = []
+
+    def on_done(task: asyncio.Task):
+        pending.discard(task)
+        window.release()
+        if not task.cancelled() and task.exception():
+            errors.append(task.exception())
+
+    position = offset
+    while position < total and not errors:
+        await window.acquire()
+        size = min(chunk_size, total - position)
+        task = asyncio.ensure_future(copy_chunk(position, size))
+        pending.add(task)
+        task.add_done_callback(on_done)
+        position += size
+    if pending:
+        await asyncio.wait(set(pending))
+    if errors:
+        raise errors[0]
 
 class SSHService:
     """Service for SSH operations with robots"""
@@ -11,17 +67,15 @@ class SSHService:
         self.robot_host = settings.robot_host
         self.robot_user = settings.robot_user
         self.ssh_key_path = settings.ssh_private_key_path
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Get hit/miss metrics of the SSH connection pool"""
+        return get_ssh_pool().stats()
         
     async def execute_command(self, host: str, command: str, **kwargs) -> Dict[str, Any]:
         """Execute a command on a remote host via SSH"""
         try:
-            async with asyncssh.connect(
-                host,
-                username=self.robot_user,
-                client_keys=[self.ssh_key_path],
-                known_hosts=None,
-                **kwargs
-            ) as conn:
+            async with get_ssh_pool().connection(host, **kwargs) as conn:
                 result = await conn.run(command, check=False)
                 return {
                     "output": result.stdout,
@@ -35,73 +89,186 @@ class SSHService:
                 "success": False
             }
     
-    async def upload_file(self, host: str, local_path: str, remote_path: str, **kwargs) -> Dict[str, Any]:
-        """Upload a file to a remote host via SSH"""
+    async def upload_file(
+        self,
+        host: str,
+        local_path: str,
+        remote_path: str,
+        chunk_size: int = None,
+        max_requests: int = None,
+        compress: bool = False,
+        resume: bool = False,
+        verify: bool = True,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """Upload a file to a remote host via SSH, streamed in pipelined chunks"""
+        chunk_size = chunk_size or settings.sftp_chunk_size
+        if compress:
+            kwargs.setdefault("compression_algs", COMPRESSION_ALGS)
+        loop = asyncio.get_running_loop()
         try:
-            async with asyncssh.connect(
-                host,
-                username=self.robot_user,
-                client_keys=[self.ssh_key_path],
-                known_hosts=None,
-                **kwargs
-            ) as conn:
-                await conn.run(f"mkdir -p {os.path.dirname(remote_path)}")
-                async with conn.start_sftp() as sftp:
-                    async with sftp.open(remote_path, 'w') as remote_file:
-                        with open(local_path, 'rb') as local_file:
-                            remote_file.write(local_file.read())
-                return {"success": True}
+            total = os.path.getsize(local_path)
+            async with get_ssh_pool().connection(host, **kwargs) as conn:
+                await conn.run(f"mkdir -p {shlex.quote(posixpath.dirname(remote_path) or '.')}", check=True)
+                async with conn.start_sftp_client() as sftp:
+                    offset = 0
+                    if resume and await sftp.exists(remote_path):
+                        offset = await self._resume_offset(
+                            conn, remote_path, local_path, (await sftp.stat(remote_path)).size or 0, total, chunk_size
+                        )
+                    fd = os.open(local_path, os.O_RDONLY)
+                    try:
+                        async with sftp.open(remote_path, "r+b" if offset else "wb") as remote_file:
+                            async def copy_chunk(position: int, size: int):
+                                data = await loop.run_in_executor(None, os.pread, fd, size, position)
+                                await remote_file.write(data, position)
+
+                            await _pipelined(offset, total, chunk_size, max_requests, copy_chunk)
+                        if resume:
+                            await sftp.truncate(remote_path, total)
+                    finally:
+                        os.close(fd)
+
+                result = {"success": True, "bytes": total - offset, "resumed_from": offset}
+                if verify:
+                    local_digest = await loop.run_in_executor(None, _sha256_file, local_path, None)
+                    remote_digest = await _remote_sha256(conn, remote_path)
+                    if local_digest != remote_digest:
+                        return {**result, "error": "Checksum mismatch after upload", "success": False}
+                    result["sha256"] = local_digest
+                return result
         except Exception as e:
             return {"error": str(e), "success": False}
     
-    async def download_file(self, host: str, remote_path: str, local_path: str, **kwargs) -> Dict[str, Any]:
-        """Download a file from a remote host via SSH"""
+    async def download_file(
+        self,
+        host: str,
+        remote_path: str,
+        local_path: str,
+        chunk_size: int = None,
+        max_requests: int = None,
+        compress: bool = False,
+        resume: bool = False,
+        verify: bool = True,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """Download a file from a remote host via SSH, streamed in pipelined chunks"""
+        chunk_size = chunk_size or settings.sftp_chunk_size
+        if compress:
+            kwargs.setdefault("compression_algs", COMPRESSION_ALGS)
+        loop = asyncio.get_running_loop()
         try:
-            async with asyncssh.connect(
-                host,
-                username=self.robot_user,
-                client_keys=[self.ssh_key_path],
-                known_hosts=None,
-                **kwargs
-            ) as conn:
-                async with conn.start_sftp() as sftp:
-                    async with sftp.open(remote_path, 'r') as remote_file:
-                        with open(local_path, 'wb') as local_file:
-                            local_file.write(await remote_file.read())
-                return {"success": True}
+            async with get_ssh_pool().connection(host, **kwargs) as conn:
+                async with conn.start_sftp_client() as sftp:
+                    total = (await sftp.stat(remote_path)).size or 0
+                    offset = 0
+                    if resume and os.path.exists(local_path):
+                        offset = await self._resume_offset(
+                            conn, remote_path, local_path, os.path.getsize(local_path), total, chunk_size
+                        )
+                    local_dir = os.path.dirname(local_path)
+                    if local_dir:
+                        os.makedirs(local_dir, exist_ok=True)
+                    fd = os.open(local_path, os.O_WRONLY | os.O_CREAT | (0 if offset else os.O_TRUNC), 0o644)
+                    try:
+                        async with sftp.open(remote_path, "rb") as remote_file:
+                            async def copy_chunk(position: int, size: int):
+                                data = await remote_file.read(size, position)
+                                await loop.run_in_executor(None, os.pwrite, fd, data, position)
+
+                            await _pipelined(offset, total, chunk_size, max_requests, copy_chunk)
+                        os.ftruncate(fd, total)
+                    finally:
+                        os.close(fd)
+
+                result = {"success": True, "bytes": total - offset, "resumed_from": offset}
+                if verify:
+                    local_digest = await loop.run_in_executor(None, _sha256_file, local_path, None)
+                    remote_digest = await _remote_sha256(conn, remote_path)
+                    if local_digest != remote_digest:
+                        return {**result, "error": "Checksum mismatch after download", "success": False}
+                    result["sha256"] = local_digest
+                return result
         except Exception as e:
             return {"error": str(e), "success": False}
     
-    async def execute_script(self, host: str, script_content: str, script_name: str) -> Dict[str, Any]:
-        """Execute a Python script on a remote robot"""
-        temp_dir = "/tmp/atriz_run/"
-        remote_path = temp_dir + script_name
+    async def _resume_offset(self, conn, remote_path: str, local_path: str, partial_size: int, total: int, chunk_size: int) -> int:
+        """Offset to resume from: the partial copy, cut to whole chunks, if its prefix checksum matches"""
+        offset = min(partial_size, total) // chunk_size * chunk_size
+        if offset == 0:
+            return 0
+        # Chunks are written out of order, so only trust a prefix whose checksums agree
+        loop = asyncio.get_running_loop()
+        local_digest = await loop.run_in_executor(None, _sha256_file, local_path, offset)
+        remote_digest = await _remote_sha256(conn, remote_path, offset)
+        return offset if local_digest == remote_digest else 0
+    
+    async def collect_artifacts(
+        self,
+        hosts: List[str],
+        remote_dir: str,
+        local_dir: str,
+        pattern: str = "*",
+        max_parallel: int = None,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """Download the files matching ``pattern`` in ``remote_dir`` from every robot
+        into ``local_dir/<host>/``, several robots at a time, resuming partial files"""
+        slots = asyncio.Semaphore(max_parallel or settings.swarm_max_parallel)
+
+        async def collect(host: str) -> Dict[str, Any]:
+            async with slots:
+                try:
+                    async with get_ssh_pool().connection(host, **kwargs) as conn:
+                        async with conn.start_sftp_client() as sftp:
+                            paths = [
+                                path for path in await sftp.glob(posixpath.join(remote_dir, pattern))
+                                if await sftp.isfile(path)
+                            ]
+                except Exception as e:
+                    return {"error": str(e), "success": False, "files": {}}
+
+                host_dir = os.path.join(local_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", host))
+                files = {}
+                for path in paths:
+                    name = posixpath.basename(path)
+                    files[name] = await self.download_file(host, path, os.path.join(host_dir, name), resume=True, **kwargs)
+                return {
+                    "success": all(result["success"] for result in files.values()),
+                    "local_dir": host_dir,
+                    "files": files,
+                }
+
+        results = await asyncio.gather(*(collect(host) for host in hosts))
+        return dict(zip(hosts, results))
+    
+    async def execute_script(self, host: str, script_content: str, script_name: str, supporting_files: Dict[str, str] = None) -> Dict[str, Any]:
+        """Execute a Python script on a remote robot (uploads only files not cached there)"""
+        run_id = str(uuid.uuid4())
+        files = dict(supporting_files or {})
+        files[script_name] = script_content
         
         try:
-            async with asyncssh.connect(
-                host,
-                username=self.robot_user,
-                client_keys=[self.ssh_key_path],
-                known_hosts=None
-            ) as conn:
-                # Create temp directory
-                await conn.run(f"mkdir -p {temp_dir}")
-                
-                # Upload script
-                async with conn.start_sftp() as sftp:
-                    async with sftp.open(remote_path, 'w') as remote_file:
-                        await remote_file.write(script_content)
-                
-                # Execute script
-                result = await conn.run(f"python3 {remote_path}", check=True, timeout=60)
+            async with get_ssh_pool().connection(host) as conn:
+                # Stage script and supporting files in a run directory
+                staged = await script_cache.stage(conn, files, run_id)
                 
-                # Cleanup
-                await conn.run(f"rm -rf {remote_path}")
+                try:
+                    # Execute script
+                    result = await conn.run(
+                        f"cd {shlex.quote(staged['run_dir'])} && python3 {shlex.quote(script_name)}",
+                        check=True,
+                        timeout=settings.robot_script_timeout
+                    )
+                finally:
+                    # Cleanup (cached blobs are kept)
+                    await conn.run(script_cache.cleanup_command(run_id))
                 
                 return {
                     "status": "completed",
                     "output": result.stdout,
                     "error": result.stderr,
+                    "uploaded_bytes": staged["uploaded_bytes"],
                     "success": True
                 }
         except Exception as e:
@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import weakref
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Text, String, DateTime, bindparam, func, update
+
+from app.core.config import settings
+from app.core.db import get_async_engine
+from app.core.metrics import DB_TRANSACTION_SECONDS
+from app.models.experiment import Experiment
+from app.models.task import Task
+from app.services.cache_service import read_cache
+
+logger = logging.getLogger(__name__)
+
+RUNNING_STATUSES = {"running", "progress"}
+FINAL_STATUSES = {"success", "failure", "completed", "failed"}
+
+# One executemany statement per table; NULL parameters keep the current value
+TASK_UPDATE = (
+    update(Task)
+    .where(Task.task_id == bindparam("b_key", type_=String))
+    .values(
+        status=bindparam("b_status", type_=String),
+        result=func.coalesce(bindparam("b_result", type_=Text), Task.result),
+        error=func.coalesce(bindparam("b_error", type_=Text), Task.error),
+        result_ref=func.coalesce(bindparam("b_ref", type_=String), Task.result_ref),
+        started_at=func.coalesce(Task.started_at, bindparam("b_started_at", type_=DateTime(timezone=True))),
+        completed_at=func.coalesce(bindparam("b_completed_at", type_=DateTime(timezone=True)), Task.completed_at),
+    )
+)
+
+EXPERIMENT_UPDATE = (
+    update(Experiment)
+    .where(Experiment.id == bindparam("b_key"))
+    .values(
+        status=bindparam("b_status", type_=String),
+        output=func.coalesce(bindparam("b_result", type_=Text), Experiment.output),
+        error=func.coalesce(bindparam("b_error", type_=Text), Experiment.error),
+        started_at=func.coalesce(Experiment.started_at, bindparam("b_started_at", type_=DateTime(timezone=True))),
+        completed_at=func.coalesce(bindparam("b_completed_at", type_=DateTime(timezone=True)), Experiment.completed_at),
+    )
+)
+
+
+def _merge(pending: Optional[Dict[str, Any]], key: Any, status: str, result: Optional[str], error: Optional[str], ref: Optional[str] = None) -> Dict[str, Any]:
+    """Fold a new transition into the pending one; the latest status wins"""
+    now = datetime.now(timezone.utc)
+    row = pending or {"b_key": key, "b_result": None, "b_error": None, "b_ref": None, "b_started_at": None, "b_completed_at": None}
+    row["b_status"] = status
+    if result is not None:
+        row["b_result"] = result
+    if error is not None:
+        row["b_error"] = error
+    if ref is not None:
+        row["b_ref"] = ref
+    if status in RUNNING_STATUSES and row["b_started_at"] is None:
+        row["b_started_at"] = now
+    if status in FINAL_STATUSES:
+        row["b_completed_at"] = now
+    return row
+
+
+def _requeue(failed: Dict[Any, Dict[str, Any]], pending: Dict[Any, Dict[str, Any]]) -> None:
+    """Put the rows of a failed flush back under the transitions submitted meanwhile,
+    as ``_merge`` would have: the newer status wins, the fields it leaves unset are kept"""
+    for key, row in failed.items():
+        newer = pending.get(key)
+        if newer is None:
+            pending[key] = row
+            continue
+        for field in ("b_result", "b_error", "b_ref", "b_completed_at"):
+            if newer[field] is None:
+                newer[field] = row[field]
+        # The first start time is kept
+        newer["b_started_at"] = row["b_started_at"] or newer["b_started_at"]
+
+
+class StatusWriter:
+    """Coalesces task/experiment status transitions into batched UPDATEs
+
+    Updates are merged per task (the latest status wins, results and errors
+    are kept) and written every ``flush_interval`` seconds as one executemany
+    per table. Flushes are serialized, so the updates of a task are applied
+    in the order they were submitted. Pass ``wait=True`` to block until the
+    update is committed.
+    """
+
+    def __init__(self, flush_interval: float = 0.05, max_batch: int = 500):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        self._experiments: Dict[int, Dict[str, Any]] = {}
+        self._waiters: List[asyncio.Future] = []
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._loop_task: Optional[asyncio.Task] = None
+        self._stats = {"submitted": 0, "written": 0, "flushes": 0, "flush_errors": 0}
+
+    async def update_task_status(self, task_id: str, status: str, result: str = None, error: str = None, result_ref: str = None, wait: bool = False) -> None:
+        """Queue a task status transition"""
+        self._tasks[task_id] = _merge(self._tasks.get(task_id), task_id, status, result, error, result_ref)
+        await self._submitted(wait)
+
+    async def update_experiment_status(self, experiment_id: int, status: str, output: str = None, error: str = None, wait: bool = False) -> None:
+        """Queue an experiment status transition"""
+        self._experiments[experiment_id] = _merge(self._experiments.get(experiment_id), experiment_id, status, output, error)
+        await self._submitted(wait)
+
+    async def _submitted(self, wait: bool) -> None:
+        self._stats["submitted"] += 1
+        self._ensure_started()
+        if len(self._tasks) + len(self._experiments) >= self.max_batch:
+            self._wakeup.set()
+        if wait:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            await waiter
+
+    def _ensure_started(self) -> None:
+        if self._loop_task is None or self._loop_task.done():
+            self._loop_task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning("Status flush failed: %s", e)
+
+    async def flush(self) -> int:
+        """Write every pending transition in one transaction"""
+        async with self._flush_lock:
+            tasks, self._tasks = self._tasks, {}
+            experiments, self._experiments = self._experiments, {}
+            waiters, self._waiters = self._waiters, []
+            if not tasks and not experiments:
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(None)
+                return 0
+
+            try:
+                with DB_TRANSACTION_SECONDS.labels("status_flush").time():
+                    await self._write(experiments, tasks)
+            except Exception as e:
+                self._stats["flush_errors"] += 1
+                # Re-queue without losing newer transitions submitted meanwhile
+                _requeue(tasks, self._tasks)
+                _requeue(experiments, self._experiments)
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(e)
+                raise
+
+            # Write-through: cached reads of these rows are stale from now on
+            if tasks:
+                await read_cache.invalidate_tasks(tasks.keys())
+            if experiments:
+                await read_cache.invalidate_experiments(experiments.keys())
+
+            written = len(tasks) + len(experiments)
+            self._stats["flushes"] += 1
+            self._stats["written"] += written
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+            return written
+
+    async def _write(self, experiments: Dict[int, Dict[str, Any]], tasks: Dict[str, Dict[str, Any]]) -> None:
+        async with get_async_engine().begin() as conn:
+            if experiments:
+                await conn.execute(EXPERIMENT_UPDATE, list(experiments.values()))
+            if tasks:
+                await conn.execute(TASK_UPDATE, list(tasks.values()))
+
+    async def close(self) -> None:
+        """Stop the flush loop and write what is still pending"""
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            try:
+                await self._loop_task
+            except asyncio.CancelledError:
+                pass
+            self._loop_task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "pending": len(self._tasks) + len(self._experiments)}
+
+
+# One writer per event loop, like the SSH pool
+_writers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, StatusWriter]" = weakref.WeakKeyDictionary()
+
+
+def get_status_writer() -> StatusWriter:
+    """Get the status writer for the running event loop"""
+    loop = asyncio.get_running_loop()
+    writer = _writers.get(loop)
+    if writer is None:
+        writer = _writers[loop] = StatusWriter(
+            flush_interval=settings.status_flush_interval,
+            max_batch=settings.status_flush_max_batch,
+        )
+    return writer
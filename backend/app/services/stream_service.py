@@ -0,0 +1,133 @@
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+END_EVENT = "end"
+
+
+def task_stream_key(task_id: str) -> str:
+    return f"atriz:task:{task_id}:output"
+
+
+class TaskOutputStream:
+    """Live stdout/stderr of a task, published to a Redis stream chunk by chunk"""
+
+    def __init__(self, task_id: str, robot_host: Optional[str] = None):
+        self.task_id = task_id
+        self.robot_host = robot_host
+        self.key = task_stream_key(task_id)
+
+    async def publish(self, stream: str, data: str) -> None:
+        """Append an output chunk; streaming errors never fail the robot run"""
+        fields = {"type": stream, "data": data}
+        if self.robot_host:
+            fields["robot"] = self.robot_host
+        await self._add(fields)
+
+    def for_robot(self, robot_host: str) -> "TaskOutputStream":
+        """Same task stream, with chunks tagged by robot (swarm runs)"""
+        return TaskOutputStream(self.task_id, robot_host)
+
+    async def finish(self, status: str) -> None:
+        """Mark the end of the task output so followers can stop reading"""
+        await self._add({"type": END_EVENT, "data": status})
+
+    async def _add(self, fields: Dict[str, str]) -> None:
+        try:
+            redis = get_redis()
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.xadd(self.key, fields, maxlen=settings.task_stream_maxlen, approximate=True)
+                pipe.expire(self.key, settings.task_stream_ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning("Could not publish output of task %s: %s", self.task_id, e)
+
+
+async def follow_task_output(
+    task_id: str,
+    last_id: str = "0-0",
+    block_ms: int = 15000,
+    max_idle: Optional[float] = None,
+) -> AsyncIterator[Tuple[Optional[str], Dict[str, Any]]]:
+    """Yield ``(entry_id, fields)`` from a task stream until its end event
+
+    A ``None`` entry id is yielded as a heartbeat when nothing arrived within
+    ``block_ms``, so callers can keep idle connections alive. When nothing
+    arrived for ``max_idle`` seconds (``TASK_STREAM_MAX_IDLE``) and the stream
+    does not exist, it never will or has expired: iteration ends.
+    """
+    redis = get_redis()
+    key = task_stream_key(task_id)
+    max_idle = settings.task_stream_max_idle if max_idle is None else max_idle
+    last_seen = time.monotonic()
+    while True:
+        response = await redis.xread({key: last_id}, count=100, block=block_ms)
+        if not response:
+            if time.monotonic() - last_seen >= max_idle and not await redis.exists(key):
+                return
+            yield None, {}
+            continue
+        last_seen = time.monotonic()
+        for entry_id, fields in response[0][1]:
+            last_id = entry_id
+            yield entry_id, fields
+            if fields.get("type") == END_EVENT:
+                return
+
+
+def user_events_key(user: str) -> str:
+    return f"atriz:user:{user}:events"
+
+
+async def publish_task_event(owner: Optional[str], task_id: str, status: str, outcome: Dict[str, Any]) -> None:
+    """Announce a finished task once, on its owner's event stream. Never raises
+
+    The event only carries the final status; the result itself is read from
+    the task row (``GET /status/{task_id}``) when a client wants it.
+    """
+    if not owner:
+        return
+    fields = {"type": "task", "task_id": task_id, "status": status, "outcome": outcome.get("status", "")}
+    if outcome.get("error"):
+        fields["error"] = str(outcome["error"])[:500]
+    await publish_user_event(owner, fields)
+
+
+async def publish_user_event(owner: str, fields: Dict[str, str]) -> None:
+    try:
+        key = user_events_key(owner)
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.xadd(key, fields, maxlen=settings.user_events_maxlen, approximate=True)
+            pipe.expire(key, settings.user_events_ttl)
+            await pipe.execute()
+    except Exception as e:
+        logger.warning("Could not publish event for user %s: %s", owner, e)
+
+
+async def stream_tail_id(key: str) -> str:
+    """Id of the newest entry of a stream (``0-0`` when empty), to follow only what comes next
+
+    Unlike ``$``, a concrete id loses nothing between two blocking reads.
+    """
+    entries = await get_redis().xrevrange(key, count=1)
+    return entries[0][0] if entries else "0-0"
+
+
+async def read_streams(streams: Dict[str, str], block_ms: int) -> List[Tuple[str, str, Dict[str, Any]]]:
+    """One blocking XREAD over several streams, as ``(key, entry_id, fields)``
+
+    ``streams`` maps each key to the last id seen and is advanced in place,
+    so calling this in a loop follows every stream without gaps.
+    """
+    response = await get_redis().xread(streams, count=100, block=block_ms)
+    entries = []
+    for key, items in response or []:
+        for entry_id, fields in items:
+            streams[key] = entry_id
+            entries.append((key, entry_id, fields))
+    return entries
@@ -0,0 +1,200 @@
+import asyncio
+import json
+import logging
+import time
+import warnings
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.core.db import get_async_engine
+from app.core.redis import get_redis
+from app.models.telemetry import TelemetrySample
+from app.services.replay_window import epoch_seconds
+from app.services.swarm_metrics_cache import METRICS_TTL, check_steps, metrics_key, metrics_params
+from app.services.telemetry_service import telemetry_version
+
+logger = logging.getLogger(__name__)
+
+NEIGHBOUR_BATCH = 16  # time steps per pairwise-distance batch: 16 x R x R floats
+
+
+def build_matrices(robot_ids: Sequence[str], buckets: np.ndarray, columns: Sequence[np.ndarray]) -> Tuple[list, np.ndarray, list]:
+    """Scatter per-(robot, bucket) rows into robot x time matrices, NaN where a robot did not report"""
+    robots, row = np.unique(np.asarray(robot_ids), return_inverse=True)
+    first = int(buckets.min())
+    col = (buckets - first).astype(np.int64)
+    matrices = []
+    for values in columns:
+        matrix = np.full((len(robots), int(col.max()) + 1), np.nan)
+        matrix[row, col] = values
+        matrices.append(matrix)
+    return robots.tolist(), first + np.arange(matrices[0].shape[1]), matrices
+
+
+def dispersion(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Radius of gyration: RMS distance of the robots to the swarm centroid, per time step"""
+    cx, cy = np.nanmean(x, axis=0), np.nanmean(y, axis=0)
+    return np.sqrt(np.nanmean((x - cx) ** 2 + (y - cy) ** 2, axis=0))
+
+
+def neighbour_metrics(x: np.ndarray, y: np.ndarray, radius: float) -> Dict[str, np.ndarray]:
+    """Nearest-neighbour distance, aggregation (fraction of robots with a neighbour
+    within ``radius``) and mean pairwise distance, per time step
+
+    Squared distances are computed for a batch of time steps at once, as a
+    batch x R x R array small enough to stay in cache; only the per-robot
+    minima and the upper triangle are square-rooted.
+    """
+    robots, steps = x.shape
+    nearest = np.full(steps, np.nan)
+    aggregation = np.full(steps, np.nan)
+    pairwise = np.full(steps, np.nan)
+    present = ~np.isnan(x)
+    upper = np.triu_indices(robots, 1)
+    diagonal = np.arange(robots)
+    for first in range(0, steps, NEIGHBOUR_BATCH):
+        window = slice(first, first + NEIGHBOUR_BATCH)
+        bx, by, reporting = x[:, window].T, y[:, window].T, present[:, window].T
+        squared = bx[:, :, None] - bx[:, None, :]
+        squared *= squared
+        dy = by[:, :, None] - by[:, None, :]
+        dy *= dy
+        squared += dy
+        # Robots that did not report, and each robot to itself, are never a neighbour
+        squared[~(reporting[:, :, None] & reporting[:, None, :])] = np.inf
+        squared[:, diagonal, diagonal] = np.inf
+        closest = np.sqrt(squared.min(axis=2))
+        found = np.isfinite(closest)
+        counted = found.sum(axis=1)
+        pairs = squared[:, upper[0], upper[1]]
+        finite = np.isfinite(pairs)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            # 0 / 0 leaves NaN where fewer than two robots reported
+            nearest[window] = np.where(found, closest, 0).sum(axis=1) / counted
+            aggregation[window] = (closest <= radius).sum(axis=1) / counted
+            pairwise[window] = np.sqrt(np.where(finite, pairs, 0)).sum(axis=1) / finite.sum(axis=1)
+    return {"nearest_neighbour": nearest, "aggregation": aggregation, "pairwise_distance": pairwise}
+
+
+def coverage(x: np.ndarray, y: np.ndarray, cell: float, bounds: Optional[Sequence[float]] = None) -> np.ndarray:
+    """Fraction of the arena grid cells visited by at least one robot up to each time step"""
+    if bounds is None:
+        bounds = (np.nanmin(x), np.nanmin(y), np.nanmax(x), np.nanmax(y))
+    xmin, ymin, xmax, ymax = bounds
+    nx = max(1, int(np.ceil((xmax - xmin) / cell)))
+    ny = max(1, int(np.ceil((ymax - ymin) / cell)))
+    steps = x.shape[1]
+    with np.errstate(invalid="ignore"):
+        ix = np.floor((x - xmin) / cell)
+        iy = np.floor((y - ymin) / cell)
+        inside = (ix >= 0) & (ix < nx) & (iy >= 0) & (iy < ny)
+    cells = (iy[inside] * nx + ix[inside]).astype(np.int64)
+    when = np.broadcast_to(np.arange(steps), x.shape)[inside]
+    first_visit = np.full(nx * ny, steps)
+    np.minimum.at(first_visit, cells, when)
+    new_cells = np.bincount(first_visit[first_visit < steps], minlength=steps)
+    return np.cumsum(new_cells) / (nx * ny)
+
+
+def floor_fractions(colors: np.ndarray) -> Dict[int, np.ndarray]:
+    """Per floor color index, the fraction of the reporting robots standing on it, per time step"""
+    present = (~np.isnan(colors)).sum(axis=0)
+    fractions = {}
+    for color in np.unique(colors[~np.isnan(colors)]):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            fractions[int(color)] = np.where(present, (colors == color).sum(axis=0) / np.maximum(present, 1), np.nan)
+    return fractions
+
+
+def _summary(values: np.ndarray) -> Dict[str, Optional[float]]:
+    if np.isnan(values).all():
+        return {"mean": None, "min": None, "max": None, "final": None}
+    valid = values[~np.isnan(values)]
+    return {
+        "mean": round(float(valid.mean()), 4),
+        "min": round(float(valid.min()), 4),
+        "max": round(float(valid.max()), 4),
+        "final": round(float(valid[-1]), 4),
+    }
+
+
+def _thin(values: np.ndarray, points: int) -> list:
+    """Every k-th value, so a long series stays under ``points`` values"""
+    stride = max(1, int(np.ceil(len(values) / points)))
+    return [None if v != v else round(v, 4) for v in values[::stride].tolist()]
+
+
+def compute_metrics(x: np.ndarray, y: np.ndarray, colors: np.ndarray, params: Dict[str, float],
+                    bounds: Optional[Sequence[float]] = None) -> Dict[str, Any]:
+    """Every collective metric of a run from its robot x time matrices, as summaries and series"""
+    with warnings.catch_warnings():
+        # Time steps where no robot reported are NaN on purpose
+        warnings.simplefilter("ignore", RuntimeWarning)
+        series: Dict[str, np.ndarray] = {
+            "dispersion": dispersion(x, y),
+            **neighbour_metrics(x, y, params["aggregation_radius"]),
+            "coverage": coverage(x, y, params["cell_size"], bounds),
+            "robots_reporting": (~np.isnan(x)).sum(axis=0).astype(float),
+        }
+        for color, fraction in floor_fractions(colors).items():
+            series[f"floor_color_{color}"] = fraction
+    return {
+        "summary": {name: _summary(values) for name, values in series.items()},
+        "series": {name: _thin(values, settings.swarm_metrics_max_points) for name, values in series.items()},
+    }
+
+
+async def load_matrices(experiment_id: int, step: float):
+    """Robot x time matrices of x, y and floor color, averaged per ``step`` in Postgres"""
+    bucket = func.floor(epoch_seconds(TelemetrySample.ts) / step).label("bucket")
+    query = (
+        select(
+            TelemetrySample.robot_id, bucket,
+            func.avg(TelemetrySample.x), func.avg(TelemetrySample.y),
+            func.mode().within_group(TelemetrySample.floor_color),
+        )
+        .where(TelemetrySample.experiment_id == experiment_id)
+        .group_by(TelemetrySample.robot_id, bucket)
+        .order_by(TelemetrySample.robot_id, bucket)
+    )
+    async with get_async_engine().connect() as conn:
+        rows = (await conn.execute(query)).all()
+    if not rows:
+        return None
+    robots = [row[0] for row in rows]
+    values = np.array([row[1:] for row in rows], dtype=np.float64)
+    return build_matrices(robots, values[:, 0], [values[:, 1], values[:, 2], values[:, 3]])
+
+
+async def compute_and_cache(experiment_id: int, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Compute the metrics of a stored run and cache them under the current telemetry version"""
+    params = metrics_params(params)
+    # Read before loading: samples flushed meanwhile bump it and make this result stale
+    version = await telemetry_version(experiment_id)
+    started = time.perf_counter()
+    await check_steps(experiment_id, params["step"])
+    loaded = await load_matrices(experiment_id, params["step"])
+    if loaded is None:
+        return {"experiment_id": experiment_id, "status": "no_telemetry"}
+    robots, buckets, (x, y, colors) = loaded
+    # NumPy work runs in a thread: the worker loop keeps serving SSH jobs
+    metrics = await asyncio.get_running_loop().run_in_executor(
+        None, compute_metrics, x, y, colors, params, settings.arena_bounds
+    )
+    result = {
+        "experiment_id": experiment_id,
+        "status": "completed",
+        "version": version,
+        "params": params,
+        "robots": robots,
+        "start": float(buckets[0] * params["step"]),
+        "steps": len(buckets),
+        "computed_at": time.time(),
+        "compute_seconds": round(time.perf_counter() - started, 3),
+        **metrics,
+    }
+    await get_redis().set(metrics_key(experiment_id, params), json.dumps(result), ex=METRICS_TTL)
+    return result
@@ -0,0 +1,60 @@
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.core.db import get_async_engine
+from app.core.redis import get_redis
+from app.models.telemetry import TelemetrySample
+from app.services.replay_window import epoch_seconds
+from app.services.telemetry_service import telemetry_version_key
+
+# Parameters, checks and cache lookups of the swarm metrics, without NumPy: the
+# API imports this, only the workers that compute metrics load swarm_metrics
+
+METRICS_TTL = 7 * 24 * 3600
+MIN_STEP = 0.1  # seconds; telemetry arrives at 10-30 Hz
+
+
+def metrics_params(params: Optional[Dict[str, Any]] = None) -> Dict[str, float]:
+    """Metric parameters with the configured defaults filled in"""
+    params = params or {}
+    return {
+        "step": float(params.get("step") or settings.swarm_metrics_step),
+        "aggregation_radius": float(params.get("aggregation_radius") or settings.swarm_aggregation_radius),
+        "cell_size": float(params.get("cell_size") or settings.swarm_coverage_cell),
+    }
+
+
+def metrics_key(experiment_id: int, params: Dict[str, float]) -> str:
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+    return f"atriz:metrics:{experiment_id}:{digest}"
+
+
+async def check_steps(experiment_id: int, step: float) -> None:
+    """Reject a ``step`` that would split the run into more than SWARM_METRICS_MAX_STEPS time steps"""
+    seconds = epoch_seconds(TelemetrySample.ts)
+    query = select(func.min(seconds), func.max(seconds)).where(TelemetrySample.experiment_id == experiment_id)
+    async with get_async_engine().connect() as conn:
+        first, last = (await conn.execute(query)).one()
+    if first is None:
+        return
+    steps = int((last - first) // step) + 1
+    if steps > settings.swarm_metrics_max_steps:
+        raise ValueError(
+            f"The run spans {last - first:.0f}s: {steps} time steps of {step:g}s, "
+            f"the limit is {settings.swarm_metrics_max_steps}; use a larger step"
+        )
+
+
+async def get_cached(experiment_id: int, params: Dict[str, float]) -> Optional[Dict[str, Any]]:
+    """Stored metrics, ``None`` when never computed or when telemetry changed since"""
+    raw, version = await get_redis().mget(metrics_key(experiment_id, params), telemetry_version_key(experiment_id))
+    if raw is None:
+        return None
+    result = json.loads(raw)
+    if result["version"] != (version or "0"):
+        return None
+    return result
@@ -0,0 +1,127 @@
+import itertools
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+PARAMS_FILE = "params.json"  # written next to the script of every sweep run
+PROGRESS_TTL = 7 * 24 * 3600
+
+# Counts a run only into an existing aggregate: a run reporting after the hash
+# expired (or was dropped) must not recreate it without its total
+_RECORD_RUN_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return false
+end
+local done = redis.call('HINCRBY', KEYS[1], 'done', 1)
+redis.call('HINCRBY', KEYS[1], 'status:' .. ARGV[1], 1)
+local total = tonumber(redis.call('HGET', KEYS[1], 'total'))
+if total and done >= total then
+    redis.call('HSETNX', KEYS[1], 'finished_at', ARGV[2])
+end
+return done
+"""
+
+
+def sweep_key(sweep_id: str) -> str:
+    return f"atriz:sweep:{sweep_id}"
+
+
+def expand_grid(parameters: Dict[str, List[Any]], repetitions: int = 1) -> List[Dict[str, Any]]:
+    """Every combination of the parameter grid, ``repetitions`` times each
+
+    Runs are ordered by repetition first, so an interrupted sweep has covered
+    the whole grid as evenly as possible.
+    """
+    names = sorted(parameters)
+    combinations = [dict(zip(names, values)) for values in itertools.product(*(parameters[n] for n in names))]
+    return [
+        {"index": repetition * len(combinations) + i, "repetition": repetition, "params": params}
+        for repetition in range(repetitions)
+        for i, params in enumerate(combinations)
+    ]
+
+
+def params_file(run: Dict[str, Any]) -> str:
+    """Content of ``params.json`` for one run"""
+    return json.dumps({**run["params"], "_repetition": run["repetition"], "_index": run["index"]}, sort_keys=True)
+
+
+def run_label(script_name: str, run: Dict[str, Any]) -> str:
+    params = ", ".join(f"{name}={value}" for name, value in run["params"].items())
+    return f"{script_name} [{params}] #{run['repetition']}"[:255]
+
+
+async def start_progress(sweep_id: str, total: int, meta: Dict[str, Any]) -> None:
+    """Create the progress aggregate of a sweep (a Redis hash of counters)"""
+    async with get_redis().pipeline(transaction=True) as pipe:
+        pipe.hset(sweep_key(sweep_id), mapping={
+            "total": total,
+            "done": 0,
+            "created_at": time.time(),
+            "meta": json.dumps(meta),
+        })
+        pipe.expire(sweep_key(sweep_id), PROGRESS_TTL)
+        await pipe.execute()
+
+
+async def drop_progress(sweep_id: str) -> None:
+    """Forget a sweep that was never enqueued"""
+    await get_redis().delete(sweep_key(sweep_id))
+
+
+async def record_run(sweep_id: str, status: str) -> None:
+    """Count one finished run; the last one stamps ``finished_at``. Never raises"""
+    try:
+        await get_redis().eval(_RECORD_RUN_SCRIPT, 1, sweep_key(sweep_id), status, time.time())
+    except Exception as e:
+        logger.warning("Could not record progress of sweep %s: %s", sweep_id, e)
+
+
+async def record_summary(sweep_id: str, summary: Dict[str, Any]) -> None:
+    """Store the aggregate computed once every run has reported (chord callback)"""
+    redis = get_redis()
+    await redis.hset(sweep_key(sweep_id), mapping={"summary": json.dumps(summary), "finished_at": time.time()})
+    await redis.expire(sweep_key(sweep_id), PROGRESS_TTL)
+
+
+async def get_progress(sweep_id: str) -> Optional[Dict[str, Any]]:
+    """Progress of a sweep from its Redis aggregate, ``None`` once it expired"""
+    raw = await get_redis().hgetall(sweep_key(sweep_id))
+    if not raw:
+        return None
+    done = int(raw.get("done", 0))
+    total = int(raw.get("total", done))
+    progress = {
+        "sweep_id": sweep_id,
+        "total": total,
+        "done": done,
+        "percent": round(100.0 * done / total, 1) if total else 100.0,
+        "statuses": {name.split(":", 1)[1]: int(count) for name, count in raw.items() if name.startswith("status:")},
+        "created_at": float(raw["created_at"]) if raw.get("created_at") else None,
+        "finished_at": float(raw["finished_at"]) if raw.get("finished_at") else None,
+        **json.loads(raw.get("meta") or "{}"),
+    }
+    if raw.get("summary"):
+        progress["summary"] = json.loads(raw["summary"])
+    return progress
+
+
+def summarize(results: List[Any]) -> Dict[str, Any]:
+    """Aggregate of the run outcomes handed to the chord callback"""
+    statuses: Dict[str, int] = {}
+    for result in results:
+        status = result.get("status", "unknown") if isinstance(result, dict) else "error"
+        statuses[status] = statuses.get(status, 0) + 1
+    completed = statuses.get("completed", 0)
+    return {
+        "status": "completed" if completed == len(results) else "partial_failure",
+        "runs": len(results),
+        "completed": completed,
+        "failed": len(results) - completed,
+        "statuses": statuses,
+    }
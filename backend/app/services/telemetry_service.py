@@ -0,0 +1,338 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import struct
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.db import get_async_engine
+from app.core.metrics import DB_TRANSACTION_SECONDS
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+# --- Binary batch format ---
+# Header: magic "AT", format version, padding byte, sample count
+# Sample: t (unix seconds), x, y, theta, floor color, 4 IR readings,
+#         LIDAR summary (min, mean, front distance)
+TELEMETRY_MAGIC = b"AT"
+TELEMETRY_VERSION = 1
+HEADER = struct.Struct("<2sBxI")
+SAMPLE = struct.Struct("<d3fB4H3f")
+
+SAMPLE_COLUMNS = [
+    "experiment_id", "robot_id", "ts", "x", "y", "theta",
+    "floor_color", "ir", "lidar_min", "lidar_mean", "lidar_front",
+]
+
+MAX_IR = 32767  # IR readings are stored as smallint
+
+# Samples are copied into a per-connection staging table first, so samples
+# already stored (a batch sent twice) are skipped instead of failing the COPY.
+# Rollups are aggregated from the rows actually inserted, so a duplicate is
+# never counted twice.
+STAGING_TABLE = "telemetry_samples_staging"
+CREATE_STAGING = f"""
+    CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (LIKE telemetry_samples) ON COMMIT DELETE ROWS
+"""
+INSERT_STAGED = f"""
+    WITH inserted AS (
+        INSERT INTO telemetry_samples ({", ".join(SAMPLE_COLUMNS)})
+        SELECT {", ".join(SAMPLE_COLUMNS)} FROM {STAGING_TABLE}
+        ON CONFLICT DO NOTHING
+        RETURNING experiment_id, robot_id, ts, x, y, lidar_min
+    ), rollup AS (
+        INSERT INTO telemetry_rollups (
+            experiment_id, robot_id, bucket_seconds, bucket_start, sample_count,
+            x_sum, y_sum, x_min, x_max, y_min, y_max, lidar_min
+        )
+        SELECT experiment_id, robot_id, level, to_timestamp(floor(extract(epoch FROM ts) / level) * level),
+               count(*), sum(x), sum(y), min(x), max(x), min(y), max(y), min(lidar_min)
+        FROM inserted CROSS JOIN unnest($1::int[]) AS level
+        GROUP BY 1, 2, 3, 4
+        ON CONFLICT (experiment_id, robot_id, bucket_seconds, bucket_start) DO UPDATE SET
+            sample_count = telemetry_rollups.sample_count + EXCLUDED.sample_count,
+            x_sum = telemetry_rollups.x_sum + EXCLUDED.x_sum,
+            y_sum = telemetry_rollups.y_sum + EXCLUDED.y_sum,
+            x_min = LEAST(telemetry_rollups.x_min, EXCLUDED.x_min),
+            x_max = GREATEST(telemetry_rollups.x_max, EXCLUDED.x_max),
+            y_min = LEAST(telemetry_rollups.y_min, EXCLUDED.y_min),
+            y_max = GREATEST(telemetry_rollups.y_max, EXCLUDED.y_max),
+            lidar_min = LEAST(telemetry_rollups.lidar_min, EXCLUDED.lidar_min)
+    )
+    SELECT count(*) FROM inserted
+"""
+
+
+def telemetry_version_key(experiment_id: int) -> str:
+    """Counter bumped whenever samples of the experiment are written (invalidates derived results)"""
+    return f"atriz:telemetry:{experiment_id}:version"
+
+
+async def telemetry_version(experiment_id: int) -> str:
+    """Current telemetry version of an experiment, ``"0"`` until samples are first written"""
+    return await get_redis().get(telemetry_version_key(experiment_id)) or "0"
+
+
+async def bump_telemetry_versions(experiment_ids) -> None:
+    """Mark the telemetry of these experiments as changed. Never raises"""
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            for experiment_id in experiment_ids:
+                pipe.incr(telemetry_version_key(experiment_id))
+            await pipe.execute()
+    except Exception as e:
+        logger.warning("Could not bump telemetry versions: %s", e)
+
+
+class TelemetryDecodeError(ValueError):
+    """Raised when a telemetry batch is not a valid binary payload"""
+
+
+class TelemetryBufferFull(RuntimeError):
+    """Raised when the ingestion buffer is full because flushes are falling behind"""
+
+
+def encode_batch(samples: Sequence[Sequence[float]]) -> bytes:
+    """Pack samples ``(t, x, y, theta, floor_color, ir0..ir3, lidar_min, lidar_mean, lidar_front)``"""
+    parts = [HEADER.pack(TELEMETRY_MAGIC, TELEMETRY_VERSION, len(samples))]
+    parts.extend(SAMPLE.pack(*sample) for sample in samples)
+    return b"".join(parts)
+
+
+def decode_batch(payload: bytes) -> List[tuple]:
+    """Unpack a binary telemetry batch into sample tuples"""
+    if len(payload) < HEADER.size:
+        raise TelemetryDecodeError("Payload shorter than telemetry header")
+    magic, version, count = HEADER.unpack_from(payload)
+    if magic != TELEMETRY_MAGIC or version != TELEMETRY_VERSION:
+        raise TelemetryDecodeError(f"Unsupported telemetry format {magic!r} v{version}")
+    if len(payload) != HEADER.size + count * SAMPLE.size:
+        raise TelemetryDecodeError(f"Payload size does not match {count} samples")
+    return list(SAMPLE.iter_unpack(memoryview(payload)[HEADER.size:]))
+
+
+def sample_records(experiment_id: int, robot_id: str, samples: Sequence[tuple]) -> List[tuple]:
+    """COPY-ready rows of a decoded batch
+
+    Raises TelemetryDecodeError, before anything is buffered, for values the
+    table cannot store: a non-finite time or pose, a NaN LIDAR reading
+    (``inf`` means no return) or an IR reading beyond ``MAX_IR``.
+    """
+    records = []
+    for t, x, y, theta, floor_color, ir0, ir1, ir2, ir3, lidar_min, lidar_mean, lidar_front in samples:
+        if not (math.isfinite(t) and math.isfinite(x) and math.isfinite(y) and math.isfinite(theta)):
+            raise TelemetryDecodeError("Telemetry time and pose must be finite numbers")
+        if lidar_min != lidar_min or lidar_mean != lidar_mean or lidar_front != lidar_front:
+            raise TelemetryDecodeError("Telemetry LIDAR readings must not be NaN")
+        if max(ir0, ir1, ir2, ir3) > MAX_IR:
+            raise TelemetryDecodeError(f"IR readings must not exceed {MAX_IR}")
+        try:
+            ts = datetime.fromtimestamp(t, timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            raise TelemetryDecodeError(f"Telemetry time {t} is out of range")
+        records.append((
+            experiment_id, robot_id, ts, x, y, theta, floor_color,
+            [ir0, ir1, ir2, ir3], lidar_min, lidar_mean, lidar_front,
+        ))
+    return records
+
+
+class PostgresTelemetrySink:
+    """Writes flushed telemetry with COPY through a staging table, and its rollups, in one transaction"""
+
+    def __init__(self, rollup_levels: Sequence[int] = (1, 10, 60)):
+        self.rollup_levels = [int(level) for level in rollup_levels]
+
+    async def write(self, records: List[tuple]) -> int:
+        """Store the samples not stored yet and add them to the rollups; returns how many were new"""
+        with DB_TRANSACTION_SECONDS.labels("telemetry_copy").time():
+            return await self._write(records)
+
+    async def _write(self, records: List[tuple]) -> int:
+        async with get_async_engine().connect() as conn:
+            raw = await conn.get_raw_connection()
+            driver = raw.driver_connection
+            async with driver.transaction():
+                await driver.execute(CREATE_STAGING)
+                await driver.copy_records_to_table(STAGING_TABLE, records=records, columns=SAMPLE_COLUMNS)
+                return await driver.fetchval(INSERT_STAGED, self.rollup_levels)
+
+
+class TelemetryIngestor:
+    """In-memory telemetry buffer flushed to the time-series store in bulk
+
+    Batches are decoded, validated and buffered as COPY-ready records. A
+    background loop flushes every ``flush_interval`` seconds, or earlier once
+    ``flush_max_samples`` are waiting, so there is never a per-sample commit.
+    A failed flush keeps its batches for the next one; after
+    ``max_flush_attempts`` failures in a row, every batch is written on its
+    own and those still failing are quarantined to ``quarantine_dir`` (JSON
+    lines), so one bad batch cannot stall ingestion for every robot.
+    """
+
+    def __init__(
+        self,
+        sink=None,
+        flush_interval: float = 1.0,
+        flush_max_samples: int = 20000,
+        max_buffered_samples: int = 500000,
+        rollup_levels: Sequence[int] = (1, 10, 60),
+        max_flush_attempts: int = 5,
+        quarantine_dir: Optional[str] = None,
+    ):
+        self.sink = sink or PostgresTelemetrySink(rollup_levels)
+        self.flush_interval = flush_interval
+        self.flush_max_samples = flush_max_samples
+        self.max_buffered_samples = max_buffered_samples
+        self.max_flush_attempts = max_flush_attempts
+        self.quarantine_dir = quarantine_dir
+        self._batches: List[List[tuple]] = []
+        self._buffered = 0
+        self._failed_flushes = 0
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._loop_task: Optional[asyncio.Task] = None
+        self._stats = {
+            "samples_received": 0,
+            "samples_flushed": 0,
+            "samples_duplicate": 0,
+            "samples_quarantined": 0,
+            "batches_rejected": 0,
+            "flushes": 0,
+            "flush_errors": 0,
+            "last_flush_seconds": 0.0,
+        }
+
+    def add_batch(self, experiment_id: int, robot_id: str, payload: bytes) -> int:
+        """Decode, validate and buffer one batch; returns the number of samples accepted"""
+        records = sample_records(experiment_id, robot_id, decode_batch(payload))
+        if self._buffered + len(records) > self.max_buffered_samples:
+            self._stats["batches_rejected"] += 1
+            raise TelemetryBufferFull("Telemetry buffer is full, retry later")
+        if records:
+            self._batches.append(records)
+            self._buffered += len(records)
+        self._stats["samples_received"] += len(records)
+        if self._buffered >= self.flush_max_samples and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_logged())
+        return len(records)
+
+    @property
+    def buffered(self) -> int:
+        return self._buffered
+
+    async def flush(self) -> int:
+        """Write every buffered sample in one transaction; returns how many were new"""
+        async with self._flush_lock:
+            batches, self._batches = self._batches, []
+            count, self._buffered = self._buffered, 0
+            if not batches:
+                return 0
+
+            started = time.perf_counter()
+            records = [record for batch in batches for record in batch]
+            try:
+                inserted = await self.sink.write(records)
+            except Exception as e:
+                self._stats["flush_errors"] += 1
+                self._failed_flushes += 1
+                if self._failed_flushes < self.max_flush_attempts:
+                    # Keep the data for the next flush instead of losing it
+                    self._batches[:0] = batches
+                    self._buffered += count
+                    raise
+                logger.error("Telemetry flush failed %d times (%s), writing batches one by one", self._failed_flushes, e)
+                inserted, quarantined = await self._write_isolated(batches)
+            else:
+                quarantined = 0
+            self._failed_flushes = 0
+
+            await bump_telemetry_versions({batch[0][0] for batch in batches})
+            self._stats["flushes"] += 1
+            self._stats["samples_flushed"] += inserted
+            self._stats["samples_duplicate"] += len(records) - inserted - quarantined
+            self._stats["last_flush_seconds"] = time.perf_counter() - started
+            return inserted
+
+    async def _write_isolated(self, batches: List[List[tuple]]) -> Tuple[int, int]:
+        """Write each batch in its own transaction and quarantine the ones that fail;
+        returns the samples inserted and quarantined"""
+        inserted = quarantined = 0
+        for batch in batches:
+            try:
+                inserted += await self.sink.write(batch)
+            except Exception as e:
+                await asyncio.get_running_loop().run_in_executor(None, self._quarantine, batch, str(e))
+                quarantined += len(batch)
+        self._stats["samples_quarantined"] += quarantined
+        return inserted, quarantined
+
+    def _quarantine(self, batch: List[tuple], error: str) -> None:
+        """Append a batch that cannot be stored to the quarantine file of its experiment (blocking)"""
+        experiment_id, robot_id = batch[0][0], batch[0][1]
+        logger.error("Quarantined %d telemetry samples of experiment %s, robot %s: %s", len(batch), experiment_id, robot_id, error)
+        if not self.quarantine_dir:
+            return
+        try:
+            os.makedirs(self.quarantine_dir, exist_ok=True)
+            path = os.path.join(self.quarantine_dir, f"experiment-{experiment_id}.jsonl")
+            with open(path, "a") as f:
+                for record in batch:
+                    row = dict(zip(SAMPLE_COLUMNS, record))
+                    row["ts"] = row["ts"].timestamp()
+                    f.write(json.dumps(row) + "\n")
+        except OSError as e:
+            logger.error("Could not write the telemetry quarantine file: %s", e)
+
+    async def _flush_logged(self) -> None:
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning("Telemetry flush failed: %s", e)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._flush_logged()
+
+    def start(self) -> None:
+        """Start the periodic background flush"""
+        if self._loop_task is None:
+            self._loop_task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Stop the background flush and write whatever is still buffered"""
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            try:
+                await self._loop_task
+            except asyncio.CancelledError:
+                pass
+            self._loop_task = None
+        await self._flush_logged()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "buffered": self.buffered}
+
+
+_ingestor: Optional[TelemetryIngestor] = None
+
+
+def get_telemetry_ingestor() -> TelemetryIngestor:
+    """Get the process-wide telemetry ingestor"""
+    global _ingestor
+    if _ingestor is None:
+        _ingestor = TelemetryIngestor(
+            flush_interval=settings.telemetry_flush_interval,
+            flush_max_samples=settings.telemetry_flush_max_samples,
+            max_buffered_samples=settings.telemetry_max_buffered_samples,
+            rollup_levels=settings.telemetry_rollup_levels,
+            max_flush_attempts=settings.telemetry_max_flush_attempts,
+            quarantine_dir=settings.telemetry_quarantine_dir,
+        )
+    return _ingestor
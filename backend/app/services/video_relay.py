@@ -0,0 +1,367 @@
+import asyncio
+import io
+import itertools
+import logging
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import (
+    VIDEO_FRAME_LATENCY_SECONDS,
+    VIDEO_FRAMES_DROPPED,
+    VIDEO_FRAMES_INGESTED,
+    VIDEO_FRAMES_SENT,
+    VIDEO_VIEWERS,
+)
+
+logger = logging.getLogger(__name__)
+
+QUALITIES = ("high", "low", "auto")
+JPEG_START = b"\xff\xd8"
+JPEG_END = b"\xff\xd9"
+ADAPT_WINDOW = 30          # frames delivered between two quality decisions of an ``auto`` viewer
+ADAPT_DOWN_DROP_RATIO = 0.2
+FPS_WINDOW = 30
+
+
+class CameraNotFound(LookupError):
+    """No arena camera with that name is configured"""
+
+
+class RenditionUnavailable(RuntimeError):
+    """The low-quality rendition needs Pillow, which is not installed"""
+
+
+class TooManyViewers(RuntimeError):
+    """The relay already serves ``video_max_viewers`` viewers"""
+
+
+def low_rendition_available() -> bool:
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def encode_low(jpeg: bytes, width: int, quality: int) -> bytes:
+    """Downscale a JPEG frame to ``width`` pixels and re-encode it at ``quality``"""
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(jpeg))
+    image.draft("RGB", (width, width))  # DCT scaling: decode at 1/2, 1/4 or 1/8 size when possible
+    if image.width > width:
+        image = image.resize((width, max(1, round(image.height * width / image.width))), Image.BILINEAR)
+    output = io.BytesIO()
+    image.convert("RGB").save(output, "JPEG", quality=quality)
+    return output.getvalue()
+
+
+class JpegSplitter:
+    """Cuts a byte stream (MJPEG over HTTP, any boundary) into complete JPEG frames"""
+
+    def __init__(self, max_frame_bytes: int):
+        self.max_frame_bytes = max_frame_bytes
+        self._buffer = bytearray()
+        self._scanned = 0  # where the search for the end marker resumes
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        self._buffer += chunk
+        frames = []
+        while True:
+            start = self._buffer.find(JPEG_START)
+            if start < 0:
+                del self._buffer[:-1]  # keep a trailing 0xff, it may start the next marker
+                self._scanned = 0
+                return frames
+            if start:
+                del self._buffer[:start]
+                self._scanned = 0
+            end = self._buffer.find(JPEG_END, max(2, self._scanned))
+            if end < 0:
+                if len(self._buffer) > self.max_frame_bytes:
+                    logger.warning("Discarding %d bytes without a complete JPEG frame", len(self._buffer))
+                    del self._buffer[:2]
+                    self._scanned = 0
+                    continue
+                self._scanned = len(self._buffer) - 1
+                return frames
+            frames.append(bytes(self._buffer[:end + 2]))
+            del self._buffer[:end + 2]
+            self._scanned = 0
+
+
+class Frame:
+    """One camera frame; renditions other than ``high`` are encoded on first request, once"""
+
+    __slots__ = ("seq", "captured", "jpeg", "_renditions")
+
+    def __init__(self, seq: int, jpeg: bytes):
+        self.seq = seq
+        self.captured = time.perf_counter()
+        self.jpeg = jpeg
+        self._renditions: Dict[str, asyncio.Future] = {}
+
+    async def rendition(self, name: str) -> bytes:
+        if name == "high":
+            return self.jpeg
+        future = self._renditions.get(name)
+        if future is None:
+            # Viewers of the same rendition share one encode in the thread pool
+            future = self._renditions[name] = asyncio.get_running_loop().run_in_executor(
+                None, encode_low, self.jpeg, settings.video_low_width, settings.video_low_quality
+            )
+        try:
+            return await future
+        except Exception as e:
+            logger.debug("Could not encode the %s rendition of frame %d: %s", name, self.seq, e)
+            return self.jpeg
+
+
+class Viewer:
+    """One connected client and its delivery statistics"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, camera: str, quality: str, client: Optional[str] = None):
+        self.id = next(self._ids)
+        self.camera = camera
+        self.client = client
+        self.quality = quality
+        self.rendition = "low" if quality == "low" else "high"
+        self.connected_at = time.time()
+        self.last_seq: Optional[int] = None
+        self.sent = 0
+        self.dropped = 0
+        self.latency_last = 0.0
+        self.latency_max = 0.0
+        self.latency_avg = 0.0  # exponential moving average
+        self._window_sent = 0
+        self._window_dropped = 0
+
+    def set_quality(self, quality: str) -> None:
+        self.quality = quality
+        if quality != "auto":
+            self._switch(quality)
+
+    def _switch(self, rendition: str) -> None:
+        if rendition == self.rendition:
+            return
+        VIDEO_VIEWERS.labels(self.camera, self.rendition).dec()
+        VIDEO_VIEWERS.labels(self.camera, rendition).inc()
+        self.rendition = rendition
+        self._window_sent = self._window_dropped = 0
+
+    def skipped(self, frame: Frame) -> int:
+        """Frames published since the last one this viewer got (it was still sending)"""
+        if self.last_seq is None:
+            return 0
+        return frame.seq - self.last_seq - 1
+
+    def delivered(self, frame: Frame, skipped: int) -> None:
+        latency = time.perf_counter() - frame.captured
+        self.last_seq = frame.seq
+        self.sent += 1
+        self.dropped += skipped
+        self.latency_last = latency
+        self.latency_max = max(self.latency_max, latency)
+        self.latency_avg = latency if self.sent == 1 else 0.9 * self.latency_avg + 0.1 * latency
+        VIDEO_FRAMES_SENT.labels(self.camera, self.rendition).inc()
+        if skipped:
+            VIDEO_FRAMES_DROPPED.labels(self.camera, self.rendition).inc(skipped)
+        VIDEO_FRAME_LATENCY_SECONDS.labels(self.camera, self.rendition).observe(latency)
+        if self.quality == "auto":
+            self._adapt(skipped)
+
+    def _adapt(self, skipped: int) -> None:
+        """Step down while the viewer cannot keep up with the camera; step up once it does again"""
+        self._window_sent += 1
+        self._window_dropped += skipped
+        if self._window_sent < ADAPT_WINDOW:
+            return
+        ratio = self._window_dropped / (self._window_sent + self._window_dropped)
+        if self.rendition == "high" and ratio > ADAPT_DOWN_DROP_RATIO and low_rendition_available():
+            self._switch("low")
+        elif self.rendition == "low" and self._window_dropped == 0:
+            self._switch("high")
+        self._window_sent = self._window_dropped = 0
+
+    def stats(self) -> Dict[str, Any]:
+        offered = self.sent + self.dropped
+        return {
+            "id": self.id,
+            "camera": self.camera,
+            "client": self.client,
+            "quality": self.quality,
+            "rendition": self.rendition,
+            "connected_seconds": round(time.time() - self.connected_at, 1),
+            "frames_sent": self.sent,
+            "frames_dropped": self.dropped,
+            "drop_ratio": round(self.dropped / offered, 3) if offered else 0.0,
+            "latency_ms": {
+                "last": round(self.latency_last * 1000, 1),
+                "avg": round(self.latency_avg * 1000, 1),
+                "max": round(self.latency_max * 1000, 1),
+            },
+        }
+
+
+class CameraRelay:
+    """Ingests one camera while it has viewers and always holds its latest frame
+
+    Viewers never queue frames: each one takes the newest frame when it is
+    done sending the previous one, so a slow viewer skips frames instead of
+    falling behind or growing a buffer in the API process.
+    """
+
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.url = url
+        self.latest: Optional[Frame] = None
+        self.viewers: Dict[int, Viewer] = {}
+        self.connected = False
+        self.last_error: Optional[str] = None
+        self._seq = 0
+        self._new_frame = asyncio.Event()
+        self._arrivals: deque = deque(maxlen=FPS_WINDOW)
+        self._idle_since = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+
+    def add_viewer(self, viewer: Viewer) -> None:
+        self.viewers[viewer.id] = viewer
+        VIDEO_VIEWERS.labels(self.name, viewer.rendition).inc()
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._ingest())
+
+    def remove_viewer(self, viewer: Viewer) -> None:
+        if self.viewers.pop(viewer.id, None) is not None:
+            VIDEO_VIEWERS.labels(self.name, viewer.rendition).dec()
+        if not self.viewers:
+            self._idle_since = time.monotonic()
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+    def publish(self, jpeg: bytes) -> None:
+        self._seq += 1
+        self.latest = Frame(self._seq, jpeg)
+        self._arrivals.append(self.latest.captured)
+        VIDEO_FRAMES_INGESTED.labels(self.name).inc()
+        # Wake every waiting viewer at once, then arm a fresh event for the next frame
+        event, self._new_frame = self._new_frame, asyncio.Event()
+        event.set()
+
+    async def next_frame(self, after_seq: Optional[int]) -> Frame:
+        """The latest frame, waiting for one newer than ``after_seq``"""
+        while self.latest is None or (after_seq is not None and self.latest.seq <= after_seq):
+            await self._new_frame.wait()
+        return self.latest
+
+    async def frames(self, viewer: Viewer) -> AsyncIterator[bytes]:
+        """Encoded frames for one viewer; statistics are recorded when the consumer asks for the next one"""
+        while True:
+            frame = await self.next_frame(viewer.last_seq)
+            skipped = viewer.skipped(frame)
+            yield await frame.rendition(viewer.rendition)
+            viewer.delivered(frame, skipped)
+
+    def _idle(self) -> bool:
+        return not self.viewers and time.monotonic() - self._idle_since > settings.video_idle_timeout
+
+    async def _ingest(self) -> None:
+        """Read the camera MJPEG stream, reconnecting on errors, until nobody watched for ``video_idle_timeout``"""
+        import httpx  # only processes relaying a camera need the HTTP client
+
+        timeout = httpx.Timeout(settings.video_read_timeout, connect=settings.video_read_timeout)
+        try:
+            async with httpx.AsyncClient(timeout=timeout) as client:
+                while not self._idle():
+                    splitter = JpegSplitter(settings.video_max_frame_bytes)
+                    try:
+                        async with client.stream("GET", self.url) as response:
+                            response.raise_for_status()
+                            self.connected, self.last_error = True, None
+                            async for chunk in response.aiter_bytes():
+                                for jpeg in splitter.feed(chunk):
+                                    self.publish(jpeg)
+                                if self._idle():
+                                    break
+                    except Exception as e:
+                        self.last_error = str(e) or type(e).__name__
+                        logger.warning("Camera %s: %s", self.name, self.last_error)
+                    finally:
+                        self.connected = False
+                    if not self._idle():
+                        await asyncio.sleep(settings.video_reconnect_delay)
+        finally:
+            # A viewer arriving after the ingest stopped must wait for a fresh frame, not get this one
+            self.latest = None
+
+    def fps(self) -> float:
+        if len(self._arrivals) < 2:
+            return 0.0
+        span = self._arrivals[-1] - self._arrivals[0]
+        return round((len(self._arrivals) - 1) / span, 1) if span > 0 else 0.0
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "camera": self.name,
+            "ingesting": self._task is not None and not self._task.done(),
+            "connected": self.connected,
+            "fps": self.fps(),
+            "frame_bytes": len(self.latest.jpeg) if self.latest else None,
+            "last_frame_age": round(time.perf_counter() - self.latest.captured, 2) if self.latest else None,
+            "viewers": len(self.viewers),
+            "last_error": self.last_error,
+        }
+
+
+class VideoRelay:
+    """The cameras of ``ARENA_CAMERAS`` and their viewers, for this API process"""
+
+    def __init__(self, cameras: Dict[str, str], max_viewers: int):
+        self.cameras = {name: CameraRelay(name, url) for name, url in cameras.items()}
+        self.max_viewers = max_viewers
+
+    def camera(self, name: str) -> CameraRelay:
+        try:
+            return self.cameras[name]
+        except KeyError:
+            raise CameraNotFound(f"Unknown camera {name}")
+
+    def connect(self, camera: str, quality: str, client: Optional[str] = None) -> Viewer:
+        relay = self.camera(camera)
+        if quality == "low" and not low_rendition_available():
+            raise RenditionUnavailable("The low rendition needs Pillow")
+        if sum(len(c.viewers) for c in self.cameras.values()) >= self.max_viewers:
+            raise TooManyViewers(f"Already serving {self.max_viewers} viewers")
+        viewer = Viewer(camera, quality, client)
+        relay.add_viewer(viewer)
+        return viewer
+
+    def disconnect(self, viewer: Viewer) -> None:
+        self.camera(viewer.camera).remove_viewer(viewer)
+
+    def viewer_stats(self) -> List[Dict[str, Any]]:
+        return [viewer.stats() for relay in self.cameras.values() for viewer in relay.viewers.values()]
+
+    async def stop(self) -> None:
+        await asyncio.gather(*(relay.stop() for relay in self.cameras.values()))
+
+
+_relay: Optional[VideoRelay] = None
+
+
+def get_video_relay() -> VideoRelay:
+    """Get the process-wide video relay"""
+    global _relay
+    if _relay is None:
+        _relay = VideoRelay(settings.arena_cameras, settings.video_max_viewers)
+    return _relay
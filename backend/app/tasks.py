@@ -1,86 +1,733 @@
 # Lógica del Worker Celery y la Tarea Asíncrona SSH
 import asyncio
+import concurrent.futures
+import json
+import logging
 import os
+import shlex
+import threading
+import time
+from collections import deque
+from contextlib import AsyncExitStack
+from typing import Callable, Dict, List, Optional
+import uuid
 import asyncssh
-from celery import Celery
-from dotenv import load_dotenv
+from celery.exceptions import Retry
+from celery.signals import worker_process_shutdown
+from app.core.celery_app import celery_app
 from app.core.config import settings
-
-load_dotenv() # Cargar variables de .env
-
-# --- Configuración de Celery ---
-celery_app = Celery(
-    'atriz_tasks',
-    broker=settings.redis_url,
-    backend=settings.redis_url
-)
-
-# Configuración adicional de Celery
-celery_app.conf.update(
-    task_serializer='json',
-    accept_content=['json'],
-    result_serializer='json',
-    timezone='America/Bogota',
-    enable_utc=True,
-    task_track_started=True,
-    task_time_limit=30 * 60,  # 30 minutos
-    task_soft_time_limit=25 * 60,  # 25 minutos
-)
+from app.core.metrics import ROBOT_PHASE_SECONDS, ROBOT_RUNS, mark_process_dead
+from app.services import admission, detached_runs, reservation_service
+from app.services.reservation_service import RobotReserved
+from app.services.result_archive import result_archive
+from app.services.scheduler import RobotBusy, RobotLease
+from app.services import sweep_service
+from app.services.script_cache import script_cache
+from app.services.ssh_pool import get_ssh_pool
+from app.services.status_writer import get_status_writer
+from app.services.stream_service import TaskOutputStream, publish_task_event, publish_user_event
 
 # --- Variables de Entorno para SSH ---
 ROBOT_HOST = settings.robot_host
 ROBOT_USER = settings.robot_user
 SSH_KEY_PATH = settings.ssh_private_key_path
 
-@celery_app.task(name='run_robot_script')
-def run_robot_script(robot_host: str, user_script_content: str, script_name: str):
+logger = logging.getLogger(__name__)
+
+@worker_process_shutdown.connect
+def _on_worker_process_shutdown(pid=None, **kwargs):
+    # Métricas multiproceso: los gauges del hijo que termina dejan de contar
+    mark_process_dead(pid or os.getpid())
+
+class _WorkerLoop:
+    """
+    Event loop de larga vida en un hilo dedicado, uno por proceso Worker.
+    Los hilos de Celery (pool "threads") le envían sus corrutinas y esperan el
+    resultado, así un solo proceso maneja decenas de robots a la vez y el pool
+    SSH, Redis y el StatusWriter se comparten entre todas las tareas.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """
+        Espera el resultado de la corrutina como mucho `timeout` segundos
+        (WORKER_TASK_TIMEOUT por defecto). El pool "threads" de Celery ignora
+        task_time_limit, así que este plazo es el que evita que una conexión SSH
+        o de BD colgada bloquee el hilo para siempre.
+        """
+        timeout = timeout or settings.worker_task_timeout
+        future = asyncio.run_coroutine_threadsafe(coro, self._ensure_running())
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Worker coroutine exceeded {timeout:g}s and was cancelled")
+        except BaseException:
+            # Cierre del worker (o límite de Celery en prefork): cancelar la corrutina
+            future.cancel()
+            raise
+
+    def _ensure_running(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="atriz-worker-loop", daemon=True
+                )
+                self._thread.start()
+            return self._loop
+
+    def reset_after_fork(self):
+        # El hilo del loop no sobrevive a fork(): el hijo crea el suyo al primer uso
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+
+_worker_loop = _WorkerLoop()
+os.register_at_fork(after_in_child=_worker_loop.reset_after_fork)
+
+def _run_in_worker_loop(coro, timeout: Optional[float] = None):
+    """
+    Ejecuta la corrutina en el event loop persistente del proceso Worker.
+    A diferencia de asyncio.run, el loop no se destruye al terminar, así que
+    las conexiones SSH del pool se reutilizan entre tareas.
+    """
+    return _worker_loop.run(coro, timeout)
+
+@celery_app.task(bind=True, name='run_robot_script', max_retries=None)
+def run_robot_script(self, robot_host: str, user_script_content: str, script_name: str, supporting_files: Optional[Dict[str, str]] = None, sweep_id: Optional[str] = None, owner: Optional[str] = None):
     """
     Tarea Celery que inicia la ejecución remota de un script Python.
     Es vital que esto sea una tarea para evitar bloquear el ciclo de FastAPI.
+    La salida se transmite en vivo al stream Redis de la tarea.
+    Si la ejecución forma parte de un barrido (sweep), se suma a su progreso.
+    Al terminar se avisa una sola vez en el stream de eventos de `owner`.
     """
-    # Ejecuta la función asíncrona dentro del Worker síncrono
-    return asyncio.run(
-        _deploy_and_run_async(robot_host, user_script_content, script_name)
-    )
+    # self.request es local al hilo de Celery: leerlo aquí, no dentro del loop
+    task_id = self.request.id
+    outcome = {"status": "general_failure", "error": "Interrupted"}
+    retrying = False
+    try:
+        # Ejecuta la función asíncrona dentro del Worker síncrono
+        outcome = _run_leased(self, [robot_host], lambda: _deploy_and_run_async(
+            robot_host, user_script_content, script_name, TaskOutputStream(task_id),
+            supporting_files=supporting_files, run_id=task_id
+        ), owner=owner)
+    except Retry:
+        retrying = True
+        raise
+    except Exception as e:
+        if not sweep_id:
+            raise
+        # Una ejecución de un barrido siempre devuelve resultado: si fallara, el chord
+        # no llamaría nunca a finish_sweep (sin resumen, finished_at ni aviso)
+        outcome = _failure_result(e)
+    finally:
+        if sweep_id and not retrying:
+            _run_in_worker_loop(sweep_service.record_run(sweep_id, outcome["status"]))
+    return outcome
+
+def _run_leased(task, robot_hosts: List[str], make_coro, detached_ttl: Optional[int] = None, owner: Optional[str] = None,
+                runtime: Optional[float] = None):
+    """
+    Ejecuta el trabajo solo si obtiene la concesión (lease) de todos sus robots.
+    Si algún robot está ocupado, la tarea se reintenta más tarde en vez de
+    ejecutar dos scripts a la vez sobre el mismo RVR.
+    Tampoco arranca si la reserva de otro usuario cubre algún robot durante los
+    próximos `runtime` segundos: se reintenta cuando esa reserva termina.
+    """
+    runtime = runtime or settings.robot_script_timeout
+    if detached_ttl:
+        coro = _with_detached_lease(task.request.id, robot_hosts, make_coro, detached_ttl, owner, runtime)
+    else:
+        coro = _with_lease(task.request.id, robot_hosts, make_coro, owner, runtime)
+    try:
+        return _run_in_worker_loop(coro)
+    except RobotReserved as e:
+        logger.info("Task %s deferred: %s", task.request.id, e)
+        raise task.retry(exc=e, countdown=e.retry_after)
+    except RobotBusy as e:
+        raise task.retry(exc=e, countdown=settings.robot_lease_retry_delay)
+    except Exception as e:
+        # Plazo vencido o Redis caído al tomar la concesión: la fila no debe quedarse
+        # en pending/progress ni la tarea retener su plaza en el control de admisión
+        logger.warning("Task %s failed before recording its outcome: %s", task.request.id, e)
+        try:
+            _run_in_worker_loop(_record_failure(task.request.id, _failure_result(e), owner))
+        except Exception as record_error:
+            logger.warning("Could not record the failure of task %s: %s", task.request.id, record_error)
+        raise
+
+async def _record_failure(task_id: str, outcome: dict, owner: Optional[str] = None):
+    """Estado final de una tarea que falló fuera del robot; libera su admisión pase lo que pase."""
+    try:
+        await _record_outcome(task_id, outcome, owner)
+        await TaskOutputStream(task_id).finish(outcome["status"])
+    finally:
+        await admission.release(task_id)
+
+async def _with_lease(task_id: str, robot_hosts: List[str], make_coro, owner: Optional[str] = None, runtime: float = 0):
+    await reservation_service.check_dispatch(robot_hosts, owner, runtime)
+    async with RobotLease(robot_hosts, owner=task_id):
+        return await _with_status_tracking(task_id, make_coro(), owner)
 
-async def _deploy_and_run_async(robot_host: str, user_script_content: str, script_name: str):
+async def _with_detached_lease(task_id: str, robot_hosts: List[str], make_coro, ttl: int, owner: Optional[str] = None,
+                               runtime: float = 0):
+    """
+    Concesión que sobrevive a la tarea: dura lo que el script en el robot
+    (sin renovación) y la libera el poller cuando recoge el resultado.
+    make_coro recibe la hora de la concesión, que se guarda en el handle para
+    que el poller la contabilice (RobotLease.resume) al liberarla.
+    """
+    await reservation_service.check_dispatch(robot_hosts, owner, runtime)
+    lease = RobotLease(robot_hosts, owner=task_id, ttl=ttl)
+    await lease.acquire(renew=False)
+    try:
+        outcome = await _with_status_tracking(task_id, make_coro(lease.acquired_at), owner)
+    except BaseException:
+        await lease.release()
+        raise
+    if outcome["status"] == "detached":
+        lease.hand_off()
+    else:
+        await lease.release()
+    return outcome
+
+async def _with_status_tracking(task_id: str, coro, owner: Optional[str] = None):
+    """
+    Registra las transiciones de la tarea (progress -> success/failure) en la BD.
+    Las escrituras pasan por el StatusWriter, que las agrupa en UPDATEs por lotes;
+    solo el estado final espera a que el lote se confirme.
+    """
+    await get_status_writer().update_task_status(task_id, "progress")
+    outcome = await coro
+    # Una ejecución desacoplada sigue en curso: su estado final lo escribe el poller
+    if outcome["status"] != "detached":
+        outcome = await _record_outcome(task_id, outcome, owner)
+    return outcome
+
+async def _record_outcome(task_id: str, outcome: dict, owner: Optional[str] = None) -> dict:
+    """
+    Escribe el estado final. Las salidas largas van antes al archivo de resultados
+    (bloques comprimidos en disco) y la fila solo guarda su cola y la referencia;
+    devuelve el resultado tal como quedó en la fila, que es también el que guarda Celery.
+    Solo si la fila se confirmó, se publica el evento de fin para el usuario: los
+    clientes reciben el aviso por WebSocket en vez de consultar el estado en bucle,
+    y el trabajo deja de contar en el control de admisión.
+    """
+    ref = None
+    try:
+        outcome, ref = await asyncio.get_running_loop().run_in_executor(
+            None, result_archive.archive_outcome, task_id, outcome
+        )
+    except Exception as e:
+        logger.warning("Could not archive the outputs of task %s: %s", task_id, e)
+    writer = get_status_writer()
+    status = "success" if outcome["status"] == "completed" else "failure"
+    try:
+        if status == "success":
+            await writer.update_task_status(task_id, status, result=json.dumps(outcome), result_ref=ref, wait=True)
+        else:
+            await writer.update_task_status(task_id, status, result=json.dumps(outcome), error=outcome.get("error"), result_ref=ref, wait=True)
+    except Exception as e:
+        # Sin fila confirmada no hay evento: el cliente que lo recibiera leería un estado que no está en la BD
+        logger.warning("Could not persist final status of task %s: %s", task_id, e)
+    else:
+        await publish_task_event(owner, task_id, status, outcome)
+    await admission.release(task_id)
+    return outcome
+
+# --- Fases de ejecución en un robot (compartidas por la tarea simple y la de enjambre) ---
+STREAM_CHUNK_SIZE = 4096
+
+async def _upload_script(conn, user_script_content: str, script_name: str, supporting_files: Optional[Dict[str, str]], run_id: str) -> dict:
+    """
+    Prepara el directorio de ejecución en el robot usando la caché por contenido:
+    solo se suben por SFTP los archivos cuyo hash el robot aún no tiene.
+    """
+    files = dict(supporting_files or {})
+    files[script_name] = user_script_content
+    return await script_cache.stage(conn, files, run_id)
+
+class _OutputTail:
+    """Conserva solo los últimos `max_chars` caracteres de una salida (memoria acotada)."""
+
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self.chunks = deque()
+        self.size = 0
+        self.truncated = False
+
+    def append(self, chunk: str):
+        self.chunks.append(chunk)
+        self.size += len(chunk)
+        while self.size - len(self.chunks[0]) >= self.max_chars:
+            self.size -= len(self.chunks.popleft())
+            self.truncated = True
+
+    def getvalue(self) -> str:
+        value = "".join(self.chunks)
+        if len(value) > self.max_chars:
+            self.truncated = True
+            value = value[-self.max_chars:]
+        return value
+
+async def _stream_process(conn, command: str, stream: Optional[TaskOutputStream], timeout: float):
+    """
+    Ejecuta el comando leyendo stdout/stderr de forma incremental.
+    Cada fragmento se publica en el stream de la tarea (si hay uno) y solo se
+    conserva la cola de la salida para el resultado final.
+    """
+    stdout = _OutputTail(settings.task_output_max_chars)
+    stderr = _OutputTail(settings.task_output_max_chars)
+
+    async def pump(reader, name: str, tail: _OutputTail):
+        while True:
+            chunk = await reader.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            tail.append(chunk)
+            if stream:
+                await stream.publish(name, chunk)
+
+    async with conn.create_process(command) as process:
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(pump(process.stdout, "stdout", stdout), pump(process.stderr, "stderr", stderr)),
+                timeout
+            )
+            completed = await process.wait()
+        except asyncio.TimeoutError:
+            process.close()
+            raise asyncssh.TimeoutError(
+                process.env, process.command, process.subsystem, None, None, None,
+                stdout.getvalue(), stderr.getvalue(), reason=f"Script timed out after {timeout:g}s"
+            )
+
+    if completed.exit_status != 0:
+        raise asyncssh.ProcessError(
+            process.env, process.command, process.subsystem, completed.exit_status,
+            completed.exit_signal, completed.returncode, stdout.getvalue(), stderr.getvalue()
+        )
+    return {
+        "output": stdout.getvalue(),
+        "error": stderr.getvalue(),
+        "truncated": stdout.truncated or stderr.truncated,
+    }
+
+async def _run_script(conn, run_id: str, script_name: str, stream: Optional[TaskOutputStream] = None) -> dict:
+    """Ejecuta el script preparado (transmitiendo su salida) y limpia el directorio de ejecución."""
+    run_dir = shlex.quote(script_cache.run_dir(run_id))
+    try:
+        with ROBOT_PHASE_SECONDS.labels("execute").time():
+            return await _stream_process(
+                conn, f"cd {run_dir} && python3 {shlex.quote(script_name)}", stream, settings.robot_script_timeout
+            )
+    finally:
+        with ROBOT_PHASE_SECONDS.labels("cleanup").time():
+            await conn.run(script_cache.cleanup_command(run_id))
+
+def _failure_result(e: Exception) -> dict:
+    if isinstance(e, asyncssh.Error):
+        return {"status": "ssh_failure", "error": f"SSH/Execution Error: {str(e)}"}
+    return {"status": "general_failure", "error": f"General Error: {str(e)}"}
+
+async def _deploy_and_run_async(
+    robot_host: str,
+    user_script_content: str,
+    script_name: str,
+    stream: Optional[TaskOutputStream] = None,
+    supporting_files: Optional[Dict[str, str]] = None,
+    run_id: Optional[str] = None,
+):
     """
     Función Asíncrona: Conexión SSH, subida, ejecución y sandboxing (simulado).
     """
-    TEMP_DIR = "/tmp/atriz_run/"
-    REMOTE_PATH = TEMP_DIR + script_name
-    
+    run_id = run_id or str(uuid.uuid4())
     # Sandboxing: En un entorno real, la ejecución de este comando 'python3 {REMOTE_PATH}' 
     # se haría dentro de un contenedor Docker efímero en el propio robot para aislar recursos.
     
     try:
-        # 1. Conexión SSH Asíncrona
-        async with asyncssh.connect(
-            robot_host, 
-            username=ROBOT_USER, 
-            client_keys=[SSH_KEY_PATH],
-            known_hosts=None
-        ) as conn:
+        # 1. Conexión SSH Asíncrona (reutilizada desde el pool si existe)
+        connect_started = time.perf_counter()
+        async with get_ssh_pool().connection(robot_host) as conn:
+            ROBOT_PHASE_SECONDS.labels("connect").observe(time.perf_counter() - connect_started)
             
-            # 2. Transferencia del Script (SFTP)
-            await conn.run(f"mkdir -p {TEMP_DIR}")
-            async with conn.start_sftp() as sftp:
-                async with sftp.open(REMOTE_PATH, 'w') as remote_file:
-                    await remote_file.write(user_script_content)
+            # 2. Transferencia del Script (SFTP, solo lo que falte en la caché del robot)
+            staged = await _upload_script(conn, user_script_content, script_name, supporting_files, run_id)
             
-            # 3. Ejecución del Script
-            result = await conn.run(f"python3 {REMOTE_PATH}", check=True, timeout=60)
-            
-            # 4. Limpieza
-            await conn.run(f"rm -rf {REMOTE_PATH}")
+            # 3. Ejecución del Script y 4. Limpieza
+            result = await _run_script(conn, run_id, script_name, stream)
 
-        return {
-            "status": "completed", 
-            "output": result.stdout, 
-            "error": result.stderr
-        }
+        logger.debug("SSH pool stats: %s", get_ssh_pool().stats())
+        outcome = {"status": "completed", **result, "uploaded_bytes": staged["uploaded_bytes"]}
         
-    except asyncssh.Error as e:
-        return {"status": "ssh_failure", "error": f"SSH/Execution Error: {str(e)}"}
     except Exception as e:
-        return {"status": "general_failure", "error": f"General Error: {str(e)}"}
+        outcome = _failure_result(e)
+
+    ROBOT_RUNS.labels(outcome["status"]).inc()
+    if stream:
+        await stream.finish(outcome["status"])
+    return outcome
+
+# --- Ejecución en Enjambre ---
+@celery_app.task(bind=True, name='run_swarm_script', max_retries=None)
+def run_swarm_script(self, robot_hosts: List[str], user_script_content: str, script_name: str, max_parallel: Optional[int] = None, supporting_files: Optional[Dict[str, str]] = None, owner: Optional[str] = None):
+    """
+    Tarea Celery que despliega y ejecuta el mismo script en N robots a la vez.
+    Un solo event loop sube el script a todos los robots con paralelismo acotado,
+    luego arranca todas las ejecuciones juntas tras una barrera de sincronización.
+    """
+    task_id = self.request.id
+
+    def on_result(host: str, result: dict, done: int, total: int):
+        self.update_state(task_id=task_id, state='PROGRESS', meta={"done": done, "total": total, "last_robot": host})
+
+    return _run_leased(self, robot_hosts, lambda: _deploy_and_run_swarm_async(
+        robot_hosts, user_script_content, script_name, max_parallel, on_result,
+        TaskOutputStream(task_id), supporting_files, task_id
+    ), owner=owner)
+
+async def _deploy_and_run_swarm_async(
+    robot_hosts: List[str],
+    user_script_content: str,
+    script_name: str,
+    max_parallel: Optional[int] = None,
+    on_result: Optional[Callable[[str, dict, int, int], None]] = None,
+    stream: Optional[TaskOutputStream] = None,
+    supporting_files: Optional[Dict[str, str]] = None,
+    run_id: Optional[str] = None,
+):
+    """
+    Función Asíncrona: subida concurrente, barrera de inicio y recolección de resultados.
+
+    Fase 1: cada robot se conecta y recibe el script (a lo sumo `max_parallel` a la vez).
+    Fase 2: cuando todos los robots terminaron la fase 1 (con éxito o no), se liberan
+            todas las ejecuciones al mismo tiempo.
+    Los resultados se recogen a medida que cada robot termina. Si hay `stream`,
+    la salida de cada robot se publica etiquetada con su host.
+    """
+    hosts = list(dict.fromkeys(robot_hosts))
+    run_id = run_id or str(uuid.uuid4())
+    upload_slots = asyncio.Semaphore(max_parallel or settings.swarm_max_parallel)
+    start = asyncio.Event()
+    pending = len(hosts)
+
+    def _arrived():
+        nonlocal pending
+        pending -= 1
+        if pending == 0:
+            start.set()
+
+    async def _robot(host: str):
+        arrived = False
+        started_at = None
+        robot_stream = stream.for_robot(host) if stream else None
+        try:
+            async with AsyncExitStack() as stack:
+                async with upload_slots:
+                    connect_started = time.perf_counter()
+                    conn = await stack.enter_async_context(get_ssh_pool().connection(host))
+                    ROBOT_PHASE_SECONDS.labels("connect").observe(time.perf_counter() - connect_started)
+                    staged = await _upload_script(conn, user_script_content, script_name, supporting_files, run_id)
+                _arrived()
+                arrived = True
+
+                # Barrera: nadie arranca hasta que todos estén listos
+                await start.wait()
+                started_at = time.time()
+                result = await _run_script(conn, run_id, script_name, robot_stream)
+            outcome = {"status": "completed", **result, "uploaded_bytes": staged["uploaded_bytes"]}
+        except Exception as e:
+            if not arrived:
+                _arrived()
+            outcome = _failure_result(e)
+        ROBOT_RUNS.labels(outcome["status"]).inc()
+        if robot_stream:
+            await robot_stream.publish("exit", outcome["status"])
+        return host, {**outcome, "started_at": started_at, "finished_at": time.time()}
+
+    results = {}
+    if hosts:
+        for finished in asyncio.as_completed([_robot(host) for host in hosts]):
+            host, result = await finished
+            results[host] = result
+            if on_result:
+                # Escritura bloqueante al backend de Celery: fuera del loop compartido
+                await asyncio.get_running_loop().run_in_executor(
+                    None, on_result, host, result, len(results), len(hosts)
+                )
+
+    start_times = [r["started_at"] for r in results.values() if r["started_at"] is not None]
+    completed = sum(1 for r in results.values() if r["status"] == "completed")
+    status = "completed" if hosts and completed == len(hosts) else "partial_failure"
+    if stream:
+        await stream.finish(status)
+    return {
+        "status": status,
+        "robots": results,
+        "completed": completed,
+        "failed": len(hosts) - completed,
+        "start_skew": max(start_times) - min(start_times) if start_times else None,
+    }
+
+# --- Barridos de Parámetros (sweeps) ---
+@celery_app.task(name='finish_sweep')
+def finish_sweep(results: List[dict], sweep_id: str, owner: Optional[str] = None):
+    """
+    Callback del chord de un barrido: se ejecuta una sola vez, cuando todas las
+    ejecuciones terminaron, y guarda el resumen agregado junto a su progreso.
+    """
+    summary = sweep_service.summarize(results)
+    _run_in_worker_loop(_finish_sweep_async(sweep_id, summary, owner))
+    return {"sweep_id": sweep_id, **summary}
+
+async def _finish_sweep_async(sweep_id: str, summary: dict, owner: Optional[str]):
+    await sweep_service.record_summary(sweep_id, summary)
+    if owner:
+        await publish_user_event(owner, {
+            "type": "sweep", "sweep_id": sweep_id, "status": summary["status"],
+            "completed": summary["completed"], "failed": summary["failed"],
+        })
+
+# --- Recolección de Artefactos ---
+@celery_app.task(bind=True, name='collect_artifacts')
+def collect_artifacts(self, experiment_id: int, robot_hosts: List[str], remote_dir: Optional[str] = None, pattern: str = "*"):
+    """
+    Tarea Celery que descarga los artefactos (rosbags, volcados LIDAR, logs)
+    de todos los robots de un experimento a `artifacts_dir/<experimento>/<robot>/`.
+    Las descargas van por bloques y se reanudan si una conexión se cae a mitad.
+    """
+    from app.services.ssh_service import SSHService
+
+    local_dir = os.path.join(settings.artifacts_dir, str(experiment_id))
+    robots = _run_in_worker_loop(SSHService().collect_artifacts(
+        robot_hosts, remote_dir or settings.robot_artifacts_dir, local_dir, pattern=pattern
+    ))
+    failed = [host for host, result in robots.items() if not result["success"]]
+    return {
+        "status": "completed" if not failed else "partial_failure",
+        "experiment_id": experiment_id,
+        "local_dir": local_dir,
+        "robots": robots,
+        "failed": failed,
+    }
+
+# --- Métricas de Enjambre ---
+@celery_app.task(name='compute_swarm_metrics')
+def compute_swarm_metrics(experiment_id: int, params: Optional[dict] = None):
+    """
+    Tarea Celery de post-procesamiento: calcula las métricas colectivas de una
+    corrida guardada (agregación, dispersión, cobertura, fracción por color de piso)
+    con NumPy sobre matrices robot x tiempo, y deja el resultado en caché.
+    Devuelve solo el resumen; las series quedan en la caché del experimento.
+    """
+    from app.services import swarm_metrics  # NumPy solo se carga en los workers que calculan métricas
+
+    result = _run_in_worker_loop(swarm_metrics.compute_and_cache(experiment_id, params))
+    return {key: value for key, value in result.items() if key != "series"}
+
+# --- Ejecución Desacoplada (detached) ---
+@celery_app.task(bind=True, name='launch_detached_run', max_retries=None)
+def launch_detached_run(self, robot_hosts: List[str], user_script_content: str, script_name: str, supporting_files: Optional[Dict[str, str]] = None, max_runtime: Optional[int] = None, owner: Optional[str] = None):
+    """
+    Tarea Celery que arranca el script en uno o varios robots sin esperar a que termine.
+    El script queda bajo setsid/nohup (con `timeout`) en cada robot; la tarea guarda
+    un "handle" en Redis y libera el slot del Worker de inmediato. El poller periódico
+    (poll_detached_runs) recoge después la salida, el código de salida y los artefactos.
+    """
+    task_id = self.request.id
+    max_runtime = max_runtime or settings.detached_max_runtime
+    return _run_leased(self, robot_hosts, lambda leased_at: _launch_detached_async(
+        task_id, robot_hosts, user_script_content, script_name, supporting_files, max_runtime, owner, leased_at
+    ), detached_ttl=max_runtime + int(settings.detached_unreachable_grace), owner=owner, runtime=max_runtime)
+
+async def _launch_detached_async(
+    task_id: str,
+    robot_hosts: List[str],
+    user_script_content: str,
+    script_name: str,
+    supporting_files: Optional[Dict[str, str]],
+    max_runtime: int,
+    owner: Optional[str] = None,
+    leased_at: Optional[float] = None,
+):
+    """
+    Fase 1: prepara el directorio de ejecución en todos los robots (paralelismo acotado).
+    Fase 2: arranca todos los robots preparados a la vez; cada arranque es un solo
+            comando SSH que devuelve el PID del proceso desacoplado.
+    """
+    hosts = list(dict.fromkeys(robot_hosts))
+    slots = asyncio.Semaphore(settings.swarm_max_parallel)
+    failures = {}
+
+    async def _stage(host: str):
+        async with slots:
+            async with get_ssh_pool().connection(host) as conn:
+                await _upload_script(conn, user_script_content, script_name, supporting_files, task_id)
+
+    async def _start(host: str):
+        async with get_ssh_pool().connection(host) as conn:
+            launched = await conn.run(detached_runs.launch_command(task_id, script_name, max_runtime), check=True)
+            return detached_runs.new_robot_entry(host, task_id, int(launched.stdout.split()[-1]), max_runtime)
+
+    staged = await asyncio.gather(*(_stage(host) for host in hosts), return_exceptions=True)
+    ready = []
+    for host, outcome in zip(hosts, staged):
+        if isinstance(outcome, Exception):
+            failures[host] = _failure_result(outcome)
+        else:
+            ready.append(host)
+
+    robots = {}
+    for host, entry in zip(ready, await asyncio.gather(*(_start(host) for host in ready), return_exceptions=True)):
+        if isinstance(entry, Exception):
+            failures[host] = _failure_result(entry)
+        else:
+            robots[host] = entry
+
+    leased_at = leased_at or time.time()
+    # Los robots que no arrancaron quedan libres para otros trabajos
+    if failures:
+        await RobotLease.resume(list(failures), task_id, leased_at).release()
+    if not robots:
+        if len(hosts) == 1:
+            return failures[hosts[0]]
+        return {"status": "partial_failure", "robots": failures, "completed": 0, "failed": len(failures)}
+
+    for host, failure in failures.items():
+        robots[host] = {"host": host, "state": "finished", "result": failure}
+    handle = {
+        "task_id": task_id,
+        "script_name": script_name,
+        "swarm": len(hosts) > 1,
+        "max_runtime": max_runtime,
+        "owner": owner,
+        "created_at": time.time(),
+        "leased_at": leased_at,
+        "robots": robots,
+    }
+    await detached_runs.save_handle(handle)
+    return {
+        "status": "detached",
+        "robots": {host: {"pid": entry.get("pid"), "state": entry["state"]} for host, entry in robots.items()},
+        "failed_robots": sorted(failures),
+    }
+
+@celery_app.task(name='poll_detached_runs')
+def poll_detached_runs():
+    """
+    Tarea periódica (Celery beat): revisa todas las ejecuciones desacopladas activas,
+    publica la salida nueva en el stream de cada tarea y cierra las que terminaron.
+    """
+    return _run_in_worker_loop(_poll_detached_async())
+
+async def _poll_detached_async():
+    owner = str(uuid.uuid4())
+    # Un solo poller a la vez aunque varios Workers ejecuten el beat
+    if not await detached_runs.acquire_poller_lock(owner, settings.detached_poll_interval * 5):
+        return {"skipped": True}
+    try:
+        handles = await detached_runs.active_handles()
+        finished = await asyncio.gather(*(_poll_handle(handle) for handle in handles), return_exceptions=True)
+        for handle, result in zip(handles, finished):
+            if isinstance(result, Exception):
+                logger.warning("Could not poll detached task %s: %s", handle["task_id"], result)
+        return {"polled": len(handles), "finished": sum(1 for result in finished if result is True)}
+    finally:
+        await detached_runs.release_poller_lock(owner)
+
+async def _poll_handle(handle: dict) -> bool:
+    """Consulta cada robot de la tarea; devuelve True si la tarea terminó y se cerró."""
+    # La concesión de los robots que arrancaron la tomó el Worker que lanzó la tarea:
+    # se retoma aquí para que ROBOT_BUSY y el tiempo ocupado salgan de este proceso
+    leased = [host for host, entry in handle["robots"].items() if "pid" in entry]
+    lease = RobotLease.resume(leased, handle["task_id"], handle.get("leased_at") or handle["created_at"])
+    stream = TaskOutputStream(handle["task_id"])
+    running = [entry for entry in handle["robots"].values() if entry["state"] == "running"]
+    await asyncio.gather(*(
+        _poll_robot(entry, stream.for_robot(entry["host"]) if handle["swarm"] else stream, handle["swarm"])
+        for entry in running
+    ))
+    if any(entry["state"] == "running" for entry in handle["robots"].values()):
+        await detached_runs.save_handle(handle)
+        return False
+
+    if not await detached_runs.complete_handle(handle):
+        return False
+    results = {host: entry["result"] for host, entry in handle["robots"].items()}
+    if handle["swarm"]:
+        completed = sum(1 for result in results.values() if result["status"] == "completed")
+        outcome = {
+            "status": "completed" if completed == len(results) else "partial_failure",
+            "robots": results,
+            "completed": completed,
+            "failed": len(results) - completed,
+        }
+    else:
+        outcome = next(iter(results.values()))
+    await _record_outcome(handle["task_id"], outcome, handle.get("owner"))
+    await stream.finish(outcome["status"])
+    await lease.release()
+    return True
+
+async def _poll_robot(entry: dict, stream: TaskOutputStream, swarm: bool):
+    """
+    Un ciclo de sondeo de un robot: estado del proceso (un comando SSH), salida nueva
+    por SFTP y, si terminó, cosecha del resultado y limpieza del directorio de ejecución.
+    """
+    run_id = entry["run_id"]
+    try:
+        async with get_ssh_pool().connection(entry["host"]) as conn:
+            state = detached_runs.parse_state((await conn.run(detached_runs.state_command(run_id, entry["pid"]))).stdout)
+            if state["state"] == "running" and time.time() > entry["deadline"] + 30:
+                # `timeout` del robot debió cortarlo: forzar la terminación del grupo
+                await conn.run(detached_runs.kill_command(entry["pid"]))
+            async with conn.start_sftp_client() as sftp:
+                await detached_runs.read_new_output(sftp, entry, stream)
+                if state["state"] != "running":
+                    entry["result"] = await _harvest(sftp, entry, state)
+            if state["state"] != "running":
+                await conn.run(script_cache.cleanup_command(run_id))
+                entry["state"] = "finished"
+        entry["poll_errors"] = 0
+    except Exception as e:
+        entry["poll_errors"] = entry.get("poll_errors", 0) + 1
+        # Robot inalcanzable más allá del plazo: se da la ejecución por perdida
+        if time.time() > entry["deadline"] + settings.detached_unreachable_grace:
+            entry["state"] = "finished"
+            entry["result"] = {**_failure_result(e), "lost": True}
+    if entry["state"] == "finished" and swarm:
+        await stream.publish("exit", entry["result"]["status"])
+
+async def _harvest(sftp, entry: dict, state: dict) -> dict:
+    """Código de salida, cola de los logs y lista de artefactos de una ejecución terminada."""
+    run_dir = script_cache.run_dir(entry["run_id"])
+    stdout = await detached_runs.read_tail(sftp, run_dir + detached_runs.STDOUT_LOG, settings.task_output_max_chars)
+    stderr = await detached_runs.read_tail(sftp, run_dir + detached_runs.STDERR_LOG, settings.task_output_max_chars)
+    exit_code = state.get("exit_code")
+    if state["state"] == "lost":
+        status = "lost"
+    elif exit_code == 0:
+        status = "completed"
+    elif exit_code == detached_runs.TIMEOUT_EXIT_CODE:
+        status = "timeout"
+    elif exit_code == detached_runs.CANCELLED_EXIT_CODE:
+        status = "cancelled"
+    else:
+        status = "failed"
+    return {
+        "status": status,
+        "exit_code": exit_code,
+        "output": stdout["text"],
+        "error": stderr["text"] if status == "completed" else (stderr["text"] or f"Script exited with {status}"),
+        "truncated": stdout["truncated"] or stderr["truncated"],
+        "artifacts_dir": detached_runs.artifacts_dir(entry["run_id"]),
+        "artifacts": await detached_runs.list_artifacts(sftp, entry["run_id"]),
+        "started_at": entry["started_at"],
+        "finished_at": time.time(),
+    }
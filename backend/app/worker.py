@@ -2,18 +2,43 @@
 """
 Celery Worker Startup Script for Atriz Lab
 Simplified version for robot script execution
+
+Robot jobs are almost entirely network I/O, so by default one process runs
+WORKER_CONCURRENCY Celery threads that all hand their coroutines to a single
+long-lived asyncio loop (see app.tasks._WorkerLoop). WORKER_POOL=prefork
+still works, with one loop per child process.
 """
 
 import os
+import shutil
 import sys
+from app.core.config import settings
+
+# Prefork children write their metrics to a shared directory (before importing
+# prometheus_client); start clean so samples of a previous run do not linger
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", settings.metrics_multiproc_dir)
+if __name__ == "__main__":
+    shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+from app.core.metrics import start_worker_exporter
+from app.services.scheduler import scheduler
 from app.tasks import celery_app
 
 if __name__ == "__main__":
+    # Queues: explicit WORKER_QUEUES (e.g. "robots.arena1") or every robot/group queue
+    queues = settings.worker_queues or ",".join(scheduler.worker_queues())
+
+    # Worker-side exporter: /metrics aggregated over every child process
+    if settings.worker_metrics_port:
+        start_worker_exporter(settings.worker_metrics_port)
+
     # Start the Celery worker
     celery_app.worker_main([
         "worker",
         "--loglevel=info",
-        "--concurrency=2",
-        "--queues=default",
+        f"--pool={settings.worker_pool}",
+        f"--concurrency={settings.worker_concurrency}",
+        f"--queues={queues}",
         "--hostname=atriz-worker@%h"
     ])
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+API load benchmark
+
+Runs N concurrent clients against a running API for a fixed duration and
+reports throughput and p50/p95/p99 latency per endpoint.
+
+    cd backend
+    uvicorn app.main:app --workers 4 &
+    python -m benchmarks.api_load --clients 100 --seconds 30
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from collections import defaultdict
+
+import httpx
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def seed(client: httpx.AsyncClient, count: int):
+    """Make sure there are experiments to read"""
+    response = await client.get("/api/v1/experiments/", params={"limit": 1})
+    if response.json()["experiments"]:
+        return
+    for i in range(count):
+        await client.post("/api/v1/experiments/", params={"name": f"load-test-{i}", "robot_host": "192.168.1.100"})
+
+
+async def client_loop(client: httpx.AsyncClient, deadline: float, latencies, errors, max_id: int):
+    while time.perf_counter() < deadline:
+        if random.random() < 0.5:
+            name, request = "list", client.get("/api/v1/experiments/", params={"limit": 50})
+        else:
+            name, request = "detail", client.get(f"/api/v1/experiments/{random.randint(1, max_id)}")
+        started = time.perf_counter()
+        try:
+            response = await request
+            if response.status_code >= 500:
+                errors[name] += 1
+        except httpx.HTTPError:
+            errors[name] += 1
+            continue
+        latencies[name].append((time.perf_counter() - started) * 1000)
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30) as client:
+        await seed(client, args.seed)
+        latencies, errors = defaultdict(list), defaultdict(int)
+        deadline = time.perf_counter() + args.seconds
+        await asyncio.gather(*(
+            client_loop(client, deadline, latencies, errors, args.seed) for _ in range(args.clients)
+        ))
+
+    total = sum(len(values) for values in latencies.values())
+    print(f"clients={args.clients} duration={args.seconds}s requests={total} "
+          f"throughput={total / args.seconds:,.0f} req/s")
+    for name, values in sorted(latencies.items()):
+        print(f"{name:>7}: n={len(values):<7} errors={errors[name]:<4} "
+              f"mean={statistics.fmean(values):7.2f}ms p50={percentile(values, 50):7.2f}ms "
+              f"p95={percentile(values, 95):7.2f}ms p99={percentile(values, 99):7.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--seconds", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=500, help="experiments to create on an empty database")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Experiment search benchmark
+
+Seeds the experiments table of DATABASE_URL up to --rows rows (COPY, random
+names, descriptions, robots, tags and creation times), then runs each search
+of GET /api/v1/experiments through the same query builder and reports the
+server execution time with the indexes and with index scans disabled
+(the full-scan baseline), plus the indexes the planner picked.
+
+    cd backend
+    python -m benchmarks.experiment_search --rows 1000000 --repeat 20
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+import asyncpg
+from sqlalchemy import text
+
+from app.core.db import DATABASE_URL, get_engine
+from app.models.experiment import Experiment
+from app.services.db_service import experiment_query
+
+STATUSES = ["completed"] * 80 + ["failed"] * 12 + ["pending"] * 5 + ["running"] * 3
+WORDS = [
+    "aggregation", "foraging", "flocking", "chain", "phototaxis", "dispersion", "consensus",
+    "collision", "avoidance", "pheromone", "gradient", "lidar", "odometry", "calibration",
+    "baseline", "sweep", "evolved", "controller", "arena", "obstacle", "random", "walk",
+]
+TAGS = ["swarm", "lidar", "demo", "class", "thesis", "calibration", "sim", "field", "night", "v2"]
+ROBOTS = [f"192.168.1.{i}" for i in range(100, 150)]
+NOW = datetime(2025, 6, 1, tzinfo=timezone.utc)
+SPAN = timedelta(days=3 * 365)
+
+
+def make_rows(count: int, seed: int):
+    rng = random.Random(seed)
+    for _ in range(count):
+        created = NOW - SPAN * rng.random()
+        yield (
+            " ".join(rng.sample(WORDS, 3)),
+            " ".join(rng.choices(WORDS, k=12)),
+            rng.choice(STATUSES),
+            rng.choice(ROBOTS),
+            created,
+            rng.sample(TAGS, rng.randint(0, 3)),
+            True,
+        )
+
+
+async def seed(rows: int):
+    engine = get_engine()
+    Experiment.__table__.create(engine, checkfirst=True)
+    # Tables created before these indexes existed get them here
+    for index in Experiment.__table__.indexes:
+        index.create(engine, checkfirst=True)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_experiments_search ON experiments USING gin "
+            "(to_tsvector('simple'::regconfig, coalesce(name, '') || ' ' || coalesce(description, '')))"
+        ))
+        existing = conn.execute(text("SELECT count(*) FROM experiments")).scalar()
+
+    missing = rows - existing
+    if missing > 0:
+        conn = await asyncpg.connect(DATABASE_URL)
+        try:
+            started = time.perf_counter()
+            batch = 100000
+            for offset in range(0, missing, batch):
+                await conn.copy_records_to_table(
+                    "experiments",
+                    records=list(make_rows(min(batch, missing - offset), existing + offset)),
+                    columns=["name", "description", "status", "robot_host", "created_at", "tags", "is_active"],
+                )
+            print(f"seeded {missing:,} rows in {time.perf_counter() - started:.1f}s")
+        finally:
+            await conn.close()
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE experiments"))
+    return max(rows, existing)
+
+
+def scenarios():
+    month_ago = NOW - timedelta(days=30)
+    return {
+        "status=running": {"status": "running"},
+        "robot+last 30d": {"robot_host": ROBOTS[7], "created_after": month_ago},
+        "status+range": {"status": "failed", "created_after": month_ago, "created_before": NOW},
+        "tag": {"tags": ["thesis"]},
+        "2 tags": {"tags": ["thesis", "night"]},
+        "full text": {"q": "phototaxis calibration"},
+        "text+tag+status": {"q": "flocking", "tags": ["swarm"], "status": "completed"},
+    }
+
+
+def _indexes(plan) -> set:
+    found = set()
+    if isinstance(plan, dict):
+        if "Index Name" in plan:
+            found.add(plan["Index Name"])
+        for value in plan.values():
+            found |= _indexes(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            found |= _indexes(value)
+    return found
+
+
+def explain(query, repeat: int, use_indexes: bool):
+    engine = get_engine()
+    compiled = query.compile(dialect=engine.dialect)
+    timings = []
+    indexes = set()
+    with engine.connect() as conn:
+        if not use_indexes:
+            conn.execute(text("SET enable_indexscan = off; SET enable_bitmapscan = off; SET enable_indexonlyscan = off"))
+        for _ in range(repeat):
+            result = conn.exec_driver_sql("EXPLAIN (ANALYZE, FORMAT JSON) " + str(compiled), compiled.params).scalar()
+            timings.append(result[0]["Execution Time"])
+            indexes |= _indexes(result[0]["Plan"])
+        conn.rollback()
+    return timings, indexes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--no-baseline", action="store_true", help="skip the runs with index scans disabled")
+    args = parser.parse_args()
+
+    total = asyncio.run(seed(args.rows))
+    print(f"rows={total:,} repeat={args.repeat} limit={args.limit}")
+    for name, filters in scenarios().items():
+        query = experiment_query(limit=args.limit, **filters)
+        timings, indexes = explain(query, args.repeat, use_indexes=True)
+        line = f"{name:>16}: indexed p50={statistics.median(timings):8.2f}ms max={max(timings):8.2f}ms"
+        if not args.no_baseline:
+            baseline, _ = explain(query, max(1, args.repeat // 5), use_indexes=False)
+            line += f"  full scan p50={statistics.median(baseline):8.2f}ms"
+        print(f"{line}  using {', '.join(sorted(indexes)) or 'no index'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+End-to-end pipeline load benchmark on a simulated fleet
+
+Spins up N simulated robots (benchmarks.robot_sim) and pushes --jobs script
+runs through the pipeline, reporting throughput and p50/p95/p99 latency from
+submission to result.
+
+Two modes:
+
+* direct (default): no broker or database; runs the worker code path
+  (SSH pool, script cache staging, streamed execution, cleanup) in-process,
+  one job per robot at a time like the Redis leases. Runs on any Linux box:
+
+      cd backend
+      python -m benchmarks.pipeline_load --robots 20 --jobs 500 --latency-ms 20
+
+* api: the whole stack (API, Redis, Celery worker, Postgres). Start the fleet
+  here, point the worker at it and submit through the HTTP API; latency is
+  measured from the POST to the end event of the task stream:
+
+      python -m benchmarks.pipeline_load --api http://localhost:8000 --robots 20 --jobs 500
+      # the worker must run with the printed ROBOT_HOSTS and SSH_PRIVATE_KEY_PATH
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+
+import asyncssh
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def make_script(seconds: float, output_kb: int) -> str:
+    return (
+        "import sys, time\n"
+        f"line = 'x' * 1023\n"
+        f"for _ in range({output_kb}):\n"
+        "    print(line)\n"
+        f"time.sleep({seconds})\n"
+        "print('done', file=sys.stderr)\n"
+    )
+
+
+def client_key() -> str:
+    """Throwaway client key (the simulated robots accept any client)"""
+    path = os.path.join(tempfile.mkdtemp(prefix="atriz-sim-key-"), "id_ed25519")
+    asyncssh.generate_private_key("ssh-ed25519").write_private_key(path)
+    return path
+
+
+async def run_direct(args, fleet, script: str):
+    from app.services.ssh_pool import get_ssh_pool
+    from app.tasks import _deploy_and_run_async
+
+    locks = {host: asyncio.Lock() for host in fleet.hosts}
+    slots = asyncio.Semaphore(args.concurrency)
+
+    async def job(i: int):
+        host = fleet.hosts[i % len(fleet.hosts)]
+        async with slots:
+            submitted = time.perf_counter()
+            async with locks[host]:  # one active script per robot, like the lease
+                outcome = await _deploy_and_run_async(host, script, "load.py", run_id=str(uuid.uuid4()))
+            return outcome["status"], time.perf_counter() - submitted
+
+    results = await asyncio.gather(*(job(i) for i in range(args.jobs)))
+    print(f"ssh pool: {get_ssh_pool().stats()}")
+    await get_ssh_pool().close()
+    return results
+
+
+async def run_api(args, fleet, script: str):
+    import httpx
+
+    slots = asyncio.Semaphore(args.concurrency)
+
+    async def job(client: httpx.AsyncClient, i: int):
+        host = fleet.hosts[i % len(fleet.hosts)]
+        async with slots:
+            submitted = time.perf_counter()
+            response = await client.post("/api/v1/tasks/robot/execute", json={
+                "robot_host": host, "user_script_content": script, "script_name": "load.py", "priority": "batch",
+            })
+            if response.status_code != 200:
+                return f"http_{response.status_code}", time.perf_counter() - submitted
+            task_id = response.json()["task_id"]
+            status = "unknown"
+            async with client.stream("GET", f"/api/v1/tasks/stream/{task_id}", timeout=None) as stream:
+                event = None
+                async for line in stream.aiter_lines():
+                    if line.startswith("event: "):
+                        event = line[7:]
+                    elif line.startswith("data: ") and event == "end":
+                        status = json.loads(line[6:]).get("data", "unknown")
+                        break
+            return status, time.perf_counter() - submitted
+
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=args.api, limits=limits, timeout=30) as client:
+        return await asyncio.gather(*(job(client, i) for i in range(args.jobs)))
+
+
+async def run(args):
+    from benchmarks.robot_sim import SimulatedFleet, profile_from_args
+
+    fleet = SimulatedFleet(args.robots, args.base_port, profile=profile_from_args(args),
+                           telemetry_url=args.api if args.telemetry_hz else None)
+    await fleet.start()
+    print(f"ROBOT_HOSTS={','.join(fleet.hosts)}")
+    print(f"SSH_PRIVATE_KEY_PATH={os.environ['SSH_PRIVATE_KEY_PATH']}")
+    script = make_script(args.script_seconds, args.output_kb)
+    try:
+        started = time.perf_counter()
+        if args.api:
+            results = await run_api(args, fleet, script)
+        else:
+            results = await run_direct(args, fleet, script)
+        duration = time.perf_counter() - started
+    finally:
+        await fleet.stop()
+
+    latencies = [elapsed * 1000 for _, elapsed in results]
+    statuses = Counter(status for status, _ in results)
+    print(f"mode={'api' if args.api else 'direct'} robots={args.robots} jobs={args.jobs} "
+          f"concurrency={args.concurrency} duration={duration:.1f}s throughput={len(results) / duration:,.1f} jobs/s")
+    print(f"latency: mean={statistics.fmean(latencies):.1f}ms p50={percentile(latencies, 50):.1f}ms "
+          f"p95={percentile(latencies, 95):.1f}ms p99={percentile(latencies, 99):.1f}ms max={max(latencies):.1f}ms")
+    print(f"statuses: {dict(statuses)}")
+    print(f"robots: {fleet.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api", default=None, help="API base URL (default: direct mode)")
+    parser.add_argument("--robots", type=int, default=10)
+    parser.add_argument("--base-port", type=int, default=9022)
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50, help="jobs in flight")
+    parser.add_argument("--script-seconds", type=float, default=0.2, help="sleep inside each script")
+    parser.add_argument("--output-kb", type=int, default=4, help="stdout written by each script")
+    from benchmarks.robot_sim import add_profile_arguments
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    # Settings are read at import time: the key must be in place before app is imported
+    os.environ.setdefault("SSH_PRIVATE_KEY_PATH", client_key())
+    sys.exit(main())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Reservation calendar benchmark
+
+Seeds the reservation tables of DATABASE_URL up to --bookings slots (COPY,
+back-to-back bookings of random length on every robot, half in the past and
+half ahead), then runs the calendar queries through the same query builders
+as the API and reports the server execution time with the GiST indexes and
+with index scans disabled (the scan-every-booking baseline):
+
+* a week of availability for the whole fleet;
+* the conflict read of a booking (the pool around the window);
+* the dispatch check a worker runs before each robot job.
+
+    cd backend
+    python -m benchmarks.reservations --bookings 100000 --repeat 20
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+import asyncpg
+from sqlalchemy import text
+
+from app.core.db import DATABASE_URL, get_engine
+from app.models.experiment import Experiment
+from app.models.reservation import Reservation, ReservationSlot
+from app.services.reservation_service import blocking_query, slots_query
+
+ROBOTS = [f"192.168.1.{i}" for i in range(100, 150)]
+USERS = [f"student{i}" for i in range(40)] + ["teacher"]
+NOW = datetime(2025, 6, 2, 9, tzinfo=timezone.utc)
+
+
+def make_bookings(count: int, seed: int):
+    """``(reservation row, slot row)`` pairs: per robot, consecutive bookings
+    separated by random gaps, starting far enough back that half lie ahead"""
+    rng = random.Random(seed)
+    per_robot = -(-count // len(ROBOTS))
+    made = 0
+    for robot in ROBOTS:
+        cursor = NOW - timedelta(hours=4.25 * per_robot)  # mean booking + gap is 8.5 h
+        for _ in range(per_robot):
+            if made == count:
+                return
+            starts = cursor + timedelta(minutes=rng.randint(0, 12 * 60))
+            ends = starts + timedelta(minutes=30 * rng.randint(1, 8))
+            owner = rng.choice(USERS)
+            made += 1
+            yield (made, owner, 1, starts, ends), (made, robot, owner, starts, ends)
+            cursor = ends
+
+
+async def seed(bookings: int):
+    engine = get_engine()
+    Experiment.__table__.create(engine, checkfirst=True)
+    Reservation.__table__.create(engine, checkfirst=True)
+    ReservationSlot.__table__.create(engine, checkfirst=True)
+    with engine.begin() as conn:
+        existing = conn.execute(text("SELECT count(*) FROM reservation_slots")).scalar()
+
+    if existing == 0:
+        conn = await asyncpg.connect(DATABASE_URL)
+        try:
+            started = time.perf_counter()
+            rows = list(make_bookings(bookings, 0))
+            await conn.copy_records_to_table(
+                "reservations", records=[r for r, _ in rows],
+                columns=["id", "owner", "robot_count", "starts_at", "ends_at"],
+            )
+            await conn.copy_records_to_table(
+                "reservation_slots", records=[s for _, s in rows],
+                columns=["reservation_id", "robot_host", "owner", "starts_at", "ends_at"],
+            )
+            await conn.execute("SELECT setval(pg_get_serial_sequence('reservations', 'id'), max(id)) FROM reservations")
+            print(f"seeded {len(rows):,} bookings in {time.perf_counter() - started:.1f}s")
+        finally:
+            await conn.close()
+    elif existing < bookings:
+        print(f"{existing:,} bookings already seeded; drop the reservation tables to reseed")
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE reservations; ANALYZE reservation_slots"))
+        return conn.execute(text("SELECT count(*) FROM reservation_slots")).scalar()
+
+
+def scenarios():
+    week = NOW + timedelta(days=7)
+    fit = timedelta(hours=24)
+    return {
+        "week, fleet": slots_query(ROBOTS, week, week + timedelta(days=7)),
+        "week, 1 robot": slots_query(ROBOTS[:1], week, week + timedelta(days=7)),
+        "booking read": slots_query(ROBOTS[:10], week - fit, week + timedelta(hours=2) + fit),
+        "dispatch check": blocking_query(ROBOTS[:4], "teacher", NOW, NOW + timedelta(minutes=1)),
+    }
+
+
+def _indexes(plan) -> set:
+    found = set()
+    if isinstance(plan, dict):
+        if "Index Name" in plan:
+            found.add(plan["Index Name"])
+        for value in plan.values():
+            found |= _indexes(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            found |= _indexes(value)
+    return found
+
+
+def explain(query, repeat: int, use_indexes: bool):
+    engine = get_engine()
+    compiled = query.compile(dialect=engine.dialect, compile_kwargs={"render_postcompile": True})
+    timings = []
+    indexes = set()
+    with engine.connect() as conn:
+        if not use_indexes:
+            conn.execute(text("SET enable_indexscan = off; SET enable_bitmapscan = off; SET enable_indexonlyscan = off"))
+        for _ in range(repeat):
+            result = conn.exec_driver_sql("EXPLAIN (ANALYZE, FORMAT JSON) " + str(compiled), compiled.params).scalar()
+            timings.append(result[0]["Execution Time"])
+            indexes |= _indexes(result[0]["Plan"])
+        conn.rollback()
+    return timings, indexes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bookings", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--no-baseline", action="store_true", help="skip the runs with index scans disabled")
+    args = parser.parse_args()
+
+    total = asyncio.run(seed(args.bookings))
+    print(f"bookings={total:,} robots={len(ROBOTS)} repeat={args.repeat}")
+    for name, query in scenarios().items():
+        timings, indexes = explain(query, args.repeat, use_indexes=True)
+        line = f"{name:>16}: indexed p50={statistics.median(timings):8.2f}ms max={max(timings):8.2f}ms"
+        if not args.no_baseline:
+            baseline, _ = explain(query, max(1, args.repeat // 5), use_indexes=False)
+            line += f"  full scan p50={statistics.median(baseline):8.2f}ms"
+        print(f"{line}  using {', '.join(sorted(indexes)) or 'no index'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Simulated robot fleet
+
+Starts N local SSH servers that stand in for the RVR Raspberry Pis: SFTP,
+shell commands and `python3` execution, plus the battery/ROS probes of the
+fleet health monitor and optional telemetry emission while a script runs.
+Each robot keeps its own filesystem under --root (the remote cache and
+artifact directories are mapped into it), and can inject latency, limited
+SFTP bandwidth, failed commands and dropped connections.
+
+    cd backend
+    python -m benchmarks.robot_sim --robots 20 --latency-ms 20 --bandwidth-mbps 20
+    # then point the backend at the printed ROBOT_HOSTS
+
+Used in-process by benchmarks.pipeline_load.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import asyncssh
+
+from app.core.config import settings
+
+STREAM_CHUNK_SIZE = 4096
+
+
+@dataclass
+class RobotProfile:
+    """Network and failure behaviour of a simulated robot"""
+    latency: float = 0.0            # seconds added to every command and SFTP request
+    bandwidth: float = 0.0          # SFTP bytes/s, 0 for unlimited
+    error_rate: float = 0.0         # probability that a command fails with exit status 1
+    drop_rate: float = 0.0          # probability that a command drops the connection
+    battery: float = 87.0
+    telemetry_hz: float = 0.0       # samples/s posted while a script runs (needs telemetry_url)
+
+
+class _Server(asyncssh.SSHServer):
+    def begin_auth(self, username: str) -> bool:
+        return False  # no authentication, like a lab robot on a private network
+
+
+class SimulatedRobot:
+    """One simulated robot listening on ``127.0.0.1:<port>``"""
+
+    def __init__(self, name: str, port: int, root: str, profile: RobotProfile, host_key,
+                 remote_dirs: Sequence[str], telemetry_url: Optional[str] = None, experiment_id: int = 1):
+        self.name = name
+        self.port = port
+        self.root = root
+        self.profile = profile
+        self.host_key = host_key
+        # Longest first, so nested directories are rewritten correctly
+        self.remote_dirs = sorted({d.rstrip("/") for d in remote_dirs}, key=len, reverse=True)
+        self.telemetry_url = telemetry_url
+        self.experiment_id = experiment_id
+        self.running_scripts = 0
+        self.stats = {"sftp_sessions": 0, "commands": 0, "scripts": 0, "sftp_bytes": 0, "errors": 0, "drops": 0}
+        self._server = None
+        self._telemetry_task: Optional[asyncio.Task] = None
+
+    @property
+    def address(self) -> str:
+        return f"127.0.0.1:{self.port}"
+
+    async def start(self) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        for directory in self.remote_dirs:
+            os.makedirs(self.root + directory, exist_ok=True)
+        robot = self
+
+        class _SFTP(asyncssh.SFTPServer):
+            def __init__(self, chan):
+                super().__init__(chan, chroot=robot.root.encode())
+                robot.stats["sftp_sessions"] += 1
+
+            async def read(self, file_obj, offset, size):
+                data = super().read(file_obj, offset, size)
+                await robot._transfer(len(data))
+                return data
+
+            async def write(self, file_obj, offset, data):
+                await robot._transfer(len(data))
+                return super().write(file_obj, offset, data)
+
+        self._server = await asyncssh.create_server(
+            _Server, "127.0.0.1", self.port,
+            server_host_keys=[self.host_key],
+            process_factory=self._handle,
+            sftp_factory=_SFTP,
+            allow_scp=False,
+        )
+        if self.telemetry_url and self.profile.telemetry_hz > 0:
+            self._telemetry_task = asyncio.get_running_loop().create_task(self._emit_telemetry())
+
+    async def stop(self) -> None:
+        if self._telemetry_task is not None:
+            self._telemetry_task.cancel()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _transfer(self, size: int) -> None:
+        self.stats["sftp_bytes"] += size
+        delay = self.profile.latency / 2
+        if self.profile.bandwidth:
+            delay += size / self.profile.bandwidth
+        if delay:
+            await asyncio.sleep(delay)
+
+    def _rewrite(self, command: str) -> str:
+        """Map the remote directories into this robot's root; stub the health probes"""
+        for directory in self.remote_dirs:
+            command = command.replace(directory, self.root + directory)
+        command = command.replace(settings.robot_battery_command, f"echo {self.profile.battery:g}")
+        command = command.replace(settings.robot_ros_command, "printf '/rosout\\n/rvr_driver\\n'")
+        return command
+
+    async def _handle(self, process: asyncssh.SSHServerProcess) -> None:
+        self.stats["commands"] += 1
+        if self.profile.latency:
+            await asyncio.sleep(self.profile.latency)
+        if random.random() < self.profile.drop_rate:
+            self.stats["drops"] += 1
+            process.channel.get_connection().abort()
+            return
+        if random.random() < self.profile.error_rate:
+            self.stats["errors"] += 1
+            process.stderr.write("simulated failure\n")
+            process.exit(1)
+            return
+
+        command = self._rewrite(process.command or "true")
+        is_script = "python3 " in command
+        if is_script:
+            self.stats["scripts"] += 1
+            self.running_scripts += 1
+        try:
+            child = await asyncio.create_subprocess_shell(
+                command,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                env={**os.environ, "PATH": os.path.dirname(sys.executable) + os.pathsep + os.environ.get("PATH", "")},
+            )
+
+            async def pump(reader, writer):
+                while True:
+                    chunk = await reader.read(STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    writer.write(chunk.decode("utf-8", errors="replace"))
+
+            await asyncio.gather(pump(child.stdout, process.stdout), pump(child.stderr, process.stderr))
+            process.exit(await child.wait())
+        except Exception as e:
+            process.stderr.write(f"{e}\n")
+            process.exit(255)
+        finally:
+            if is_script:
+                self.running_scripts -= 1
+
+    async def _emit_telemetry(self) -> None:
+        """Post one batch per second, at ``telemetry_hz`` samples/s, while a script runs"""
+        import httpx
+        from app.services.telemetry_service import encode_batch
+
+        url = f"{self.telemetry_url.rstrip('/')}/api/v1/telemetry/{self.experiment_id}/{self.name}"
+        x = y = theta = 0.0
+        async with httpx.AsyncClient(timeout=5) as client:
+            while True:
+                await asyncio.sleep(1.0)
+                if not self.running_scripts:
+                    continue
+                now = time.time()
+                count = max(1, int(self.profile.telemetry_hz))
+                samples = []
+                for i in range(count):
+                    theta += random.uniform(-0.1, 0.1)
+                    x += 0.01 * random.random()
+                    y += 0.01 * random.random()
+                    samples.append((now - 1 + i / count, x, y, theta, random.randint(0, 7),
+                                    *(random.randint(0, 4095) for _ in range(4)), 0.2, 1.5, 1.0))
+                try:
+                    await client.post(url, content=encode_batch(samples))
+                except httpx.HTTPError:
+                    pass
+
+
+class SimulatedFleet:
+    """N simulated robots on consecutive ports, sharing one host key"""
+
+    def __init__(self, robots: int, base_port: int = 9022, root: Optional[str] = None,
+                 profile: Optional[RobotProfile] = None, telemetry_url: Optional[str] = None,
+                 remote_dirs: Optional[Sequence[str]] = None):
+        self._own_root = root is None
+        self.root = root or tempfile.mkdtemp(prefix="atriz-sim-")
+        host_key = asyncssh.generate_private_key("ssh-ed25519")
+        remote_dirs = remote_dirs or [settings.robot_cache_dir, settings.robot_artifacts_dir]
+        self.robots: List[SimulatedRobot] = [
+            SimulatedRobot(
+                f"sim{i:03d}", base_port + i, os.path.join(self.root, f"sim{i:03d}"),
+                profile or RobotProfile(), host_key, remote_dirs, telemetry_url,
+            )
+            for i in range(robots)
+        ]
+
+    @property
+    def hosts(self) -> List[str]:
+        return [robot.address for robot in self.robots]
+
+    async def start(self) -> None:
+        await asyncio.gather(*(robot.start() for robot in self.robots))
+
+    async def stop(self) -> None:
+        await asyncio.gather(*(robot.stop() for robot in self.robots))
+        if self._own_root:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+    def stats(self) -> Dict[str, int]:
+        totals: Dict[str, int] = {}
+        for robot in self.robots:
+            for name, value in robot.stats.items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="added to every command and SFTP request")
+    parser.add_argument("--bandwidth-mbps", type=float, default=0.0, help="SFTP bandwidth per robot, 0 = unlimited")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of commands failing with exit 1")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="fraction of commands dropping the connection")
+    parser.add_argument("--telemetry-hz", type=float, default=0.0)
+
+
+def profile_from_args(args) -> RobotProfile:
+    return RobotProfile(
+        latency=args.latency_ms / 1000,
+        bandwidth=args.bandwidth_mbps * 1e6 / 8,
+        error_rate=args.error_rate,
+        drop_rate=args.drop_rate,
+        telemetry_hz=args.telemetry_hz,
+    )
+
+
+async def serve(args) -> None:
+    fleet = SimulatedFleet(args.robots, args.base_port, args.root, profile_from_args(args), args.telemetry_url)
+    await fleet.start()
+    print(f"ROBOT_HOSTS={','.join(fleet.hosts)}", flush=True)
+    print(f"{len(fleet.robots)} simulated robots under {fleet.root}; Ctrl+C to stop", flush=True)
+    try:
+        while True:
+            await asyncio.sleep(args.stats_interval)
+            print(fleet.stats(), flush=True)
+    finally:
+        await fleet.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--robots", type=int, default=10)
+    parser.add_argument("--base-port", type=int, default=9022)
+    parser.add_argument("--root", default=None, help="robot filesystems (default: a temporary directory)")
+    parser.add_argument("--telemetry-url", default=None, help="API base URL to post telemetry to")
+    parser.add_argument("--stats-interval", type=float, default=10.0)
+    add_profile_arguments(parser)
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
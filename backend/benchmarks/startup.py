@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Import-time and cold-start benchmark
+
+Measures, in fresh interpreters, what a new process pays before it can work:
+
+* import time of the API app, the worker tasks and the modules admin commands
+  load (``python -X importtime``), with the packages that cost the most;
+* cold start of the API: from launching uvicorn to the first answered
+  request (``GET /``), which is what an autoscaled replica waits for.
+
+``--baseline <git ref>`` runs the same measurements on another revision
+(checked out in a temporary git worktree) to compare.
+
+    cd backend
+    python -m benchmarks.startup --repeat 5
+    python -m benchmarks.startup --repeat 5 --baseline HEAD~1
+"""
+
+import argparse
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+TARGETS = ("app.main", "app.tasks", "app.core.celery_app", "app.services.scheduler", "app.core.db")
+
+
+def import_profile(module: str, cwd: str) -> Tuple[float, Counter]:
+    """Cumulative import time of ``module`` and self time per top-level package, in ms"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd, capture_output=True, text=True, env={**os.environ, "PYTHONWARNINGS": "ignore"},
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    packages: Counter = Counter()
+    total = 0.0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        packages[name.strip().split(".")[0]] += int(self_us) / 1000
+        if name.strip() == module:
+            total = int(cumulative_us) / 1000
+    return total, packages
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def cold_start(cwd: str, timeout: float = 30.0) -> float:
+    """Seconds from launching uvicorn to the first answered ``GET /``"""
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"API did not answer within {timeout:g}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def measure(cwd: str, repeat: int, targets: List[str], serve: bool) -> Dict[str, float]:
+    # Byte-compile first, so a fresh checkout is not charged for it
+    subprocess.run([sys.executable, "-m", "compileall", "-q", "app"], cwd=cwd, check=True)
+    timings: Dict[str, float] = {}
+    for module in targets:
+        if not os.path.exists(os.path.join(cwd, *module.split(".")) + ".py"):
+            continue  # not in this revision
+        runs = [import_profile(module, cwd) for _ in range(repeat)]
+        timings[f"import {module}"] = statistics.median(total for total, _ in runs)
+        if module == targets[0]:
+            timings["_packages"] = runs[-1][1]
+    if serve:
+        timings["cold start (uvicorn to first response)"] = statistics.median(
+            cold_start(cwd) * 1000 for _ in range(repeat)
+        )
+    return timings
+
+
+def baseline_tree(ref: str) -> Tuple[str, str]:
+    """Check ``ref`` out in a temporary worktree; returns (worktree, its backend dir)"""
+    root = subprocess.run(["git", "rev-parse", "--show-toplevel"], capture_output=True, text=True, check=True).stdout.strip()
+    backend = os.path.relpath(os.getcwd(), root)
+    worktree = tempfile.mkdtemp(prefix="atriz-startup-")
+    subprocess.run(["git", "worktree", "add", "--detach", worktree, ref], check=True, capture_output=True)
+    return worktree, os.path.join(worktree, backend)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement (median reported)")
+    parser.add_argument("--module", action="append", help=f"modules to import (default: {', '.join(TARGETS)})")
+    parser.add_argument("--no-serve", action="store_true", help="skip the uvicorn cold start")
+    parser.add_argument("--top", type=int, default=12, help="packages listed by import cost")
+    parser.add_argument("--baseline", default=None, help="git ref to compare with")
+    args = parser.parse_args()
+    targets = args.module or list(TARGETS)
+
+    current = measure(os.getcwd(), args.repeat, targets, not args.no_serve)
+    previous: Optional[Dict[str, float]] = None
+    if args.baseline:
+        worktree, cwd = baseline_tree(args.baseline)
+        try:
+            previous = measure(cwd, args.repeat, targets, not args.no_serve)
+        finally:
+            subprocess.run(["git", "worktree", "remove", "--force", worktree], capture_output=True)
+            shutil.rmtree(worktree, ignore_errors=True)
+
+    print(f"median of {args.repeat} runs, ms")
+    for name, value in current.items():
+        if name.startswith("_"):
+            continue
+        line = f"{name:>42}: {value:8.1f}"
+        if previous and name in previous:
+            line += f"   {args.baseline}: {previous[name]:8.1f}   ({(value - previous[name]) / previous[name]:+.0%})"
+        print(line)
+    print(f"\nimport {targets[0]}, self time per package (last run):")
+    for package, spent in current["_packages"].most_common(args.top):
+        print(f"{package:>24}: {spent:7.1f}")
+
+
+if __name__ == "__main__":
+    main()
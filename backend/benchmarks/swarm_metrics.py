@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Swarm metrics benchmark
+
+Builds synthetic robot x time matrices (default: 100 robots for one hour at
+1 s steps, as load_matrices returns them after the SQL bucketing), with a few
+robots dropping out for a while, and times compute_metrics against a naive
+per-time-step Python loop computing the same dispersion, nearest neighbour,
+aggregation and coverage series. Checks both agree; no database needed.
+
+    cd backend
+    python -m benchmarks.swarm_metrics --robots 100 --minutes 60
+"""
+
+import argparse
+import math
+import time
+
+import numpy as np
+
+from app.services.swarm_metrics import compute_metrics, metrics_params
+
+
+def make_run(robots: int, steps: int, seed: int):
+    rng = np.random.default_rng(seed)
+    theta = np.cumsum(rng.normal(0, 0.3, (robots, steps)), axis=1)
+    # Random walks from the centre of a 4 x 4 m arena, bouncing off the walls
+    x = np.abs((2 + np.cumsum(0.02 * np.cos(theta), axis=1)) % 8 - 4)
+    y = np.abs((2 + np.cumsum(0.02 * np.sin(theta), axis=1)) % 8 - 4)
+    colors = rng.integers(0, 8, (robots, steps)).astype(float)
+    # A tenth of the robots stop reporting for a minute
+    for robot in rng.choice(robots, max(1, robots // 10), replace=False):
+        start = int(rng.integers(0, max(1, steps - 60)))
+        x[robot, start:start + 60] = y[robot, start:start + 60] = colors[robot, start:start + 60] = np.nan
+    return x, y, colors
+
+
+def naive_metrics(x, y, radius: float, cell: float, bounds):
+    """One time step and one robot pair at a time, the way a notebook would do it"""
+    robots, steps = x.shape
+    xmin, ymin, xmax, ymax = bounds
+    nx, ny = math.ceil((xmax - xmin) / cell), math.ceil((ymax - ymin) / cell)
+    visited = set()
+    series = {"dispersion": [], "nearest_neighbour": [], "aggregation": [], "coverage": []}
+    for t in range(steps):
+        points = [(x[r, t], y[r, t]) for r in range(robots) if not math.isnan(x[r, t])]
+        cx = sum(p[0] for p in points) / len(points)
+        cy = sum(p[1] for p in points) / len(points)
+        series["dispersion"].append(math.sqrt(sum((px - cx) ** 2 + (py - cy) ** 2 for px, py in points) / len(points)))
+        nearest = [min(math.hypot(px - qx, py - qy) for j, (qx, qy) in enumerate(points) if j != i)
+                   for i, (px, py) in enumerate(points)]
+        series["nearest_neighbour"].append(sum(nearest) / len(nearest))
+        series["aggregation"].append(sum(d <= radius for d in nearest) / len(nearest))
+        for px, py in points:
+            ix, iy = int((px - xmin) // cell), int((py - ymin) // cell)
+            if 0 <= ix < nx and 0 <= iy < ny:
+                visited.add((ix, iy))
+        series["coverage"].append(len(visited) / (nx * ny))
+    return {name: np.array(values) for name, values in series.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--robots", type=int, default=100)
+    parser.add_argument("--minutes", type=float, default=60)
+    parser.add_argument("--step", type=float, default=1.0, help="seconds per time step")
+    parser.add_argument("--naive-minutes", type=float, default=5, help="the naive loop only runs on this prefix")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    params = metrics_params({"step": args.step})
+    bounds = (0.0, 0.0, 4.0, 4.0)
+    steps = int(args.minutes * 60 / args.step)
+    x, y, colors = make_run(args.robots, steps, args.seed)
+    print(f"run: {args.robots} robots x {steps:,} steps ({args.robots * steps:,} cells)")
+
+    started = time.perf_counter()
+    result = compute_metrics(x, y, colors, params, bounds)
+    vectorized = time.perf_counter() - started
+    print(f"vectorized: {vectorized * 1000:,.0f} ms for the whole run, {len(result['summary'])} series")
+
+    prefix = min(steps, int(args.naive_minutes * 60 / args.step))
+    started = time.perf_counter()
+    naive = naive_metrics(x[:, :prefix], y[:, :prefix], params["aggregation_radius"], params["cell_size"], bounds)
+    naive_seconds = time.perf_counter() - started
+    estimated = naive_seconds * steps / prefix
+    print(f"naive loop: {naive_seconds:,.1f} s for {prefix:,} steps, ~{estimated:,.0f} s for the whole run "
+          f"({estimated / vectorized:,.0f}x slower)")
+
+    check = compute_metrics(x[:, :prefix], y[:, :prefix], colors[:, :prefix], params, bounds)
+    stride = max(1, math.ceil(prefix / len(check["series"]["dispersion"])))
+    for name, values in naive.items():
+        ours = np.array(check["series"][name], dtype=float)
+        if not np.allclose(ours, np.round(values[::stride], 4), atol=1e-3):
+            raise SystemExit(f"mismatch in {name}")
+    print("series agree with the naive loop")
+    for name in ("dispersion", "nearest_neighbour", "aggregation", "coverage"):
+        print(f"  {name:>18}: {result['summary'][name]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Telemetry replay benchmark
+
+Builds a synthetic run in memory (default: 50 robots at 30 Hz for 30 minutes,
+2.7M samples), with the 1/10/60 s rollups the ingestor writes, and times the
+replay payload of GET /api/v1/telemetry/{id}/replay for each method: the whole
+run (served from rollups) and a zoomed-in window (served from raw samples).
+Reports build time and JSON size, raw and gzipped; no database needed.
+
+    cd backend
+    python -m benchmarks.telemetry_replay --robots 50 --hz 30 --minutes 30
+"""
+
+import argparse
+import gzip
+import json
+import time
+
+import numpy as np
+
+from app.services.replay_service import FIELDS, METHODS, ReplayService, choose_level, plan_window
+
+START = 1_750_000_000.0
+
+
+def make_run(robots: int, hz: float, minutes: float, seed: int):
+    rng = np.random.default_rng(seed)
+    count = int(minutes * 60 * hz)
+    t = START + np.arange(count) / hz
+    run = {}
+    for i in range(robots):
+        theta = np.cumsum(rng.normal(0, 0.05, count))
+        speed = 0.2 / hz
+        run[f"rvr{i:02d}"] = {
+            "t": t + rng.uniform(0, 1 / hz),  # robots are not sampled in lockstep
+            "x": np.cumsum(speed * np.cos(theta)),
+            "y": np.cumsum(speed * np.sin(theta)),
+            "theta": (theta + np.pi) % (2 * np.pi) - np.pi,
+            "lidar_min": rng.uniform(0.1, 3.0, count),
+        }
+    return run
+
+
+def rollup(run, level: int):
+    """Same aggregates as telemetry_rollups, one row per robot and bucket"""
+    result = {}
+    for robot, series in run.items():
+        bucket = np.floor(series["t"] / level).astype(np.int64)
+        starts = np.flatnonzero(np.diff(bucket, prepend=bucket[0] - 1))
+        counts = np.diff(np.append(starts, len(bucket)))
+        result[robot] = {
+            "t": bucket[starts] * level + level / 2,
+            "x": np.add.reduceat(series["x"], starts) / counts,
+            "y": np.add.reduceat(series["y"], starts) / counts,
+            "lidar_min": np.minimum.reduceat(series["lidar_min"], starts),
+            "x_min": np.minimum.reduceat(series["x"], starts),
+            "x_max": np.maximum.reduceat(series["x"], starts),
+            "y_min": np.minimum.reduceat(series["y"], starts),
+            "y_max": np.maximum.reduceat(series["y"], starts),
+        }
+    return result
+
+
+def window_of(data, start: float, end: float):
+    out = {}
+    for robot, series in data.items():
+        keep = (series["t"] >= start) & (series["t"] < end)
+        out[robot] = {name: values[keep] for name, values in series.items()}
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--robots", type=int, default=50)
+    parser.add_argument("--hz", type=float, default=30)
+    parser.add_argument("--minutes", type=float, default=30)
+    parser.add_argument("--points", type=int, default=1000)
+    parser.add_argument("--zoom-seconds", type=float, default=120, help="span of the zoomed-in window")
+    parser.add_argument("--levels", default="1,10,60")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.levels.split(",")]
+    started = time.perf_counter()
+    run = make_run(args.robots, args.hz, args.minutes, seed=1)
+    rollups = {level: rollup(run, level) for level in levels}
+    samples = sum(len(series["t"]) for series in run.values())
+    print(f"run: {args.robots} robots, {samples:,} samples, generated in {time.perf_counter() - started:.1f}s")
+    raw_bytes = samples * (8 + 4 * len(FIELDS))
+    print(f"shipping every sample as float32 columns would be {raw_bytes / 1e6:,.0f} MB")
+
+    service = ReplayService(levels, max_gap=1.0)
+    end = START + args.minutes * 60
+    windows = {"whole run": (START, end), f"zoom {args.zoom_seconds:g}s": (START + 600, START + 600 + args.zoom_seconds)}
+    for label, (first, last) in windows.items():
+        step, first, last = plan_window(first, last, args.points)
+        level = choose_level(step, levels)
+        data = window_of(run if level is None else rollups[level], first - (level or 0), last)
+        rows = sum(len(series["t"]) for series in data.values())
+        for method in METHODS:
+            timings = []
+            for _ in range(3):
+                began = time.perf_counter()
+                payload = service._build(data, method, first, last, step, args.points, level)
+                body = json.dumps(payload, separators=(",", ":"))
+                timings.append(time.perf_counter() - began)
+            compressed = len(gzip.compress(body.encode(), compresslevel=5))
+            print(f"{label:>12} {method:>8}: source={payload['source']:<10} rows={rows:>9,} step={step:g}s "
+                  f"build+json={min(timings) * 1000:7.1f}ms json={len(body) / 1e6:6.2f}MB gzip={compressed / 1e6:5.2f}MB")
+
+
+if __name__ == "__main__":
+    main()